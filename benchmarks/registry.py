@@ -0,0 +1,74 @@
+"""
+Compares ways of finding a registry key in a synthetic 50 MB hive.
+Run with: PYTHONPATH=src python benchmarks/registry.py
+"""
+import tempfile
+import time
+from pathlib import Path
+
+from grapejuice_common.wine.registry_file import RegistryFile
+from grapejuice_common.wine.registry_index import RegistryIndex
+
+HIVE_SIZE = 50 * 1024 * 1024
+TARGET_KEY = r"Software\\Wine\\DllOverrides"
+
+
+def write_synthetic_hive(path: Path):
+    with path.open("w") as fp:
+        fp.write("WINE REGISTRY Version 2\n;; All keys relative to \\\\User\\\\S-1-5-21-0-0-0-1000\n\n#arch=win64\n")
+
+        i = 0
+        while fp.tell() < HIVE_SIZE:
+            fp.write(f"\n[Software\\\\Synthetic\\\\Key{i}] 1658000000\n#time=1d8a1c9f2b3c4d5\n")
+
+            for j in range(8):
+                fp.write(f"\"Value{j}\"=\"Value {j} of key {i}\"\n")
+
+            i += 1
+
+        fp.write(f"\n[{TARGET_KEY}] 1658000000\n\"d3d11\"=\"native\"\n")
+
+
+def measure(description: str, f, repeat: int = 1):
+    start = time.perf_counter()
+
+    for _ in range(repeat):
+        result = f()
+
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f"{description:<50} {elapsed * 1000:>10.3f} ms")
+
+    return result
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory_string:
+        directory = Path(directory_string)
+        hive_path = directory / "user.reg"
+        write_synthetic_hive(hive_path)
+
+        def full_load():
+            hive = RegistryFile(hive_path)
+            hive.load()
+
+            return hive.find_key(TARGET_KEY)
+
+        measure("Full load", full_load)
+        measure("Streaming find_key, last key", lambda: RegistryFile(hive_path).find_key(TARGET_KEY))
+        measure(
+            "Streaming find_key, first key",
+            lambda: RegistryFile(hive_path).find_key(r"Software\\Synthetic\\Key0"),
+            repeat=100
+        )
+
+        index_directory = directory / "index"
+        measure("Index build and first lookup", lambda: RegistryIndex(hive_path, index_directory).find_key(TARGET_KEY))
+        measure("Stored index, cold lookup", lambda: RegistryIndex(hive_path, index_directory).find_key(TARGET_KEY))
+
+        index = RegistryIndex(hive_path, index_directory)
+        index.find_key(TARGET_KEY)
+        measure("Warm index lookup", lambda: index.find_key(TARGET_KEY), repeat=1000)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,7 @@ import threading
 import traceback
 from typing import Union, Callable, Optional
 
-from grapejuice_common.util.event import Event
+from grapejuice_common.util.event import Event, Subscription
 
 OptionalCallback = Union[Callable, None]
 
@@ -12,6 +12,7 @@ class Task:
     _log: logging.Logger
     _on_finish_callback: OptionalCallback = None
     _on_error_callback: OptionalCallback = None
+    _progress: Optional[float] = None
 
     def __init__(
         self,
@@ -62,6 +63,16 @@ class Task:
     def finish(self):
         self._finished = True
 
+    @property
+    def progress(self) -> Optional[float]:
+        """
+        Fraction of the work that is done, None when the task cannot tell
+        """
+        return self._progress
+
+    def report_progress(self, fraction: Optional[float]):
+        self._progress = fraction
+
     def work(self):
         pass
 
@@ -77,13 +88,25 @@ class BackgroundTask(threading.Thread, Task):
         threading.Thread.__init__(self)
         Task.__init__(self, name, **kwargs)
 
+    def _on_download_progress(self, progress):
+        # Downloads report progress in the thread that performs them, only the ones made by this task are relevant
+        if threading.current_thread() is self:
+            self.report_progress(progress.fraction)
+
     def run(self) -> None:
+        from grapejuice_common.util.downloader import download_progress
+
+        subscription = Subscription(download_progress, self._on_download_progress)
+
         try:
             self.work()
 
         except Exception as e:
             self._error = e
 
+        finally:
+            subscription.unsubscribe()
+
         self.finish()
 
     @property
@@ -111,6 +134,7 @@ class TaskCollection:
         self.task_removed = Event()
         self.tasks_changed = Event()
         self.task_errored = Event()
+        self.task_progress = Event()
 
     def add(self, task: BackgroundTask):
         from gi.repository import GObject
@@ -118,7 +142,13 @@ class TaskCollection:
         task.collection = self
         self._tasks.append(task)
 
+        last_progress = [task.progress]
+
         def poll():
+            if task.progress != last_progress[0]:
+                last_progress[0] = task.progress
+                self.task_progress(task)
+
             if task.has_errored:
                 task.on_error(task.error)
                 self.task_errored(task)
@@ -1,6 +1,7 @@
 from grapejuice_common import paths
 from grapejuice_common.gtk.gtk_util import gtk_boot
-from grapejuice_common.logs.log_vacuum import vacuum_logs
+from grapejuice_common.logs.log_vacuum import vacuum_logs_in_background
+from grapejuice_common.util.cache_utils import log_cache_statistics
 
 
 def handle_fatal_error(ex: Exception):
@@ -43,4 +44,5 @@ def common_prepare():
 
 
 def common_exit():
-    vacuum_logs()
+    log_cache_statistics()
+    vacuum_logs_in_background()
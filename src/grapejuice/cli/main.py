@@ -2,6 +2,7 @@ import locale
 import logging
 import re
 from gettext import gettext as _
+from typing import Optional
 
 import click
 
@@ -163,16 +164,201 @@ def uninstall():
 
 
 @cli.command()
-@click.argument("hint", type=str)
-def top(hint: str):
-    from grapejuice_common.wine.wineprefix_hints import WineprefixHint
-    from grapejuice_common.wine.wine_functions import get_wineprefix
+@click.argument("hint", type=str, required=False)
+@click.option("-i", "--interval", type=float, default=2.0, show_default=True, help="Seconds between samples")
+@click.option("-n", "--iterations", type=int, default=0, help="Stop after this many samples, 0 keeps going")
+@click.option("--json", "as_json", is_flag=True, default=False, help="Print every sample as a line of JSON")
+@click.option("--winedbg", "use_winedbg", is_flag=True, default=False, help="List processes once, through winedbg")
+def top(hint: Optional[str], interval: float, iterations: int, as_json: bool, use_winedbg: bool):
+    import json
+    import time
+    from grapejuice_common.wine.process_monitor import ProcessMonitor, render_table
+    from grapejuice_common.wine.wine_functions import get_wineprefixes
+
+    prefixes = get_wineprefixes(hint)
+
+    if use_winedbg:
+        for prefix in prefixes:
+            for proc in prefix.core_control.winedbg_process_list:
+                print(repr(proc))
+
+        return
+
+    monitor = ProcessMonitor({
+        prefix.paths.base_directory: prefix.configuration.display_name for prefix in prefixes
+    })
+
+    # CPU usage is measured between two samples
+    monitor.sample()
+    n = 0
 
-    hint = WineprefixHint(hint)
-    prefix = get_wineprefix([hint])
+    try:
+        while iterations <= 0 or n < iterations:
+            time.sleep(interval)
+            samples = monitor.sample()
+            n += 1
+
+            if as_json:
+                print(json.dumps({"time": time.time(), "prefixes": [s.as_dict for s in samples]}), flush=True)
+
+            else:
+                # Clear the terminal, then draw the table from the top left
+                print("\033[H\033[2J" + render_table(samples), flush=True)
+
+    except KeyboardInterrupt:
+        pass
+
+
+@cli.command(name="gc-versions")
+@click.argument("hint", type=str, required=False)
+@click.option("-k", "--keep", type=int, default=None, help="Versions to keep of every Roblox product")
+@click.option("--archive", is_flag=True, default=False, help="Archive removed versions instead of only removing them")
+@click.option("--dry-run", is_flag=True, default=False, help="Report what would be removed without removing it")
+@click.option("--json", "as_json", is_flag=True, default=False, help="Print the reports as JSON")
+def gc_versions(hint: Optional[str], keep: Optional[int], archive: bool, dry_run: bool, as_json: bool):
+    import json
+    from grapejuice_common.wine.roblox_versions_gc import collect_roblox_versions
+    from grapejuice_common.wine.wine_functions import get_wineprefixes
+
+    reports = []
+
+    for prefix in filter(lambda p: p.paths.present_on_disk, get_wineprefixes(hint)):
+        report = collect_roblox_versions(prefix.paths, keep=keep, archive=archive, dry_run=dry_run)
+        reports.append(report)
+
+        if not as_json:
+            verb = _("Would reclaim") if dry_run else _("Reclaimed")
+            print(f"{prefix.configuration.display_name}: {verb} {report.reclaimed_bytes / (1024 * 1024):.1f} MiB")
+
+            for name in report.removed:
+                print(f"  - {name}")
+
+            for name in report.installers:
+                print(f"  - {name}")
+
+            for error in report.errors:
+                print(f"  ! {error}")
+
+    if as_json:
+        print(json.dumps([report.as_dict for report in reports], indent=2))
+
+    else:
+        total = sum(report.reclaimed_bytes for report in reports)
+        print(_("Total: {size:.1f} MiB").format(size=total / (1024 * 1024)))
+
+
+@cli.command()
+@click.option("--dry-run", is_flag=True, default=False, help="Report what would be saved without linking anything")
+@click.option(
+    "--links",
+    "link_mode",
+    type=click.Choice(["auto", "reflink", "hardlink"]),
+    default="auto",
+    help="auto only hard links Roblox versions when reflinks are not supported, reflink never hard links and hardlink "
+         "also hard links files in drive_c/windows and Program Files"
+)
+@click.option("--json", "as_json", is_flag=True, default=False, help="Print the report as JSON")
+def dedup(dry_run: bool, link_mode: str, as_json: bool):
+    import json
+    from grapejuice_common.wine.prefix_dedup import deduplicate_prefixes
+
+    report = deduplicate_prefixes(dry_run=dry_run, link_mode=link_mode)
+
+    if as_json:
+        print(json.dumps(report.as_dict, indent=2))
+        return
+
+    mib = 1024 * 1024
+    print(_("Scanned {count} files, {size:.1f} MiB").format(
+        count=report.scanned_files,
+        size=report.scanned_bytes / mib
+    ))
+    print(_("Found {count} duplicate files in {groups} groups").format(
+        count=report.duplicate_files,
+        groups=report.duplicate_groups
+    ))
+
+    if dry_run:
+        print(_("Would save {size:.1f} MiB").format(size=report.saved_bytes / mib))
+
+    else:
+        print(_("Saved {size:.1f} MiB with {reflinks} reflinks and {hard_links} hard links").format(
+            size=report.saved_bytes / mib,
+            reflinks=report.reflinked_files,
+            hard_links=report.hard_linked_files
+        ))
+
+    for error in report.errors:
+        print(f"! {error}")
+
+
+@cli.command(name="wine-builds")
+@click.option("--json", "as_json", is_flag=True, default=False, help="Print the builds as JSON")
+def wine_builds(as_json: bool):
+    import json
+    from grapejuice_common.wine.wine_build_catalog import wine_build_catalog
+
+    builds = wine_build_catalog.value.builds()
+
+    if as_json:
+        print(json.dumps([build.as_dict for build in builds], indent=2))
+        return
+
+    for build in builds:
+        features = [
+            *(["staging"] if build.is_staging else []),
+            *(["esync"] if build.supports_esync else []),
+            *(["fsync"] if build.supports_fsync else [])
+        ]
+
+        print(f"{build.version_string}\t{build.wine_home}\t{', '.join(features)}")
+
+
+@cli.group(name="hardware-profile")
+def hardware_profile():
+    ...
+
+
+@hardware_profile.command(name="export")
+@click.argument("output", type=str, required=False)
+@click.option("--all", "export_all", is_flag=True, default=False, help="Export every cached hardware profile")
+def export_hardware_profile(output: str, export_all: bool):
+    from pathlib import Path
+    from grapejuice_common.features.settings import current_settings
+    from grapejuice_common.hardware_info.hardware_fingerprint import hardware_fingerprint
+    from grapejuice_common.hardware_info.hardware_profile_cache import HardwareProfileCache, format_profiles
+
+    if export_all:
+        profiles = HardwareProfileCache().export_profiles()
+
+    else:
+        profiles = {hardware_fingerprint(): current_settings.hardware_profile.as_dict}
+
+    profiles_string = format_profiles(profiles)
+
+    if output:
+        Path(output).write_text(profiles_string)
+        print(_("Exported {count} hardware profile(s) to {output}").format(count=len(profiles), output=output))
+
+    else:
+        print(profiles_string)
+
+
+@hardware_profile.command(name="import")
+@click.argument("source", type=str)
+def import_hardware_profile(source: str):
+    from pathlib import Path
+    from grapejuice_common.hardware_info.hardware_profile_cache import HardwareProfileCache, read_profiles_file
+
+    profiles = read_profiles_file(Path(source))
+    imported = HardwareProfileCache().import_profiles(profiles)
+
+    print(_("Imported {count} hardware profile(s)").format(count=len(imported)))
 
-    for proc in prefix.core_control.process_list:
-        print(repr(proc))
+    if len(imported) < len(profiles):
+        print(_("Skipped {count} hardware profile(s) that are invalid, outdated or did not fit in the cache").format(
+            count=len(profiles) - len(imported)
+        ))
 
 
 def main():
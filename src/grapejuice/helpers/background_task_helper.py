@@ -30,10 +30,17 @@ class GrapeTaskItem(Gtk.ListBoxRow):
         super().__init__(**kwargs)
         self._task = task
 
-        label = Gtk.Label(halign=Gtk.Align.START)
-        label.set_text(task.name)
+        self._label = Gtk.Label(halign=Gtk.Align.START)
+        self.update()
 
-        self.add(label)
+        self.add(self._label)
+
+    def update(self):
+        if self._task.progress is None:
+            self._label.set_text(self._task.name)
+
+        else:
+            self._label.set_text(f"{self._task.name} ({round(self._task.progress * 100)}%)")
 
     @property
     def task(self):
@@ -77,6 +84,10 @@ class BackgroundTaskHelper:
             Subscription(
                 background.tasks.task_removed,
                 self._on_task_removed
+            ),
+            Subscription(
+                background.tasks.task_progress,
+                self._on_task_progress
             )
         ]
 
@@ -149,6 +160,11 @@ class BackgroundTaskHelper:
             self._widgets.background_task_list.remove(to_delete)
             to_delete.destroy()
 
+    def _on_task_progress(self, task: BackgroundTask):
+        for row in self._task_reference:
+            if row.task is task:
+                row.update()
+
     def take_errors(self) -> List[Exception]:
         taken = [*self._errors]
         self._errors = []
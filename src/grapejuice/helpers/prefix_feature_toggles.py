@@ -1,13 +1,16 @@
 import logging
 from dataclasses import dataclass
+from functools import partial
 from gettext import gettext as _
-from typing import Optional
+from typing import Optional, Dict
 
 from grapejuice_common.gtk.components.grape_setting import GrapeSetting
+from grapejuice_common.gtk.components.grape_setting_action import GrapeSettingAction
 from grapejuice_common.gtk.components.grape_settings_group import GrapeSettingsGroup
 from grapejuice_common.gtk.components.grape_settings_pane import GrapeSettingsPane
 from grapejuice_common.hardware_info.xrandr import XRandRProvider
 from grapejuice_common.hardware_info.xrandr_factory import xrandr_factory
+from grapejuice_common.logs.log_capture import BUDGET_CHOICES_MIB
 from grapejuice_common.models.wineprefix_configuration_model import ThirdPartyKeys
 from grapejuice_common.roblox_product import RobloxProduct
 from grapejuice_common.roblox_renderer import RobloxRenderer
@@ -126,7 +129,49 @@ def _graphics_settings(prefix: Wineprefix) -> Optional[GrapeSettingsGroup]:
     )
 
 
+def _wine_home_choices(prefix: Wineprefix) -> Dict[str, str]:
+    from grapejuice_common.wine.wine_build_catalog import wine_build_catalog
+
+    choices = {_("Automatic"): ""}
+
+    try:
+        for build in wine_build_catalog.value.builds():
+            choices[build.display_name] = str(build.wine_home)
+
+    except Exception as e:
+        log.error(f"Could not list wine builds: {e}")
+
+    # Keep a configured home that is not a discoverable build, so saving the prefix does not lose it
+    configured_home = prefix.configuration.wine_home.strip()
+    if configured_home and configured_home not in choices.values():
+        choices[configured_home] = configured_home
+
+    return choices
+
+
+def _wine_settings(prefix: Wineprefix, choices: Dict[str, str]):
+    labels = list(choices.keys())
+    homes = list(choices.values())
+
+    return GrapeSettingsGroup(
+        title=_("Wine"),
+        description=_("The Wine build this prefix runs on. When set to automatic, Grapejuice uses the default wine "
+                    "home or the Wine installation it finds in your PATH."),
+        settings=[
+            GrapeSetting(
+                key="wine_home",
+                display_name=_("Wine build"),
+                value_type=labels,
+                value=labels,
+                __list_index__=homes.index(prefix.configuration.wine_home.strip())
+            )
+        ]
+    )
+
+
 def _wine_debug_settings(prefix: Wineprefix):
+    budget_choices = sorted({*BUDGET_CHOICES_MIB, prefix.configuration.log_budget_mib})
+
     return GrapeSettingsGroup(
         title=_("Wine debugging settings"),
         description=_("Wine has an array of debugging options that can be used to improve wine. Some of them can cause "
@@ -141,6 +186,27 @@ def _wine_debug_settings(prefix: Wineprefix):
                 key="winedebug_string",
                 display_name=_("WINEDEBUG string"),
                 value=prefix.configuration.winedebug_string
+            ),
+            GrapeSetting(
+                key="capture_logs",
+                display_name=_("Compress and limit logs"),
+                description=_("Compresses the output of Wine while it is written, and only keeps the end of it once "
+                              "the log budget runs out."),
+                value=prefix.configuration.capture_logs
+            ),
+            GrapeSetting(
+                key="log_budget_mib",
+                display_name=_("Log budget (MiB)"),
+                value_type=budget_choices,
+                value=prefix.configuration.log_budget_mib,
+                __list_index__=budget_choices.index(prefix.configuration.log_budget_mib)
+            ),
+            GrapeSetting(
+                key="log_filter_string",
+                display_name=_("Leave out of logs"),
+                description=_("Debug channels to leave out of compressed logs, in the syntax of WINEDEBUG, like "
+                              "fixme-all"),
+                value=prefix.configuration.log_filter_string
             )
         ]
     )
@@ -166,6 +232,38 @@ def _third_party(prefix: Wineprefix):
     )
 
 
+def _collect_roblox_versions(prefix: Wineprefix):
+    from grapejuice import gui_task_manager
+    from grapejuice.tasks import CollectRobloxVersions
+    from grapejuice_common.gtk.gtk_util import dialog
+
+    def show_summary(task: CollectRobloxVersions):
+        # Failures are shown by the task manager already
+        if task.summary is not None:
+            dialog(task.summary)
+
+    gui_task_manager.run_task_once(CollectRobloxVersions, prefix, on_finish_callback=show_summary)
+
+
+def _maintenance(prefix: Wineprefix):
+    return GrapeSettingsGroup(
+        title=_("Maintenance"),
+        description=_("Every Roblox update installs a new version next to the old ones, which are not removed"),
+        settings=[
+            GrapeSetting(
+                key="collect_roblox_versions",
+                display_name=_("Remove old Roblox versions"),
+                description=_("Removes the Roblox versions that are not the newest, while Roblox is not running"),
+                value=GrapeSettingAction(
+                    key="collect_roblox_versions",
+                    display_name=_("Remove"),
+                    action=lambda *_: _collect_roblox_versions(prefix)
+                )
+            )
+        ]
+    )
+
+
 @dataclass
 class ToggleSettings:
     pass
@@ -174,9 +272,11 @@ class ToggleSettings:
 @dataclass(frozen=True)
 class Groups:
     app_hints: GrapeSettingsGroup
+    wine: GrapeSettingsGroup
     winedebug: GrapeSettingsGroup
     graphics_settings: GrapeSettingsGroup
     third_party: GrapeSettingsGroup
+    maintenance: GrapeSettingsGroup
 
     @property
     def as_list(self):
@@ -184,9 +284,11 @@ class Groups:
             None,
             [
                 self.app_hints,
+                self.wine,
                 self.winedebug,
                 self.graphics_settings,
-                self.third_party
+                self.third_party,
+                self.maintenance
             ]
         ))
 
@@ -196,6 +298,7 @@ class PrefixFeatureToggles:
     _current_pane: Optional[GrapeSettingsPane] = None
     _groups: Optional[Groups] = None
     _prefix: Optional[Wineprefix] = None
+    _wine_home_choices: Optional[Dict[str, str]] = None
 
     _pane_changed_subscription: Optional[Subscription] = None
     changed: Event
@@ -222,6 +325,8 @@ class PrefixFeatureToggles:
         self.clear_toggles()
 
         self._prefix = prefix
+        self._wine_home_choices = _wine_home_choices(prefix)
+
         self._groups = Groups(*list(
             map(
                 lambda c: c(prefix),
@@ -229,9 +334,11 @@ class PrefixFeatureToggles:
                     None,
                     [
                         _app_hints,
+                        partial(_wine_settings, choices=self._wine_home_choices),
                         _wine_debug_settings,
                         _graphics_settings,
-                        _third_party
+                        _third_party,
+                        _maintenance
                     ]
                 )
             )
@@ -262,6 +369,9 @@ class PrefixFeatureToggles:
 
         model.hints = hints
 
+        wine_home_label = self._groups.wine.settings_dictionary.get("wine_home", None)
+        model.wine_home = self._wine_home_choices.get(wine_home_label, model.wine_home)
+
         model.apply_dict(self._groups.winedebug.settings_dictionary)
 
         graphics = self._groups.graphics_settings.settings_dictionary
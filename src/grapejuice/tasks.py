@@ -6,7 +6,7 @@ import time
 from datetime import datetime, timedelta
 from gettext import gettext as _
 from pathlib import Path
-from typing import Optional
+from typing import Optional, TYPE_CHECKING
 
 from grapejuice import background
 from grapejuice_common import paths
@@ -16,6 +16,9 @@ from grapejuice_common.update_info_providers import UpdateInformationProvider
 from grapejuice_common.util import xdg_open
 from grapejuice_common.wine.wineprefix import Wineprefix
 
+if TYPE_CHECKING:
+    from grapejuice_common.wine.roblox_versions_gc import VersionsReport
+
 
 class RunRobloxStudio(background.BackgroundTask):
     _prefix: Wineprefix
@@ -258,6 +261,82 @@ class SetDXVKState(background.BackgroundTask):
             recipe.make_in(self._prefix)
 
 
+class PrestartWineservers(background.BackgroundTask):
+    def __init__(self, **kwargs):
+        super().__init__(_("Starting Wine servers"), **kwargs)
+
+    def work(self):
+        from grapejuice_common.wine.wineserver_manager import prestart_wineservers
+        prestart_wineservers()
+
+
+class RotateRobloxLogs(background.BackgroundTask):
+    def __init__(self, **kwargs):
+        super().__init__(_("Rotating Roblox logs"), **kwargs)
+
+    def work(self):
+        from grapejuice_common.wine.roblox_log_rotation import rotate_all_roblox_logs
+        rotate_all_roblox_logs()
+
+
+class CollectRobloxVersions(background.BackgroundTask):
+    _prefix: Wineprefix
+    report: Optional["VersionsReport"] = None
+
+    def __init__(self, prefix: Wineprefix, **kwargs):
+        super().__init__(
+            _("Removing old Roblox versions in {prefix}").format(prefix=prefix.configuration.display_name),
+            **kwargs
+        )
+
+        self._prefix = prefix
+
+    def work(self):
+        from grapejuice_common.wine.roblox_versions_gc import collect_roblox_versions
+
+        report = collect_roblox_versions(self._prefix.paths, skip_while_running=True)
+        self.report = report
+
+        self._log.info(
+            f"Reclaimed {report.reclaimed_bytes} bytes by removing {', '.join(report.removed) or 'no versions'}"
+        )
+
+    @property
+    def summary(self) -> Optional[str]:
+        """
+        What the task did, for the user to read once it finished
+        """
+        report = self.report
+        if report is None:
+            return None
+
+        display_name = self._prefix.configuration.display_name
+
+        if report.skipped:
+            return _("Roblox is running in {prefix}, close it before removing old Roblox versions.").format(
+                prefix=display_name
+            )
+
+        if not report.removed and not report.installers:
+            return _("There are no old Roblox versions to remove in {prefix}.").format(prefix=display_name)
+
+        lines = [
+            _("Removed {versions} old Roblox versions and {installers} installers in {prefix}, reclaiming {size:.1f} "
+              "MiB.").format(
+                versions=len(report.removed),
+                installers=len(report.installers),
+                prefix=display_name,
+                size=report.reclaimed_bytes / (1024 * 1024)
+            )
+        ]
+
+        if report.errors:
+            lines.append(_("Some files could not be removed:"))
+            lines.extend(report.errors)
+
+        return "\n".join(lines)
+
+
 class PreloadXRandR(background.BackgroundTask):
     def __init__(self, **kwargs):
         super().__init__(_("Preloading XRandR interface"), **kwargs)
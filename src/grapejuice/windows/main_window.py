@@ -26,7 +26,9 @@ from grapejuice.tasks import \
     InstallFPSUnlocker, \
     SetDXVKState, \
     SignIntoStudio, \
-    PreloadXRandR
+    PreloadXRandR, \
+    PrestartWineservers, \
+    RotateRobloxLogs
 from grapejuice.windows.settings_window import SettingsWindow
 from grapejuice_common import variables, paths
 from grapejuice_common.features.settings import current_settings
@@ -153,6 +155,8 @@ class MainWindow(GtkBase):
         _check_for_updates(self.widgets)
 
         gui_task_manager.run_task_once(PreloadXRandR)
+        gui_task_manager.run_task_once(PrestartWineservers)
+        gui_task_manager.run_task_once(RotateRobloxLogs)
 
     def _save_current_prefix(self):
         if self._current_prefix_model is not None:
@@ -126,6 +126,14 @@ def _general_settings():
                         "profiling step only happens when the hardware profile is not set or when the current "
                         "hardware does not match the previously profiled hardware. This setting is automatically "
                         "disabled if hardware profiling fails.")
+        ),
+        _from_user_settings(
+            key="prestart_wineservers",
+            default_value=False,
+            display_name=_("Start Wine servers in advance"),
+            description=_("Start the Wine server of every wineprefix when Grapejuice starts, so Roblox launches "
+                        "faster. Idle Wine servers exit after the number of seconds in the "
+                        "wineserver_idle_timeout setting.")
         )
     ]
 
@@ -63,6 +63,15 @@ class RobloxDownloadError(RuntimeError):
         super().__init__("Roblox installer couldn't be downloaded")
 
 
+class DownloadVerificationError(RuntimeError):
+    def __init__(self, url: str, reason: str):
+        super().__init__(f"Download of '{url}' could not be verified: {reason}")
+
+
+class RegistryFormatError(RuntimeError):
+    pass
+
+
 class RobloxExecutableNotFound(RuntimeError):
     def __init__(self, executable_name: str):
         super().__init__(f"Roblox executable '{executable_name}' could not be found!")
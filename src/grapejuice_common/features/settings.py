@@ -3,13 +3,15 @@ import logging
 from copy import deepcopy
 from dataclasses import asdict
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, TYPE_CHECKING
 
 from grapejuice_common import paths
 from grapejuice_common.errors import HardwareProfilingError, NoHardwareProfile, PresentableError
-from grapejuice_common.hardware_info.hardware_profile import HardwareProfile, profile_hardware
 from grapejuice_common.models.wineprefix_configuration_model import WineprefixConfigurationModel
 
+if TYPE_CHECKING:
+    from grapejuice_common.hardware_info.hardware_profile import HardwareProfile
+
 LOG = logging.getLogger(__name__)
 
 CURRENT_SETTINGS_VERSION = 2
@@ -30,6 +32,14 @@ k_ignore_wine_version = "ignore_wine_version"
 k_unsupported_settings = "unsupported_settings"
 k_try_profiling_hardware = "try_profiling_hardware"
 k_default_wine_home = "default_wine_home"
+k_wine_build_directories = "wine_build_directories"
+k_wineserver_idle_timeout = "wineserver_idle_timeout"
+k_prestart_wineservers = "prestart_wineservers"
+k_log_budget_mib = "log_budget_mib"
+k_log_max_age_days = "log_max_age_days"
+k_roblox_log_budget_mib = "roblox_log_budget_mib"
+k_roblox_log_max_age_days = "roblox_log_max_age_days"
+k_roblox_versions_keep = "roblox_versions_keep"
 
 
 def default_settings() -> Dict[str, any]:
@@ -43,6 +53,14 @@ def default_settings() -> Dict[str, any]:
         k_ignore_wine_version: False,
         k_try_profiling_hardware: True,
         k_default_wine_home: "",
+        k_wine_build_directories: [],
+        k_wineserver_idle_timeout: 300,
+        k_prestart_wineservers: False,
+        k_log_budget_mib: 256,
+        k_log_max_age_days: 7,
+        k_roblox_log_budget_mib: 512,
+        k_roblox_log_max_age_days: 14,
+        k_roblox_versions_keep: 2,
         k_wineprefixes: [],
         k_unsupported_settings: dict()
     }
@@ -54,12 +72,32 @@ def _text_encoding():
 
 
 class UserSettings:
-    _settings_object: Dict[str, any] = None
-    _location: Path = None
+    _loaded_settings_object: Optional[Dict[str, any]] = None
+    _location: Optional[Path] = None
+    _did_validate_hardware_profile: bool = False
 
-    def __init__(self, file_location=paths.grapejuice_user_settings()):
+    def __init__(self, file_location: Optional[Path] = None):
+        # The settings file is only read when a setting is accessed for the first time, this keeps importing this
+        # module cheap for short-lived invocations like the player URI handler.
         self._location = file_location
-        self.load()
+
+    @property
+    def location(self) -> Path:
+        if self._location is None:
+            self._location = paths.grapejuice_user_settings()
+
+        return self._location
+
+    @property
+    def _settings_object(self) -> Dict[str, any]:
+        if self._loaded_settings_object is None:
+            self.load()
+
+        return self._loaded_settings_object
+
+    @_settings_object.setter
+    def _settings_object(self, value: Dict[str, any]):
+        self._loaded_settings_object = value
 
     def perform_migrations(self, desired_migration_version: int = CURRENT_SETTINGS_VERSION):
         if self.version == desired_migration_version:
@@ -95,9 +133,15 @@ class UserSettings:
         return self.get(k_version, 0)
 
     @property
-    def hardware_profile(self) -> HardwareProfile:
-        if self._profile_hardware():
-            self.save()
+    def hardware_profile(self) -> "HardwareProfile":
+        from grapejuice_common.hardware_info.hardware_profile import HardwareProfile
+
+        # Validating the saved profile is costly, so it is done at most once per process
+        if not self._did_validate_hardware_profile:
+            self._did_validate_hardware_profile = True
+
+            if self._profile_hardware():
+                self.save()
 
         if self._settings_object.get(k_hardware_profile, None) is None:
             raise NoHardwareProfile()
@@ -144,54 +188,66 @@ class UserSettings:
         :param always_profile: Override any logic in the method, and just go ahead with the profiling
         :return: Boolean indicating whether settings should be saved or not.
         """
-        saved_profile = None if always_profile else self._settings_object.get(k_hardware_profile, None)
+        from grapejuice_common.hardware_info.hardware_fingerprint import hardware_fingerprint
+        from grapejuice_common.hardware_info.hardware_profile import profile_hardware
+        from grapejuice_common.hardware_info.hardware_profile_cache import HardwareProfileCache, find_shared_profile
 
         should_try = self._settings_object.get(k_try_profiling_hardware, True)
         if not should_try:
             return False
 
-        if saved_profile:
-            from grapejuice_common.hardware_info.lspci import LSPci
+        try:
+            fingerprint = hardware_fingerprint()
 
-            try:
-                hardware_list = LSPci()
+        except Exception as e:
+            LOG.info("Failed to compute the hardware fingerprint: " + str(e))
+
+            return False
+
+        profile_cache = HardwareProfileCache()
+        cached_profile = None if always_profile else profile_cache.get(fingerprint)
+
+        if cached_profile is None and not always_profile:
+            # Identical machines can share a profile that was computed once, instead of probing every one of them
+            cached_profile = find_shared_profile(fingerprint)
 
-            except Exception as e:
-                LOG.info("Failed to get LSPci info: " + str(e))
+            if cached_profile is not None:
+                profile_cache.put(fingerprint, cached_profile)
 
+        if cached_profile is not None:
+            if self._settings_object.get(k_hardware_profile, None) == cached_profile.as_dict:
                 return False
 
-            should_profile_hardware = (hardware_list.graphics_id != saved_profile["graphics_id"]) or \
-                                      (saved_profile.get("version", -1) != HardwareProfile.version)
+            LOG.info(f"Using cached hardware profile for fingerprint {fingerprint}")
+            self._settings_object[k_hardware_profile] = cached_profile.as_dict
 
-        else:
-            should_profile_hardware = True
+            return True
 
-        if should_profile_hardware:
-            LOG.info("Going to profile hardware")
+        LOG.info("Going to profile hardware")
 
-            try:
-                profile = profile_hardware()
-                self._settings_object[k_hardware_profile] = profile.as_dict
+        try:
+            profile = profile_hardware()
+            self._settings_object[k_hardware_profile] = profile.as_dict
 
-            except HardwareProfilingError as e:
-                LOG.error("Failed to profile hardware: " + str(e))
-                LOG.info("No longer try to profile hardware due to errors")
+            profile_cache.put(fingerprint, profile)
 
-                self.set(k_try_profiling_hardware, False, save=False)
+        except HardwareProfilingError as e:
+            LOG.error("Failed to profile hardware: " + str(e))
+            LOG.info("No longer try to profile hardware due to errors")
 
-            return True
+            self.set(k_try_profiling_hardware, False, save=False)
 
-        return False
+        return True
 
     def load(self):
         save_settings = False
+        location = self.location
 
-        if self._location.exists():
-            LOG.debug(f"Loading settings from '{self._location}'")
+        if location.exists():
+            LOG.debug(f"Loading settings from '{location}'")
 
             try:
-                with self._location.open("r") as fp:
+                with location.open("r") as fp:
                     self._settings_object = json.load(fp)
 
                     # Make sure all the default settings are present
@@ -219,14 +275,13 @@ class UserSettings:
             self._settings_object = default_settings()
             save_settings = True
 
-        save_settings = self._profile_hardware() or save_settings
-
         if save_settings:
             LOG.info("Saving settings after load, because something was wrong.")
             self.save()
 
     def save(self):
-        LOG.debug(f"Saving settings file to '{self._location}'")
+        location = self.location
+        LOG.debug(f"Saving settings file to '{location}'")
 
         # Sort wineprefixes before saving so the file order matches the UI
         self._settings_object[k_wineprefixes] = self.raw_wineprefixes_sorted
@@ -245,8 +300,8 @@ class UserSettings:
             self._settings_object[k_unsupported_settings][k] = self._settings_object.pop(k)
 
         # Perform actual save
-        self._location.parent.mkdir(parents=True, exist_ok=True)
-        with self._location.open("w+", encoding=_text_encoding()) as fp:
+        location.parent.mkdir(parents=True, exist_ok=True)
+        with location.open("w+", encoding=_text_encoding()) as fp:
             self._settings_object = {
                 **defaults,
                 **(self._settings_object or {})
@@ -22,6 +22,11 @@ def gtk_boot(main_function, *args, gtk_main=True, **kwargs):
     from grapejuice_common.gtk.gtk_styling import load_style_from_path
     load_style_from_path(paths.global_css())
 
+    if gtk_main:
+        # Exit callbacks of child processes should run on the main loop, where it is safe to touch widgets
+        from grapejuice_common.util.process_supervisor import process_supervisor
+        process_supervisor.use_glib_main_loop()
+
     main_function(*args, **kwargs)
 
     if gtk_main:
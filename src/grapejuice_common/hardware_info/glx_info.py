@@ -1,13 +1,21 @@
 import json
+import logging
+import os
 import re
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from copy import deepcopy
-from typing import Dict, Optional, Tuple
+from typing import Dict, Optional, Tuple, Iterable, FrozenSet, Union, List
 
-from grapejuice_common.util import environment_as
+from grapejuice_common.util import Environment
+
+log = logging.getLogger(__name__)
 
 OPENGL_ATTRIBUTE_PTN = re.compile(r"(OpenGL.+):(.+)")
 
+# Older versions of glxinfo print their usage when they do not know an option, some of them exit successfully
+BRIEF_REJECTED_PTN = re.compile(r"(unknown|unrecognized|invalid) option.*-B|^usage:", re.IGNORECASE | re.MULTILINE)
+
 
 def _parse_opengl_version(s):
     m = re.search(r"([\d.]+)", s.strip())
@@ -18,16 +26,56 @@ def _parse_opengl_version(s):
     return None
 
 
-def _get_glx_info() -> str:
-    return subprocess.check_output(["glxinfo"]).decode("UTF-8")
+class _GLXInfoFlags:
+    # None means it is not known yet whether this glxinfo understands -B
+    supports_brief: Optional[bool] = None
+
+
+def _process_environment(env: Optional[Environment]) -> Dict[str, str]:
+    process_env = dict(os.environ)
+
+    for k, v in (env or dict()).items():
+        if v is None:
+            process_env.pop(k, None)
+
+        else:
+            process_env[k] = v
+
+    return process_env
+
+
+def _get_glx_info(env: Optional[Environment] = None) -> str:
+    process_env = _process_environment(env)
+
+    # Brief mode skips the visual and extension listings, which are most of the output
+    if _GLXInfoFlags.supports_brief is not False:
+        proc = subprocess.run(
+            ["glxinfo", "-B"],
+            env=process_env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            check=False
+        )
+        output = proc.stdout.decode("UTF-8")
+
+        # Failures that have nothing to do with -B, like a missing display, are not retried without it
+        if BRIEF_REJECTED_PTN.search(output + proc.stderr.decode("UTF-8", errors="replace")) is None:
+            proc.check_returncode()
+            _GLXInfoFlags.supports_brief = True
+
+            return output
+
+        log.info("glxinfo does not support -B, using full output")
+        _GLXInfoFlags.supports_brief = False
+
+    return subprocess.check_output(["glxinfo"], env=process_env).decode("UTF-8")
 
 
 class GLXInfo:
     _attributes: Dict[str, str]
 
-    def __init__(self, env: Optional[Dict[str, str]] = None):
-        with environment_as(env):
-            info_string = _get_glx_info()
+    def __init__(self, env: Optional[Environment] = None):
+        info_string = _get_glx_info(env)
 
         lines_of_interest = list(
             map(
@@ -92,3 +140,67 @@ class GLXInfo:
 
     def __hash__(self):
         return hash(json.dumps(self._attributes))
+
+
+EnvironmentKey = FrozenSet[Tuple[str, Optional[str]]]
+ProbeResult = Union[GLXInfo, subprocess.CalledProcessError]
+
+
+def _environment_key(env: Optional[Environment]) -> EnvironmentKey:
+    return frozenset((env or dict()).items())
+
+
+class GLXProbe:
+    """
+    Runs glxinfo at most once per environment. Environments can be probed concurrently because every probe passes its
+    environment to the glxinfo process instead of modifying os.environ.
+    """
+    _results: Dict[EnvironmentKey, ProbeResult]
+
+    def __init__(self):
+        self._results = dict()
+
+    def _probe(self, env: Optional[Environment]) -> ProbeResult:
+        try:
+            return GLXInfo(env=env)
+
+        except subprocess.CalledProcessError as e:
+            return e
+
+    def probe_all(self, environments: Iterable[Optional[Environment]]):
+        """
+        Probes all environments that have not been probed yet in parallel
+        """
+        pending: Dict[EnvironmentKey, Optional[Environment]] = dict()
+
+        for env in environments:
+            key = _environment_key(env)
+
+            if key not in self._results:
+                pending[key] = env
+
+        if len(pending) <= 0:
+            return
+
+        log.info(f"Probing GLX info for {len(pending)} environment(s)")
+
+        keys: List[EnvironmentKey] = list(pending.keys())
+        with ThreadPoolExecutor(max_workers=len(keys)) as executor:
+            results = list(executor.map(self._probe, map(pending.get, keys)))
+
+        self._results.update(zip(keys, results))
+
+    def info(self, env: Optional[Environment] = None) -> GLXInfo:
+        """
+        :raises CalledProcessError: When glxinfo failed for this environment
+        """
+        self.probe_all([env])
+        result = self._results[_environment_key(env)]
+
+        if isinstance(result, subprocess.CalledProcessError):
+            raise result
+
+        return result
+
+    def baseline(self) -> GLXInfo:
+        return self.info(None)
@@ -0,0 +1,8 @@
+from enum import Enum
+
+
+class GPUVendor(Enum):
+    INTEL = 0
+    AMD = 1
+    NVIDIA = 2
+    UNKNOWN = 999
@@ -1,12 +1,11 @@
 import json
 import logging
 from dataclasses import dataclass
-from enum import Enum
-from pathlib import Path
 from typing import Optional, Dict
 
-from grapejuice_common import paths
+from grapejuice_common.hardware_info.gpu_vendor import GPUVendor
 from grapejuice_common.hardware_info.lspci import LSPciEntry
+from grapejuice_common.hardware_info.vulkan_icd import VulkanICDCatalog, vulkan_icd_catalog
 
 log = logging.getLogger(__name__)
 
@@ -15,13 +14,6 @@ log = logging.getLogger(__name__)
 # AMD Vulkan reference: https://www.amd.com/en/technologies/vulkan
 
 
-class GPUVendor(Enum):
-    INTEL = 0
-    AMD = 1
-    NVIDIA = 2
-    UNKNOWN = 999
-
-
 GPU_VENDOR_PRIORITY = {
     GPUVendor.NVIDIA: 0,
     GPUVendor.AMD: 1,
@@ -40,29 +32,11 @@ DRIVER_TO_VENDOR_MAPPING = {
 }
 
 
-def _can_use_icd(icd_name):
-    search_paths = [
-        Path("/usr/share/vulkan/icd.d"),
-        paths.local_share() / "vulkan" / "icd.d"
-    ]
-
-    for search_path in search_paths:
-        icd_path = search_path / icd_name
-
-        if icd_path.exists():
-            log.info(f"Found ICD at '{str(icd_path)}'")
-            return True
-
-        else:
-            log.info(f"Could not find ICD at '{str(icd_path)}'")
-
-    return False
-
-
 @dataclass()
 class GraphicsCard:
     lspci_entry: LSPciEntry
     _can_do_vulkan_value: Optional[bool] = None
+    vulkan_icd_catalog: Optional[VulkanICDCatalog] = None
 
     @property
     def vendor(self) -> GPUVendor:
@@ -78,27 +52,11 @@ class GraphicsCard:
 
     @property
     def can_do_vulkan(self):
-        if self._can_do_vulkan_value is not None:
-            return self._can_do_vulkan_value
-
-        def resolve(x):
-            # Return with side effects
-            self._can_do_vulkan_value = x
-            return x
-
-        if self.vendor is GPUVendor.NVIDIA:
-            return resolve(_can_use_icd("nvidia_icd.json"))
-
-        elif self.vendor is GPUVendor.AMD:
-            return resolve(
-                (_can_use_icd("radeon_icd.x86_64.json") and _can_use_icd("radeon_icd.i686.json")) or
-                (_can_use_icd("amd_icd64.json") and _can_use_icd("amd_icd32.json"))
-            )
-
-        elif self.vendor is GPUVendor.INTEL:
-            return resolve(_can_use_icd("intel_icd.x86_64.json") and _can_use_icd("intel_icd.i686.json"))
+        if self._can_do_vulkan_value is None:
+            catalog = self.vulkan_icd_catalog or vulkan_icd_catalog()
+            self._can_do_vulkan_value = catalog.supports_vendor(self.vendor)
 
-        return resolve(False)
+        return self._can_do_vulkan_value
 
     def as_serializable_dict(self) -> Dict[str, any]:
         return {
@@ -0,0 +1,86 @@
+import hashlib
+import json
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from grapejuice_common.hardware_info.sysfs_pci import SysfsPCIDevice, sysfs_graphics_cards, graphics_id
+from grapejuice_common.hardware_info.vulkan_icd import vulkan_icd_catalog
+from grapejuice_common.util.cache_utils import cache
+
+log = logging.getLogger(__name__)
+
+SYSFS_MODULES = Path("/sys/module")
+
+
+def _read_first_line(path: Path) -> Optional[str]:
+    try:
+        with path.open("r") as fp:
+            return fp.readline().strip()
+
+    except OSError:
+        return None
+
+
+def kernel_driver_version(driver: str, modules_directory: Path = SYSFS_MODULES) -> str:
+    """
+    Versioned drivers like nvidia expose a version, in-tree drivers only have a srcversion checksum which changes
+    along with the kernel module. Either one is good enough to notice a driver upgrade.
+    """
+    for module_name in dict.fromkeys([driver, driver.replace("-", "_")]):
+        module_directory = modules_directory / module_name
+
+        for attribute in ("version", "srcversion"):
+            version = _read_first_line(module_directory / attribute)
+
+            if version:
+                return version
+
+    return ""
+
+
+def _icd_modification_times() -> Dict[str, int]:
+    return {str(icd.manifest_path): icd.modification_time for icd in vulkan_icd_catalog().icds}
+
+
+def _card_fingerprint(card: SysfsPCIDevice, modules_directory: Path) -> Dict[str, str]:
+    return {
+        "device": card.fingerprint_string,
+        "driver_version": kernel_driver_version(card.driver, modules_directory) if card.driver else ""
+    }
+
+
+def fingerprint_components(
+    cards: Optional[List[SysfsPCIDevice]] = None,
+    modules_directory: Path = SYSFS_MODULES
+) -> Dict[str, any]:
+    cards = sysfs_graphics_cards() if cards is None else cards
+
+    return {
+        "graphics_cards": [_card_fingerprint(card, modules_directory) for card in cards],
+        "vulkan_icds": _icd_modification_times()
+    }
+
+
+def fingerprint_from_components(components: Dict[str, any]) -> str:
+    h = hashlib.new("blake2s")
+    h.update(json.dumps(components, sort_keys=True).encode("UTF-8"))
+
+    return h.hexdigest()
+
+
+@cache()
+def hardware_fingerprint() -> str:
+    """
+    Identifies the graphics hardware, the drivers and the Vulkan ICDs of this machine. When any of these change, the
+    hardware profile has to be computed again. On Linux, computing the fingerprint does not spawn any processes.
+    """
+    components = fingerprint_components()
+
+    # The graphics id falls back to lspci on systems without sysfs, where the card list above is empty
+    components["graphics_id"] = graphics_id()
+
+    fingerprint = fingerprint_from_components(components)
+    log.info(f"Hardware fingerprint: {fingerprint}")
+
+    return fingerprint
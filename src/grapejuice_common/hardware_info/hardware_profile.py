@@ -8,9 +8,11 @@ from typing import Dict, List
 
 from grapejuice_common.errors import HardwareProfilingError, format_exception
 from grapejuice_common.hardware_info.chassis_type import is_mobile_chassis, ChassisType
-from grapejuice_common.hardware_info.glx_info import GLXInfo
+from grapejuice_common.hardware_info.glx_info import GLXProbe
 from grapejuice_common.hardware_info.graphics_card import GraphicsCard, GPU_VENDOR_PRIORITY, GPUVendor
 from grapejuice_common.hardware_info.lspci import LSPci
+from grapejuice_common.hardware_info.sysfs_pci import graphics_id
+from grapejuice_common.hardware_info.vulkan_icd import vulkan_icd_catalog
 from grapejuice_common.hardware_info.xrandr import XRandR, XRandRProvider
 from grapejuice_common.hardware_info.xrandr_factory import xrandr_factory
 from grapejuice_common.roblox_renderer import RobloxRenderer
@@ -32,16 +34,16 @@ def get_prime_env(card: GraphicsCard, provider: XRandRProvider) -> Dict[str, str
     return prime_env
 
 
-def can_prime_card(card: GraphicsCard, provider: XRandRProvider):
+def can_prime_card(card: GraphicsCard, provider: XRandRProvider, glx_probe: GLXProbe):
     is_valid_sink = provider.sink_output or provider.sink_offload
 
     if not is_valid_sink:
         return False
 
-    base_glx_info_hash = hash(GLXInfo())
+    base_glx_info_hash = hash(glx_probe.baseline())
 
     try:
-        primed_glx_info_hash = hash(GLXInfo(env=get_prime_env(card, provider)))
+        primed_glx_info_hash = hash(glx_probe.info(get_prime_env(card, provider)))
 
     except CalledProcessError as e:
         log.error(e)
@@ -50,8 +52,27 @@ def can_prime_card(card: GraphicsCard, provider: XRandRProvider):
     return base_glx_info_hash != primed_glx_info_hash
 
 
+def _probe_prime_environments(state: "ComputeParametersState"):
+    """
+    Runs the GLX probes for every card that could be primed in one go, so they can run in parallel
+    """
+    prime_environments = []
+
+    for card, provider in state.card_provider_lookup.items():
+        if provider.sink_output or provider.sink_offload:
+            prime_environments.append(get_prime_env(card, provider))
+
+    if len(prime_environments) <= 0:
+        return
+
+    # The baseline goes first, it also figures out which glxinfo flags can be used
+    state.glx_probe.baseline()
+    state.glx_probe.probe_all(prime_environments)
+
+
 @dataclass(init=False)
 class ComputeParametersState:
+    glx_probe: GLXProbe
     xrandr: XRandR
     hardware_list: LSPci
 
@@ -93,7 +114,7 @@ class HardwareProfile:
     preferred_roblox_renderer_string: str
     is_multi_gpu: bool
 
-    version: int = 2
+    version: int = 3
 
     @property
     def gpu_vendor(self) -> GPUVendor:
@@ -128,7 +149,7 @@ class HardwareProfile:
         provider = state.card_provider_lookup.get(card)
 
         return cls(
-            state.hardware_list.graphics_id,
+            graphics_id(),
             card.vendor.value,
             card.pci_id,
             card.can_do_vulkan,
@@ -152,7 +173,11 @@ def _collect_information(state: ComputeParametersState):
     if state.number_of_graphics_cards <= 0:
         raise RuntimeError("No graphics hardware")
 
-    state.graphics_cards_unordered = list(map(GraphicsCard, graphics_cards))
+    icd_catalog = vulkan_icd_catalog()
+    state.graphics_cards_unordered = list(map(
+        lambda entry: GraphicsCard(entry, vulkan_icd_catalog=icd_catalog),
+        graphics_cards
+    ))
     state.graphics_cards_ordered = list(
         sorted(
             state.graphics_cards_unordered,
@@ -162,10 +187,12 @@ def _collect_information(state: ComputeParametersState):
 
     # Let's just hope cards and providers always follow the same order here
     state.card_provider_lookup = dict(zip(state.graphics_cards_unordered, state.xrandr.providers))
+    _probe_prime_environments(state)
+
     state.can_prime_lookup = dict(zip(
         state.graphics_cards_unordered,
         map(
-            lambda card: can_prime_card(card, state.card_provider_lookup[card]),
+            lambda card: can_prime_card(card, state.card_provider_lookup[card], state.glx_probe),
             state.graphics_cards_unordered
         )
     ))
@@ -232,10 +259,10 @@ def _pick_renderer(state: ComputeParametersState):
         try:
             provider = state.card_provider_lookup.get(state.target_card, None)
             if state.should_prime and provider:
-                glx_info = GLXInfo(env=get_prime_env(state.target_card, provider))
+                glx_info = state.glx_probe.info(get_prime_env(state.target_card, provider))
 
             else:
-                glx_info = GLXInfo()
+                glx_info = state.glx_probe.baseline()
 
             # Some GPUs are so old that they do not even support a version of OpenGL high enough
             # for Roblox. In this case some mesa trickery is required.
@@ -267,6 +294,7 @@ def profile_hardware() -> HardwareProfile:
 
     try:
         state = ComputeParametersState()
+        state.glx_probe = GLXProbe()
 
         _collect_information(state)
         _consider_chassis(state)
@@ -0,0 +1,164 @@
+import json
+import logging
+from pathlib import Path
+from typing import Dict, Optional, Iterable, List
+
+from grapejuice_common import paths
+from grapejuice_common.hardware_info.hardware_profile import HardwareProfile
+
+log = logging.getLogger(__name__)
+
+N_KEEP_PROFILES = 8
+
+k_profiles = "profiles"
+
+
+def _profile_from_dict(fingerprint: str, profile_dict: Optional[Dict]) -> Optional[HardwareProfile]:
+    if profile_dict is None:
+        return None
+
+    try:
+        profile = HardwareProfile.from_dict(profile_dict)
+
+    except TypeError as e:
+        log.warning(f"Hardware profile for {fingerprint} is invalid: {e}")
+        return None
+
+    if profile.version != HardwareProfile.version:
+        return None
+
+    return profile
+
+
+def read_profiles_file(path: Path) -> Dict[str, Dict]:
+    """
+    Reads a file of hardware profiles keyed by fingerprint, as used by the cache and by exported profiles
+    """
+    with path.open("r") as fp:
+        profiles = json.load(fp).get(k_profiles, dict())
+
+    if not isinstance(profiles, dict):
+        raise ValueError(f"The profiles in '{path}' are not keyed by fingerprint")
+
+    return profiles
+
+
+def format_profiles(profiles: Dict[str, Dict]) -> str:
+    return json.dumps({k_profiles: profiles}, indent=2)
+
+
+class HardwareProfileCache:
+    """
+    Hardware profiles keyed by hardware fingerprint, stored in the user's cache directory
+    """
+    _location: Path
+    _profiles: Optional[Dict[str, Dict]] = None
+
+    def __init__(self, location: Optional[Path] = None):
+        self._location = location or paths.hardware_profile_cache_location()
+
+    @property
+    def location(self) -> Path:
+        return self._location
+
+    @property
+    def _entries(self) -> Dict[str, Dict]:
+        if self._profiles is None:
+            self._profiles = dict()
+
+            if self._location.exists():
+                try:
+                    self._profiles = read_profiles_file(self._location)
+
+                except (OSError, ValueError, AttributeError) as e:
+                    log.warning(f"Ignoring unreadable hardware profile cache at '{self._location}': {e}")
+
+        return self._profiles
+
+    def get(self, fingerprint: str) -> Optional[HardwareProfile]:
+        return _profile_from_dict(fingerprint, self._entries.get(fingerprint, None))
+
+    def put(self, fingerprint: str, profile: HardwareProfile, save: bool = True):
+        entries = self._entries
+
+        # Re-insert so the most recently stored profile is last, and the oldest ones are dropped first
+        entries.pop(fingerprint, None)
+        entries[fingerprint] = profile.as_dict
+
+        while len(entries) > N_KEEP_PROFILES:
+            entries.pop(next(iter(entries)))
+
+        if save:
+            self.save()
+
+    def export_profiles(self, fingerprints: Optional[Iterable[str]] = None) -> Dict[str, Dict]:
+        """
+        :param fingerprints: The fingerprints to export, all valid profiles are exported when omitted
+        """
+        fingerprints = list(self._entries.keys()) if fingerprints is None else list(fingerprints)
+        exported = dict()
+
+        for fingerprint in fingerprints:
+            profile = self.get(fingerprint)
+
+            if profile is not None:
+                exported[fingerprint] = profile.as_dict
+
+        return exported
+
+    def import_profiles(self, profiles: Dict[str, Dict]) -> List[str]:
+        """
+        Adds profiles exported on another machine to this cache. Invalid and outdated profiles are skipped. The cache
+        keeps N_KEEP_PROFILES profiles, so importing more than that drops the profiles that were imported first.
+        :return: The fingerprints of the imported profiles that are still in the cache
+        """
+        imported = []
+
+        for fingerprint, profile_dict in profiles.items():
+            profile = _profile_from_dict(fingerprint, profile_dict)
+
+            if profile is not None:
+                self.put(fingerprint, profile, save=False)
+                imported.append(fingerprint)
+
+        if imported:
+            self.save()
+
+        return [fingerprint for fingerprint in imported if fingerprint in self._entries]
+
+    def save(self):
+        log.debug(f"Saving hardware profile cache to '{self._location}'")
+
+        json_string = format_profiles(self._entries)
+
+        try:
+            self._location.parent.mkdir(parents=True, exist_ok=True)
+
+            with self._location.open("w+") as fp:
+                fp.write(json_string)
+
+        except OSError as e:
+            log.warning(f"Could not save the hardware profile cache: {e}")
+
+
+def find_shared_profile(fingerprint: str, directories: Optional[List[Path]] = None) -> Optional[HardwareProfile]:
+    """
+    Looks for a precomputed profile in the shared hardware profile directories. These directories contain files
+    written by `grapejuice hardware-profile export`, and are only ever read from.
+    """
+    directories = paths.shared_hardware_profile_directories() if directories is None else directories
+
+    for directory in filter(Path.is_dir, directories):
+        for profiles_file in sorted(directory.glob("*.json")):
+            try:
+                profile = _profile_from_dict(fingerprint, read_profiles_file(profiles_file).get(fingerprint, None))
+
+            except (OSError, ValueError, AttributeError) as e:
+                log.warning(f"Ignoring unreadable shared hardware profiles at '{profiles_file}': {e}")
+                continue
+
+            if profile is not None:
+                log.info(f"Found shared hardware profile for {fingerprint} in '{profiles_file}'")
+                return profile
+
+    return None
@@ -0,0 +1,75 @@
+import logging
+import os
+from collections import defaultdict
+from fnmatch import fnmatchcase
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from grapejuice_common.util.computed_field import ComputedField
+
+log = logging.getLogger(__name__)
+
+# Length of 'pci:v0000XXXX', used to bucket aliases by vendor so a lookup does not match against every alias
+VENDOR_PREFIX_LENGTH = 13
+WILDCARD_CHARACTERS = ("*", "?", "[")
+
+
+def modules_alias_path() -> Path:
+    return Path("/lib/modules") / os.uname().release / "modules.alias"
+
+
+def _vendor_prefix(pattern: str) -> Optional[str]:
+    prefix = pattern[:VENDOR_PREFIX_LENGTH]
+
+    if any(c in prefix for c in WILDCARD_CHARACTERS):
+        return None
+
+    return prefix.lower()
+
+
+class PCIModulesAliasIndex:
+    """
+    Resolves PCI modaliases to the kernel modules that can drive them, like lspci does for 'Kernel modules'
+    """
+    _buckets: Dict[Optional[str], List[tuple]]
+
+    def __init__(self, path: Optional[Path] = None):
+        self._buckets = defaultdict(list)
+
+        path = path or modules_alias_path()
+        if not path.is_file():
+            log.info(f"There is no modules.alias file at '{path}', kernel modules cannot be resolved")
+            return
+
+        with path.open("r", encoding="UTF-8", errors="replace") as fp:
+            for line_number, line in enumerate(fp):
+                if not line.startswith("alias pci:"):
+                    continue
+
+                split = line.split()
+                if len(split) < 3:
+                    continue
+
+                pattern, module = split[1], split[2]
+                self._buckets[_vendor_prefix(pattern)].append((line_number, pattern.lower(), module))
+
+    def modules_for(self, modalias: Optional[str]) -> List[str]:
+        if not modalias:
+            return []
+
+        modalias = modalias.lower()
+        # Keep the order of modules.alias so the result matches the order lspci reports
+        candidates = sorted([
+            *self._buckets.get(modalias[:VENDOR_PREFIX_LENGTH], []),
+            *self._buckets.get(None, [])
+        ])
+
+        modules = []
+        for _, pattern, module in candidates:
+            if module not in modules and fnmatchcase(modalias, pattern):
+                modules.append(module)
+
+        return modules
+
+
+system_modules_alias_index = ComputedField(PCIModulesAliasIndex)
@@ -1,12 +1,21 @@
 import hashlib
 import json
+import logging
 import re
 import subprocess
+import sys
 from dataclasses import dataclass, field
+from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 
+from grapejuice_common.hardware_info.kernel_modules import PCIModulesAliasIndex, system_modules_alias_index
+from grapejuice_common.hardware_info.pci_ids import PCINames
+from grapejuice_common.hardware_info.sysfs_pci import SYSFS_PCI_DEVICES, SysfsPCIDevice, read_revision, \
+    sysfs_pci_devices
 from grapejuice_common.util import environment_as
 
+log = logging.getLogger(__name__)
+
 
 def _stdout_encoding():
     return "UTF-8"
@@ -61,57 +70,143 @@ class LSPciEntry:
         return hash(json.dumps(self.attributes))
 
 
-class LSPci:
-    _entries: List[LSPciEntry]
+def lspci_command_output() -> str:
+    with environment_as({"LC_ALL": "C", "LANG": None}):
+        return subprocess.check_output(["lspci", "-vvv"]).decode(_stdout_encoding())
+
+
+def parse_lspci_output(content: str) -> List[LSPciEntry]:
+    entries: List[LSPciEntry] = []
+    work: Optional[LSPciEntry] = None
+
+    whitespace_ptn = re.compile(r"^\s+\w+")
+    pci_id_ptn = re.compile(r"([a-fA-F\d:\.]+)\s+(.*)\s*")
+
+    def explode_line(line_to_be_exploded: str):
+        s = line_to_be_exploded.split(":")
+        key = s[0]
+        value = ":".join(s[1:])
+
+        return key.strip().lower(), value.strip()
+
+    for line in content.split("\n"):
+        if not line.strip():
+            if work is not None:
+                entries.append(work)
+
+            work = None
+
+            continue
+
+        match = whitespace_ptn.search(line)
+        starts_with_whitespace = match is not None
+
+        if starts_with_whitespace:
+            k, v = explode_line(line.strip())
+
+        else:
+            match = pci_id_ptn.search(line)
+            assert match is not None, "Invalid line"
+
+            work = LSPciEntry(match.group(1))
+
+            k, v = explode_line(match.group(2))
+
+        assert work is not None, "Invalid state"
+        work.attributes[k] = v
+
+    if work is not None:
+        entries.append(work)
 
-    def __init__(self):
-        self._entries = []
+    return entries
 
-        with environment_as({"LC_ALL": "C", "LANG": None}):
-            content = subprocess.check_output(["lspci", "-vvv"]).decode(_stdout_encoding())
-            self._parse(content)
 
-    def _parse(self, content: str):
-        work: Optional[LSPciEntry] = None
+def _sysfs_device_description(
+    device: SysfsPCIDevice,
+    names: PCINames,
+    devices_directory: Path
+) -> str:
+    description = names.device_name(device.vendor_id, device.device_id)
 
-        whitespace_ptn = re.compile(r"^\s+\w+")
-        pci_id_ptn = re.compile(r"([a-fA-F\d:\.]+)\s+(.*)\s*")
+    revision = read_revision(device, devices_directory)
+    if revision > 0:
+        description += f" (rev {revision:02x})"
 
-        def explode_line(line_to_be_exploded: str):
-            s = line_to_be_exploded.split(":")
-            key = s[0]
-            value = ":".join(s[1:])
+    programming_interface_name = names.programming_interface_name(device.class_code)
+    if device.programming_interface or programming_interface_name:
+        description += f" (prog-if {device.programming_interface:02x}"
 
-            return key.strip().lower(), value.strip()
+        if programming_interface_name:
+            description += f" [{programming_interface_name}]"
 
-        for line in content.split("\n"):
-            if not line.strip():
-                if work is not None:
-                    self._entries.append(work)
+        description += ")"
 
-                work = None
+    return description
 
-                continue
 
-            match = whitespace_ptn.search(line)
-            starts_with_whitespace = match is not None
+def sysfs_entries(
+    devices_directory: Path = SYSFS_PCI_DEVICES,
+    pci_ids_path: Optional[Path] = None,
+    modules_alias_index: Optional[PCIModulesAliasIndex] = None
+) -> List[LSPciEntry]:
+    """
+    Builds lspci entries from sysfs. Only the attributes Grapejuice uses are filled in: the device class with its
+    description, the kernel driver in use and the kernel modules. Use lspci_command_output for the full picture.
+    """
+    devices = sysfs_pci_devices(devices_directory)
+    names = PCINames.load(set(map(lambda d: d.vendor_id, devices)), pci_ids_path)
+    modules_alias_index = modules_alias_index or system_modules_alias_index.value
 
-            if starts_with_whitespace:
-                k, v = explode_line(line.strip())
+    entries = []
 
-            else:
-                match = pci_id_ptn.search(line)
-                assert match is not None, "Invalid line"
+    for device in devices:
+        entry = LSPciEntry(device.pci_id)
+        entry.attributes[names.class_name(device.class_id).lower()] = \
+            _sysfs_device_description(device, names, devices_directory)
 
-                work = LSPciEntry(match.group(1))
+        if device.driver:
+            entry.attributes["kernel driver in use"] = device.driver
 
-                k, v = explode_line(match.group(2))
+        kernel_modules = modules_alias_index.modules_for(device.modalias)
+        if kernel_modules:
+            entry.attributes["kernel modules"] = ", ".join(kernel_modules)
 
-            assert work is not None, "Invalid state"
-            work.attributes[k] = v
+        entries.append(entry)
 
-        if work is not None:
-            self._entries.append(work)
+    return entries
+
+
+def _default_entries() -> List[LSPciEntry]:
+    if SYSFS_PCI_DEVICES.is_dir():
+        try:
+            return sysfs_entries()
+
+        except Exception as e:
+            log.error(f"Could not read PCI devices from sysfs, falling back to lspci: {e}")
+
+    return parse_lspci_output(lspci_command_output())
+
+
+class LSPci:
+    _entries: List[LSPciEntry]
+
+    def __init__(self, entries: Optional[List[LSPciEntry]] = None):
+        """
+        :param entries: Predetermined entries, when omitted the entries are read from sysfs with lspci as a fallback
+        """
+        self._entries = _default_entries() if entries is None else entries
+
+    @classmethod
+    def from_lspci(cls, content: Optional[str] = None) -> "LSPci":
+        return cls(parse_lspci_output(lspci_command_output() if content is None else content))
+
+    @classmethod
+    def from_sysfs(cls, *args, **kwargs) -> "LSPci":
+        return cls(sysfs_entries(*args, **kwargs))
+
+    @property
+    def entries(self) -> List[LSPciEntry]:
+        return list(self._entries)
 
     @property
     def graphics_cards(self) -> List[LSPciEntry]:
@@ -123,3 +218,15 @@ class LSPci:
         h.update(json.dumps([card.gpu_id_string for card in self.graphics_cards]).encode(_stdout_encoding()))
 
         return h.hexdigest()
+
+
+def main():
+    use_lspci = "--lspci" in sys.argv
+    lspci = LSPci.from_lspci() if use_lspci else LSPci()
+
+    for entry in lspci.entries:
+        print(entry.pci_id, json.dumps(entry.attributes, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+import gzip
+import logging
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple, IO
+
+log = logging.getLogger(__name__)
+
+PCI_IDS_LOCATIONS = [
+    Path("/usr/share/hwdata/pci.ids"),
+    Path("/usr/share/misc/pci.ids"),
+    Path("/usr/share/pci.ids"),
+    Path("/usr/local/share/pciids/pci.ids"),
+    Path("/usr/share/hwdata/pci.ids.gz"),
+    Path("/usr/share/misc/pci.ids.gz")
+]
+
+# Graphics cards are detected by their class name, so these should have a name even without a pci.ids database
+DEFAULT_CLASS_NAMES = {
+    0x0300: "VGA compatible controller",
+    0x0302: "3D controller"
+}
+
+PCI_IDS_LINE_PTN = re.compile(r"^(\t*)(C\s+)?([0-9a-fA-F]+)\s+(.*)$")
+
+
+def pci_ids_location() -> Optional[Path]:
+    return next(filter(Path.is_file, PCI_IDS_LOCATIONS), None)
+
+
+def _open_pci_ids(path: Path) -> IO:
+    if path.suffix == ".gz":
+        return gzip.open(path, "rt", encoding="UTF-8", errors="replace")
+
+    return path.open("r", encoding="UTF-8", errors="replace")
+
+
+@dataclass
+class PCINames:
+    """
+    Human readable names from the pci.ids database, the same database lspci uses to name devices
+    """
+    vendors: Dict[int, str] = field(default_factory=dict)
+    devices: Dict[Tuple[int, int], str] = field(default_factory=dict)
+    base_classes: Dict[int, str] = field(default_factory=dict)
+    classes: Dict[int, str] = field(default_factory=dict)
+    programming_interfaces: Dict[int, str] = field(default_factory=dict)
+
+    def device_name(self, vendor_id: int, device_id: int) -> str:
+        vendor_name = self.vendors.get(vendor_id, None)
+        device_name = self.devices.get((vendor_id, device_id), None)
+
+        if vendor_name is None:
+            return f"Device {vendor_id:04x}:{device_id:04x}"
+
+        return f"{vendor_name} {device_name or f'Device {device_id:04x}'}"
+
+    def class_name(self, class_id: int) -> str:
+        name = self.classes.get(class_id, None) or \
+            DEFAULT_CLASS_NAMES.get(class_id, None) or \
+            self.base_classes.get(class_id >> 8, None)
+
+        return name or f"Class {class_id:04x}"
+
+    def programming_interface_name(self, class_code: int) -> Optional[str]:
+        return self.programming_interfaces.get(class_code, None)
+
+    @classmethod
+    def load(cls, vendor_ids: Iterable[int], path: Optional[Path] = None) -> "PCINames":
+        """
+        Reads the names of the given vendors, their devices and all device classes in a single pass
+        :param vendor_ids: Only vendors in this collection have their names collected
+        :param path: Path to a pci.ids file, the system database is used when no path is given
+        """
+        names = cls()
+        path = path or pci_ids_location()
+
+        if path is None:
+            log.info("Could not find a pci.ids file, devices will not be named")
+            return names
+
+        vendor_ids = set(vendor_ids)
+        current_vendor: Optional[int] = None
+        current_base_class: Optional[int] = None
+        current_class: Optional[int] = None
+
+        with _open_pci_ids(path) as fp:
+            for line in fp:
+                if not line.strip() or line.startswith("#"):
+                    continue
+
+                match = PCI_IDS_LINE_PTN.match(line.rstrip("\n"))
+                if match is None:
+                    continue
+
+                depth = len(match.group(1))
+                identifier = int(match.group(3), 16)
+                name = match.group(4).strip()
+
+                if depth == 0:
+                    current_vendor = None
+                    current_base_class = None
+                    current_class = None
+
+                    if match.group(2) is not None:
+                        current_base_class = identifier
+                        names.base_classes[identifier] = name
+
+                    elif identifier in vendor_ids:
+                        current_vendor = identifier
+                        names.vendors[identifier] = name
+
+                elif depth == 1:
+                    if current_base_class is not None:
+                        current_class = (current_base_class << 8) | identifier
+                        names.classes[current_class] = name
+
+                    elif current_vendor is not None:
+                        names.devices[(current_vendor, identifier)] = name
+
+                elif depth == 2 and current_class is not None:
+                    names.programming_interfaces[(current_class << 8) | identifier] = name
+
+        return names
@@ -0,0 +1,188 @@
+import hashlib
+import json
+import logging
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from grapejuice_common.util.cache_utils import cache
+
+log = logging.getLogger(__name__)
+
+SYSFS_PCI_DEVICES = Path("/sys/bus/pci/devices")
+
+# PCI base class 0x03 is 'Display controller', these subclasses are the ones lspci reports as graphics cards
+PCI_CLASS_VGA_COMPATIBLE_CONTROLLER = 0x0300
+PCI_CLASS_3D_CONTROLLER = 0x0302
+
+GRAPHICS_PCI_CLASSES = (
+    PCI_CLASS_VGA_COMPATIBLE_CONTROLLER,
+    PCI_CLASS_3D_CONTROLLER
+)
+
+
+def _parse_hex(value: Optional[str]) -> int:
+    try:
+        return int(value, 16)
+
+    except (TypeError, ValueError):
+        return -1
+
+
+def _read_attribute(device_path: Path, name: str) -> Optional[str]:
+    try:
+        with (device_path / name).open("r") as fp:
+            return fp.read().strip()
+
+    except OSError:
+        return None
+
+
+def _read_hex_attribute(device_path: Path, name: str) -> int:
+    return _parse_hex(_read_attribute(device_path, name))
+
+
+def _read_link_name(device_path: Path, name: str) -> Optional[str]:
+    link_path = device_path / name
+
+    if not link_path.is_symlink():
+        return None
+
+    try:
+        return Path(os.readlink(link_path)).name
+
+    except OSError:
+        return None
+
+
+def _read_uevent(device_path: Path) -> Dict[str, str]:
+    content = _read_attribute(device_path, "uevent") or ""
+    uevent = dict()
+
+    for line in content.split("\n"):
+        k, sep, v = line.partition("=")
+
+        if sep:
+            uevent[k.strip()] = v.strip()
+
+    return uevent
+
+
+@dataclass(frozen=True)
+class SysfsPCIDevice:
+    address: str
+    class_code: int
+    vendor_id: int
+    device_id: int
+    driver: Optional[str] = None
+    modalias: Optional[str] = None
+
+    @property
+    def pci_id(self) -> str:
+        """
+        The device address as formatted by lspci, which leaves out the PCI domain when it is 0000
+        """
+        domain, _, short_address = self.address.partition(":")
+
+        if domain == "0000" and short_address:
+            return short_address
+
+        return self.address
+
+    @property
+    def class_id(self) -> int:
+        """
+        The class code without the programming interface byte
+        """
+        return self.class_code >> 8
+
+    @property
+    def programming_interface(self) -> int:
+        return self.class_code & 0xff
+
+    @property
+    def is_graphics_card(self) -> bool:
+        return self.class_id in GRAPHICS_PCI_CLASSES
+
+    @property
+    def fingerprint_string(self) -> str:
+        return f"{self.vendor_id:04x}:{self.device_id:04x} {self.driver or ''}".strip()
+
+    @classmethod
+    def from_sysfs(cls, device_path: Path) -> "SysfsPCIDevice":
+        # The uevent file holds most of what we need in a single read, the separate attribute files are a fallback
+        uevent = _read_uevent(device_path)
+        vendor_id, _, device_id = uevent.get("PCI_ID", "").partition(":")
+
+        if vendor_id and device_id and "PCI_CLASS" in uevent:
+            return cls(
+                address=device_path.name,
+                class_code=_parse_hex(uevent["PCI_CLASS"]),
+                vendor_id=_parse_hex(vendor_id),
+                device_id=_parse_hex(device_id),
+                driver=uevent.get("DRIVER", None),
+                modalias=uevent.get("MODALIAS", None)
+            )
+
+        return cls(
+            address=device_path.name,
+            class_code=_read_hex_attribute(device_path, "class"),
+            vendor_id=_read_hex_attribute(device_path, "vendor"),
+            device_id=_read_hex_attribute(device_path, "device"),
+            driver=_read_link_name(device_path, "driver"),
+            modalias=_read_attribute(device_path, "modalias")
+        )
+
+
+def sysfs_pci_devices(devices_directory: Path = SYSFS_PCI_DEVICES) -> List[SysfsPCIDevice]:
+    if not devices_directory.is_dir():
+        return []
+
+    return list(
+        map(
+            SysfsPCIDevice.from_sysfs,
+            sorted(devices_directory.iterdir(), key=lambda p: p.name)
+        )
+    )
+
+
+def sysfs_graphics_cards(devices_directory: Path = SYSFS_PCI_DEVICES) -> List[SysfsPCIDevice]:
+    return list(filter(lambda device: device.is_graphics_card, sysfs_pci_devices(devices_directory)))
+
+
+def sysfs_graphics_id(devices_directory: Path = SYSFS_PCI_DEVICES) -> Optional[str]:
+    """
+    Identifies the set of graphics cards in this machine without spawning any processes.
+    :return: A hex digest, or None when there is no sysfs PCI device directory
+    """
+    if not devices_directory.is_dir():
+        return None
+
+    cards = sysfs_graphics_cards(devices_directory)
+
+    h = hashlib.new("blake2s")
+    h.update(json.dumps([card.fingerprint_string for card in cards]).encode("UTF-8"))
+
+    return h.hexdigest()
+
+
+def read_revision(device: SysfsPCIDevice, devices_directory: Path = SYSFS_PCI_DEVICES) -> int:
+    return _read_hex_attribute(devices_directory / device.address, "revision")
+
+
+@cache()
+def graphics_id() -> str:
+    """
+    The graphics id used to decide if the saved hardware profile still matches this machine. It is read from sysfs
+    where possible, lspci is only used on systems that do not have a Linux style sysfs.
+    """
+    sysfs_id = sysfs_graphics_id()
+    if sysfs_id is not None:
+        return sysfs_id
+
+    log.info("Could not determine graphics id from sysfs, falling back to lspci")
+
+    from grapejuice_common.hardware_info.lspci import LSPci
+
+    return LSPci().graphics_id
@@ -0,0 +1,194 @@
+import json
+import logging
+import os
+import re
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+from grapejuice_common import paths
+from grapejuice_common.hardware_info.gpu_vendor import GPUVendor
+from grapejuice_common.util.cache_utils import cache
+
+log = logging.getLogger(__name__)
+
+ARCH_64 = "x86_64"
+ARCH_32 = "i686"
+REQUIRED_ARCHITECTURES = {ARCH_64, ARCH_32}
+
+# Environment variables that replace the ICD search, VK_DRIVER_FILES supersedes VK_ICD_FILENAMES in newer loaders
+ICD_OVERRIDE_VARIABLES = ("VK_DRIVER_FILES", "VK_ICD_FILENAMES")
+
+ARCH_SUFFIX_PTN = re.compile(r"[._-]?(x86_64|amd64|i686|i386|64|32)$")
+
+VENDOR_TOKENS = (
+    ("nvidia", GPUVendor.NVIDIA),
+    ("radeon", GPUVendor.AMD),
+    ("amd", GPUVendor.AMD),
+    ("intel", GPUVendor.INTEL)
+)
+
+
+def _split_path_list(value: Optional[str]) -> List[Path]:
+    return list(map(Path, filter(None, (value or "").split(os.path.pathsep))))
+
+
+def vulkan_icd_search_paths() -> List[Path]:
+    """
+    The directories the Vulkan loader searches for ICD manifests on Linux, in the loader's order
+    """
+    config_dirs = _split_path_list(os.environ.get("XDG_CONFIG_DIRS", None)) or [Path("/etc/xdg")]
+    data_dirs = _split_path_list(os.environ.get("XDG_DATA_DIRS", None)) or \
+        [Path("/usr/local/share"), Path("/usr/share")]
+
+    return [
+        paths.xdg_config_home() / "vulkan" / "icd.d",
+        *map(lambda p: p / "vulkan" / "icd.d", config_dirs),
+        Path("/etc/vulkan/icd.d"),
+        paths.local_share() / "vulkan" / "icd.d",
+        *map(lambda p: p / "vulkan" / "icd.d", data_dirs)
+    ]
+
+
+def _manifest_paths_from_override(override: str) -> List[Path]:
+    manifests = []
+
+    for p in _split_path_list(override):
+        if p.is_dir():
+            manifests.extend(sorted(p.glob("*.json")))
+
+        else:
+            manifests.append(p)
+
+    return manifests
+
+
+def vulkan_icd_manifest_paths() -> List[Path]:
+    for variable in ICD_OVERRIDE_VARIABLES:
+        override = os.environ.get(variable, "").strip()
+
+        if override:
+            log.info(f"Using Vulkan ICDs from ${variable}")
+            return _manifest_paths_from_override(override)
+
+    manifests = []
+    seen_directories = set()
+
+    for search_path in vulkan_icd_search_paths():
+        if search_path in seen_directories or not search_path.is_dir():
+            continue
+
+        seen_directories.add(search_path)
+        manifests.extend(sorted(search_path.glob("*.json")))
+
+    return manifests
+
+
+def _architecture(manifest_stem: str, library_arch: Optional[str]) -> Optional[str]:
+    if library_arch == "64":
+        return ARCH_64
+
+    if library_arch == "32":
+        return ARCH_32
+
+    match = ARCH_SUFFIX_PTN.search(manifest_stem)
+    if match is None:
+        # Manifests like nvidia_icd.json name a library the loader resolves for both architectures
+        return None
+
+    return ARCH_64 if match.group(1) in ("x86_64", "amd64", "64") else ARCH_32
+
+
+def _vendor(manifest_stem: str, library_path: str) -> GPUVendor:
+    haystack = f"{manifest_stem} {Path(library_path).name}".lower()
+
+    for token, vendor in VENDOR_TOKENS:
+        if token in haystack:
+            return vendor
+
+    return GPUVendor.UNKNOWN
+
+
+@dataclass(frozen=True)
+class VulkanICD:
+    manifest_path: Path
+    library_path: str
+    api_version: str
+    vendor: GPUVendor
+    family: str
+    architecture: Optional[str]
+    modification_time: int
+
+    @classmethod
+    def from_manifest(cls, manifest_path: Path) -> "VulkanICD":
+        with manifest_path.open("r") as fp:
+            manifest = json.load(fp)
+
+        icd = manifest.get("ICD", dict())
+        library_path = icd.get("library_path", "")
+        stem = manifest_path.stem
+
+        return cls(
+            manifest_path=manifest_path,
+            library_path=library_path,
+            api_version=icd.get("api_version", ""),
+            vendor=_vendor(stem, library_path),
+            family=ARCH_SUFFIX_PTN.sub("", stem),
+            architecture=_architecture(stem, icd.get("library_arch", None)),
+            modification_time=manifest_path.stat().st_mtime_ns
+        )
+
+
+class VulkanICDCatalog:
+    """
+    Every Vulkan ICD on this system, read in a single pass over the loader's search locations
+    """
+    _icds: List[VulkanICD]
+    _by_vendor: Dict[GPUVendor, List[VulkanICD]]
+
+    def __init__(self, manifest_paths: Optional[Iterable[Path]] = None):
+        self._icds = []
+        self._by_vendor = defaultdict(list)
+
+        for manifest_path in (vulkan_icd_manifest_paths() if manifest_paths is None else manifest_paths):
+            try:
+                icd = VulkanICD.from_manifest(manifest_path)
+
+            except (OSError, ValueError, AttributeError) as e:
+                log.warning(f"Ignoring invalid Vulkan ICD manifest '{manifest_path}': {e}")
+                continue
+
+            self._icds.append(icd)
+            self._by_vendor[icd.vendor].append(icd)
+
+        log.info(f"Found {len(self._icds)} Vulkan ICD(s): {', '.join(str(icd.manifest_path) for icd in self._icds)}")
+
+    @property
+    def icds(self) -> List[VulkanICD]:
+        return list(self._icds)
+
+    def for_vendor(self, vendor: GPUVendor) -> List[VulkanICD]:
+        return list(self._by_vendor.get(vendor, []))
+
+    def architectures(self, vendor: GPUVendor) -> Dict[str, Set[str]]:
+        """
+        :return: The architectures covered by each ICD family of the vendor
+        """
+        covered = defaultdict(set)
+
+        for icd in self.for_vendor(vendor):
+            covered[icd.family].update(REQUIRED_ARCHITECTURES if icd.architecture is None else {icd.architecture})
+
+        return dict(covered)
+
+    def supports_vendor(self, vendor: GPUVendor) -> bool:
+        """
+        Wine runs both 64-bit and 32-bit processes, so a single ICD family has to cover both architectures
+        """
+        return any(map(REQUIRED_ARCHITECTURES.issubset, self.architectures(vendor).values()))
+
+
+@cache()
+def vulkan_icd_catalog() -> VulkanICDCatalog:
+    return VulkanICDCatalog()
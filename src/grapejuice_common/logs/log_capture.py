@@ -0,0 +1,431 @@
+import gzip
+import importlib.util
+import logging
+import re
+import subprocess
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, List, Tuple, Dict, BinaryIO, Deque, Set
+
+log = logging.getLogger(__name__)
+
+MIB = 1024 * 1024
+
+DEFAULT_BUDGET_MIB = 64
+BUDGET_CHOICES_MIB = [16, 64, 256, 1024]
+
+# What is kept of the end of each stream, whatever the budget is
+DEFAULT_TAIL_BYTES = MIB
+
+# Wine does not always end its lines, like when a process crashes halfway through one
+MAX_LINE_BYTES = 64 * 1024
+
+# Seconds between flushes of the compressed log, so it can be read while the process is still running
+FLUSH_INTERVAL = 2.0
+
+# Seconds the pipes are drained after the process exited. Processes Wine starts along the way, like services.exe and
+# the wineserver, inherit the pipes and can keep them open for minutes after that.
+DRAIN_TIMEOUT = 2.0
+
+k_zstd = "zstd"
+k_gzip = "gzip"
+
+COMPRESSION_SUFFIXES = {
+    k_zstd: ".zst",
+    k_gzip: ".gz"
+}
+
+# Debug messages look like `0024:fixme:ntdll:NtQuerySystemInformation ...`, optionally with a timestamp and
+# process id in front of the thread id
+DEBUG_LINE_PTN = re.compile(rb"^(?:[0-9a-f.]+:)*(fixme|err|warn|trace):([A-Za-z0-9_]+):")
+DEBUG_RULE_PTN = re.compile(r"(fixme|err|warn|trace)?([+-])?([A-Za-z0-9_]+)")
+
+
+def best_compression() -> str:
+    # zstandard is optional, it compresses faster than gzip at a similar ratio
+    return k_zstd if importlib.util.find_spec("zstandard") is not None else k_gzip
+
+
+@dataclass(frozen=True)
+class _DebugRule:
+    debug_class: Optional[str]
+    channel: str
+    enabled: bool
+
+    def matches(self, debug_class: str, channel: str) -> bool:
+        return (self.debug_class is None or self.debug_class == debug_class) and \
+               self.channel in ("all", channel)
+
+
+class WinedebugFilter:
+    """
+    Drops Wine debug messages by class and channel, with the syntax of WINEDEBUG. `fixme-all,err+module` drops every
+    fixme and keeps the errors of the module channel. Like in Wine, later rules take priority over earlier ones, and
+    lines that are not debug messages are always kept.
+    """
+    _rules: List[_DebugRule]
+
+    def __init__(self, spec: str = ""):
+        self._rules = []
+
+        for item in filter(None, (s.strip() for s in spec.split(","))):
+            match = DEBUG_RULE_PTN.fullmatch(item)
+
+            if match is None:
+                raise ValueError(f"Invalid WINEDEBUG rule '{item}'")
+
+            debug_class, sign, channel = match.groups()
+            self._rules.append(_DebugRule(debug_class, channel, sign != "-"))
+
+        self._rules.reverse()
+
+    def accepts(self, line: bytes) -> bool:
+        match = DEBUG_LINE_PTN.match(line)
+        if match is None:
+            return True
+
+        debug_class = match.group(1).decode("ASCII")
+        channel = match.group(2).decode("ASCII")
+
+        for rule in self._rules:
+            if rule.matches(debug_class, channel):
+                return rule.enabled
+
+        return True
+
+
+@dataclass(frozen=True)
+class CaptureOptions:
+    """
+    :param budget_bytes: Compressed bytes the logs of a single launch may take up, shared by stdout and stderr
+    :param channel_filter: Debug messages to drop, in the syntax of WINEDEBUG
+    """
+    budget_bytes: int = DEFAULT_BUDGET_MIB * MIB
+    tail_bytes: int = DEFAULT_TAIL_BYTES
+    channel_filter: str = ""
+    compression: Optional[str] = None
+
+
+class CaptureBudget:
+    """
+    Compressed bytes written by the streams of a launch, which stop writing once the budget runs out
+    """
+    _budget_bytes: int
+    _used: Dict[str, int]
+    _lock: threading.Lock
+
+    def __init__(self, budget_bytes: int):
+        self._budget_bytes = budget_bytes
+        self._used = dict()
+        self._lock = threading.Lock()
+
+    @property
+    def used_bytes(self) -> int:
+        with self._lock:
+            return sum(self._used.values())
+
+    def update(self, stream_name: str, written_bytes: int) -> bool:
+        """
+        :return: Whether the streams are still within the budget
+        """
+        with self._lock:
+            self._used[stream_name] = written_bytes
+
+            return sum(self._used.values()) < self._budget_bytes
+
+
+class CompressedLog:
+    """
+    A log file that is compressed while it is written
+    """
+    _raw: BinaryIO
+    _writer: BinaryIO
+    _compression: str
+
+    def __init__(self, path: Path, compression: str):
+        self.path = path
+        self._compression = compression
+        self._raw = path.open("wb")
+
+        if compression == k_zstd:
+            import zstandard
+            self._writer = zstandard.ZstdCompressor(level=3).stream_writer(self._raw)
+
+        else:
+            self._writer = gzip.GzipFile(fileobj=self._raw, mode="wb", compresslevel=6)
+
+    @property
+    def compressed_size(self) -> int:
+        return self._raw.tell()
+
+    def write(self, data: bytes):
+        self._writer.write(data)
+
+    def flush(self):
+        if self._compression == k_zstd:
+            import zstandard
+            self._writer.flush(zstandard.FLUSH_BLOCK)
+
+        else:
+            self._writer.flush()
+
+        self._raw.flush()
+
+    def close(self):
+        self._writer.close()
+
+        # The zstd writer closes the file it writes to, gzip leaves it open
+        if not self._raw.closed:
+            self._raw.close()
+
+
+class _Tail:
+    _lines: Deque[bytes]
+    _size: int = 0
+
+    def __init__(self, max_bytes: int):
+        self._max_bytes = max_bytes
+        self._lines = deque()
+
+    def append(self, line: bytes):
+        self._lines.append(line)
+        self._size += len(line)
+
+        while self._size > self._max_bytes and len(self._lines) > 1:
+            self._size -= len(self._lines.popleft())
+
+    @property
+    def content(self) -> bytes:
+        return b"".join(self._lines)
+
+
+class StreamCapture:
+    """
+    Drains one output stream of a process into a compressed log, until the budget runs out. The end of the stream is
+    always kept in memory, and written to a separate tail log when the compressed log was cut short.
+    """
+    name: str
+    log_path: Path
+    tail_path: Path
+    captured_bytes: int = 0
+    filtered_bytes: int = 0
+    dropped_bytes: int = 0
+    truncated: bool = False
+    detached: bool = False
+
+    def __init__(
+        self,
+        name: str,
+        source: BinaryIO,
+        path_stem: Path,
+        budget: CaptureBudget,
+        options: CaptureOptions,
+        channel_filter: WinedebugFilter
+    ):
+        self.name = name
+        self._source = source
+        self._budget = budget
+        self._options = options
+        self._filter = channel_filter
+        self._tail = _Tail(options.tail_bytes)
+
+        compression = options.compression or best_compression()
+        self.log_path = path_stem.with_name(f"{path_stem.name}.log{COMPRESSION_SUFFIXES[compression]}")
+        self.tail_path = path_stem.with_name(f"{path_stem.name}.tail.log")
+
+        self._log: Optional[CompressedLog] = CompressedLog(self.log_path, compression)
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name=f"log-capture-{name}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def join(self, timeout: Optional[float] = None):
+        self._thread.join(timeout)
+
+    @property
+    def is_alive(self) -> bool:
+        return self._thread.is_alive()
+
+    def detach(self):
+        """
+        Finishes the logs while the pipe is still open. The thread keeps draining the pipe, but drops what it reads.
+        """
+        with self._lock:
+            if self.detached:
+                return
+
+            self.detached = True
+
+            if self._log is not None:
+                self._log.write(b"\n[Grapejuice] Stopped capturing, the pipe was still open after the process exited\n")
+
+            self._close_logs()
+
+        log.info(f"Detached from {self.log_path.name}, another process still holds the pipe")
+
+    def _stop_writing(self):
+        self.truncated = True
+
+        self._log.write(
+            f"\n[Grapejuice] The log budget ran out, the last lines are in {self.tail_path.name}\n".encode("UTF-8")
+        )
+        self._log.close()
+        self._log = None
+
+        log.warning(f"Log budget exhausted, only keeping the tail of {self.log_path.name}")
+
+    def _capture_line(self, line: bytes):
+        if self.detached:
+            self.dropped_bytes += len(line)
+            return
+
+        if not self._filter.accepts(line):
+            self.filtered_bytes += len(line)
+            return
+
+        self.captured_bytes += len(line)
+        self._tail.append(line)
+
+        if self._log is None:
+            self.dropped_bytes += len(line)
+            return
+
+        self._log.write(line)
+
+        if not self._budget.update(self.name, self._log.compressed_size):
+            self._stop_writing()
+
+    def _run(self):
+        last_flush = time.monotonic()
+
+        try:
+            for line in iter(lambda: self._source.readline(MAX_LINE_BYTES), b""):
+                with self._lock:
+                    self._capture_line(line)
+
+                    if self._log is not None and time.monotonic() - last_flush > FLUSH_INTERVAL:
+                        self._log.flush()
+                        self._budget.update(self.name, self._log.compressed_size)
+                        last_flush = time.monotonic()
+
+        except (OSError, ValueError) as e:
+            log.error(f"Stopped capturing {self.log_path.name}: {e}")
+
+        finally:
+            self._finish()
+
+    def _finish(self):
+        try:
+            self._source.close()
+
+        except OSError:
+            pass
+
+        with self._lock:
+            if not self.detached:
+                self._close_logs()
+
+    def _close_logs(self):
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+        if self.truncated:
+            try:
+                self.tail_path.write_bytes(self._tail.content)
+
+            except OSError as e:
+                log.error(f"Could not write the tail log {self.tail_path}: {e}")
+
+
+class LogCapture:
+    """
+    Captures stdout and stderr of a process through pipes, so their logs stay within a budget. The pipes are only
+    closed once every process holding them closed them, which can be long after the process itself exited. That is
+    why captures are finished with a timeout, and detached from what is left.
+    """
+    streams: List[StreamCapture]
+
+    def __init__(self, path_stem: Path, options: CaptureOptions):
+        self._path_stem = path_stem
+        self._options = options
+        self._budget = CaptureBudget(options.budget_bytes)
+        self.streams = []
+
+        try:
+            self._filter = WinedebugFilter(options.channel_filter)
+
+        except ValueError as e:
+            log.error(f"Not filtering the log: {e}")
+            self._filter = WinedebugFilter()
+
+    @property
+    def used_bytes(self) -> int:
+        return self._budget.used_bytes
+
+    def attach(self, proc: subprocess.Popen):
+        """
+        Starts capturing a process that was started with stdout=PIPE and stderr=PIPE
+        """
+        sources: List[Tuple[str, BinaryIO]] = [("stdout", proc.stdout), ("stderr", proc.stderr)]
+
+        for name, source in sources:
+            if source is None:
+                continue
+
+            stream = StreamCapture(
+                name,
+                source,
+                self._path_stem.with_name(f"{self._path_stem.name}_{name}"),
+                self._budget,
+                self._options,
+                self._filter
+            )
+
+            self.streams.append(stream)
+            stream.start()
+
+        with _active_captures_lock:
+            _active_captures.add(self)
+
+    def join(self, timeout: Optional[float] = None):
+        for stream in self.streams:
+            stream.join(timeout)
+
+    def finish(self, timeout: float = DRAIN_TIMEOUT):
+        """
+        Waits for the pipes to be drained, once the process exited, and detaches from the ones that are still open
+        when the timeout runs out
+        """
+        deadline = time.monotonic() + timeout
+
+        for stream in self.streams:
+            stream.join(max(0.0, deadline - time.monotonic()))
+
+        self.detach()
+
+    def detach(self):
+        for stream in filter(lambda s: s.is_alive, self.streams):
+            stream.detach()
+
+        with _active_captures_lock:
+            _active_captures.discard(self)
+
+
+_active_captures: Set[LogCapture] = set()
+_active_captures_lock = threading.Lock()
+
+
+def detach_all_captures():
+    """
+    Finishes the logs of every capture that is still running, before Grapejuice exits
+    """
+    with _active_captures_lock:
+        captures = list(_active_captures)
+
+    for capture in captures:
+        capture.detach()
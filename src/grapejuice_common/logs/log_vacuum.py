@@ -1,54 +1,62 @@
+import fcntl
+import gzip
 import logging
 import os
+import shutil
+import subprocess
+import sys
+import tarfile
 import time
+from dataclasses import dataclass
 from datetime import datetime
-from glob import glob
-from zipfile import ZipFile, ZIP_LZMA
+from pathlib import Path
+from typing import List, Optional, Iterator, Tuple
 
 from grapejuice_common import paths
+from grapejuice_common.wine.process_table import open_files_in
 
 LOG = logging.getLogger(__name__)
-N_KEEP_LOGS = 10
 
+MIB = 1024 * 1024
 
-def log_files():
-    return paths.logging_directory().glob("*.log")
+DEFAULT_BUDGET_MIB = 256
+DEFAULT_MAX_AGE_DAYS = 7
 
+# Logs that were written to recently may still belong to a running process
+ARCHIVE_AFTER_SECONDS = 60 * 60
 
-def archive_directory():
-    return paths.logging_directory() / "archive"
+# Seconds between the vacuums that are started when Grapejuice exits
+VACUUM_INTERVAL = 10 * 60
 
+CHUNK_SIZE = MIB
+MAX_WORKERS = 4
 
-def archive_files():
-    return glob(os.path.join(archive_directory(), "*.zip"))
+# Logs captured by log_capture are compressed already, and are archived as they are
+COMPRESSED_LOG_SUFFIXES = (".log.gz", ".log.zst")
+LOG_PATTERNS = ("*.log", *(f"*{suffix}" for suffix in COMPRESSED_LOG_SUFFIXES))
+ARCHIVE_PATTERNS = ("*.tar", "*.zip")
 
+LOCK_NAME = ".vacuum.lock"
 
-def archive_logs(old_log_files):
-    datetime_now = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    os.makedirs(archive_directory(), exist_ok=True)
-    archive_path = os.path.join(archive_directory(), f"{datetime_now}.zip")
 
-    LOG.info(f"Writing log archive {archive_path}")
+def log_files(directory: Optional[Path] = None) -> Iterator[Path]:
+    return (directory or paths.logging_directory()).glob("*.log")
 
-    with ZipFile(archive_path, "w", ZIP_LZMA) as zf:
-        for file in old_log_files:
-            log_stat = os.stat(file)
 
-            if 0 < log_stat.st_size < 2048:
-                with open(file, "rb") as fp:
-                    zf.writestr(os.path.basename(file), fp.read(), ZIP_LZMA)
+def archive_directory(directory: Optional[Path] = None) -> Path:
+    return (directory or paths.logging_directory()) / "archive"
 
-    for file in old_log_files:
-        LOG.debug(f"Removing log file {file}")
-        os.remove(file)
 
+def archive_files(directory: Optional[Path] = None) -> List[Path]:
+    """
+    Archives from oldest to newest, older archives were written as zip files
+    """
+    archives = archive_directory(directory)
 
-def can_delete_archive(file):
-    stat = os.stat(file)
-    time_delta = int(time.time()) - int(stat.st_ctime)
-
-    # Older than a week
-    return time_delta > 604800
+    return sorted(
+        (p for pattern in ARCHIVE_PATTERNS for p in archives.glob(pattern)),
+        key=lambda p: p.stat().st_mtime
+    )
 
 
 def remove_empty_logs():
@@ -64,14 +72,238 @@ def remove_empty_logs():
                 LOG.error(f"Failed to remove empty log file {file}:\n{e}")
 
 
-def vacuum_logs():
-    files = list(log_files())
+@dataclass(frozen=True)
+class VacuumPolicy:
+    """
+    :param budget_bytes: Bytes the logs and their archives may take up together, the oldest archives go first
+    :param max_age_seconds: Archives that have not been added to for this long are removed
+    """
+    budget_bytes: int = DEFAULT_BUDGET_MIB * MIB
+    max_age_seconds: int = DEFAULT_MAX_AGE_DAYS * 24 * 60 * 60
+    archive_after_seconds: int = ARCHIVE_AFTER_SECONDS
+
+    @property
+    def archive_size(self) -> int:
+        # A new archive is started once the newest one holds a quarter of the budget, so old logs can be dropped
+        # without dropping everything
+        return max(MIB, self.budget_bytes // 4)
+
+    @classmethod
+    def from_settings(cls) -> "VacuumPolicy":
+        from grapejuice_common.features.settings import current_settings, k_log_budget_mib, k_log_max_age_days
+
+        return cls(
+            budget_bytes=int(current_settings.get(k_log_budget_mib, DEFAULT_BUDGET_MIB)) * MIB,
+            max_age_seconds=int(current_settings.get(k_log_max_age_days, DEFAULT_MAX_AGE_DAYS)) * 24 * 60 * 60
+        )
+
+
+@dataclass
+class VacuumReport:
+    archived_logs: int = 0
+    archived_bytes: int = 0
+    removed_logs: int = 0
+    removed_archives: int = 0
+    removed_archive_bytes: int = 0
+
+
+def _size(path: Path) -> int:
+    try:
+        return path.stat().st_size
+
+    except FileNotFoundError:
+        return 0
+
+
+def _logs_to_archive(directory: Path, policy: VacuumPolicy, now: float, report: VacuumReport) -> List[Path]:
+    logs = []
+    # A process that is quiet for a while still writes to its log later on, and an unlinked log would take that with it
+    open_files = open_files_in(directory)
+
+    for pattern in LOG_PATTERNS:
+        for path in directory.glob(pattern):
+            if os.path.realpath(path) in open_files:
+                continue
+
+            try:
+                stat = path.stat()
+
+            except FileNotFoundError:
+                continue
+
+            if stat.st_size == 0:
+                path.unlink()
+                report.removed_logs += 1
+
+            elif now - stat.st_mtime > policy.archive_after_seconds:
+                logs.append((stat.st_mtime, path))
+
+    return [path for _, path in sorted(logs)]
+
+
+def _compress_log(log_path: Path, staging_directory: Path) -> Path:
+    """
+    Compresses a log in chunks, the workers of the pool run this in parallel
+    """
+    if log_path.name.endswith(COMPRESSED_LOG_SUFFIXES):
+        return log_path
+
+    compressed_path = staging_directory / f"{log_path.name}.gz"
+
+    with log_path.open("rb") as source, gzip.open(compressed_path, "wb", compresslevel=6) as target:
+        shutil.copyfileobj(source, target, CHUNK_SIZE)
+
+    return compressed_path
+
+
+def _open_newest_archive(directory: Path, policy: VacuumPolicy) -> tarfile.TarFile:
+    """
+    Opens the newest archive for appending, or starts a new one when it is full
+    """
+    archives = [p for p in archive_files(directory) if p.suffix == ".tar"]
+
+    if archives and _size(archives[-1]) < policy.archive_size:
+        try:
+            return tarfile.open(archives[-1], "a")
+
+        except tarfile.ReadError as e:
+            # Left behind by a vacuum that was interrupted
+            LOG.warning(f"Not appending to damaged log archive {archives[-1]}: {e}")
+
+    archive_path = archive_directory(directory) / f"{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.tar"
+    LOG.info(f"Starting log archive {archive_path}")
+
+    return tarfile.open(archive_path, "w")
+
+
+def archive_logs(log_paths: List[Path], policy: VacuumPolicy, directory: Path, report: VacuumReport):
+    """
+    Moves logs into archives. Logs are compressed in parallel and appended to the newest archive in order, a log is
+    only removed once it is in an archive.
+    """
+    # Imported here, remove_empty_logs runs at interpreter shutdown where importing the executor is no longer possible
+    from concurrent.futures import ThreadPoolExecutor
+
+    staging_directory = archive_directory(directory) / ".staging"
+    shutil.rmtree(staging_directory, ignore_errors=True)
+    staging_directory.mkdir(parents=True)
+
+    archive = None
+
+    try:
+        with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, os.cpu_count() or 1)) as executor:
+            compressed_logs: Iterator[Tuple[Path, Path]] = zip(
+                log_paths,
+                executor.map(lambda p: _compress_log(p, staging_directory), log_paths)
+            )
+
+            for log_path, compressed_path in compressed_logs:
+                if archive is None or archive.fileobj.tell() >= policy.archive_size:
+                    if archive is not None:
+                        archive.close()
+
+                    archive = _open_newest_archive(directory, policy)
+
+                archive.add(compressed_path, arcname=compressed_path.name)
+
+                report.archived_logs += 1
+                report.archived_bytes += _size(log_path)
+
+                log_path.unlink()
+
+    finally:
+        if archive is not None:
+            archive.close()
+
+        shutil.rmtree(staging_directory, ignore_errors=True)
+
+
+def expire_archives(policy: VacuumPolicy, directory: Path, now: float, report: VacuumReport):
+    archives = archive_files(directory)
+    total_size = sum(map(_size, archives)) + sum(_size(p) for pattern in LOG_PATTERNS for p in directory.glob(pattern))
+
+    for archive in archives:
+        archive_size = _size(archive)
+        expired = now - archive.stat().st_mtime > policy.max_age_seconds
+
+        if not expired and total_size <= policy.budget_bytes:
+            continue
+
+        LOG.info(f"Removing log archive {archive}")
+        archive.unlink()
+
+        total_size -= archive_size
+        report.removed_archives += 1
+        report.removed_archive_bytes += archive_size
+
+
+def vacuum_logs(policy: Optional[VacuumPolicy] = None, directory: Optional[Path] = None) -> Optional[VacuumReport]:
+    """
+    Archives logs that are no longer written to, and removes archives beyond the age and size of the policy
+    :return: What was done, None when another vacuum is running already
+    """
+    policy = policy or VacuumPolicy.from_settings()
+    directory = directory or paths.logging_directory()
+    archive_directory(directory).mkdir(parents=True, exist_ok=True)
+
+    with (directory / LOCK_NAME).open("a+") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+        except BlockingIOError:
+            return None
+
+        # The lock file doubles as the time of the last vacuum
+        os.utime(lock.fileno())
+
+        now = time.time()
+        report = VacuumReport()
+
+        logs = _logs_to_archive(directory, policy, now, report)
+        if logs:
+            archive_logs(logs, policy, directory, report)
+
+        expire_archives(policy, directory, now, report)
+
+        LOG.info(f"Log vacuum: {report}")
+
+        return report
+
+
+def vacuum_is_due(directory: Optional[Path] = None) -> bool:
+    lock_path = (directory or paths.logging_directory()) / LOCK_NAME
+
+    try:
+        return time.time() - lock_path.stat().st_mtime > VACUUM_INTERVAL
+
+    except FileNotFoundError:
+        return True
+
+
+def vacuum_logs_in_background():
+    """
+    Vacuums the logs in a separate process, so Grapejuice does not have to wait for it before exiting
+    """
+    if not vacuum_is_due():
+        return
+
+    env = dict(os.environ)
+    package_root = str(Path(__file__).resolve().parents[2])
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [package_root, env.get("PYTHONPATH", None)]))
+
+    try:
+        subprocess.Popen(
+            [sys.executable, "-m", "grapejuice_common.logs.log_vacuum"],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            env=env,
+            start_new_session=True
+        )
+
+    except OSError as e:
+        LOG.error(f"Could not start the log vacuum: {e}")
 
-    if len(files) >= 50:
-        files.sort(key=lambda f: os.stat(f).st_ctime)
-        old_files = files[:-N_KEEP_LOGS]
-        archive_logs(old_files)
 
-    for file in filter(can_delete_archive, archive_files()):
-        LOG.info(f"Removing log archive {file}")
-        os.remove(file)
+if __name__ == "__main__":
+    vacuum_logs()
@@ -25,6 +25,9 @@ class WineprefixConfigurationModel:
     use_mesa_gl_override: bool = False
     enable_winedebug: bool = False
     winedebug_string: str = ""
+    capture_logs: bool = False
+    log_budget_mib: int = 64
+    log_filter_string: str = ""
     roblox_renderer: str = RobloxRenderer.Undetermined.value
     env: Dict[str, str] = field(default_factory=dict)
     hints: List[str] = field(default_factory=list)
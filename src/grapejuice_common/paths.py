@@ -1,5 +1,6 @@
 import os
 from pathlib import Path
+from typing import List
 
 HERE = Path(__file__).resolve().parent
 
@@ -71,6 +72,10 @@ def wineprefixes_directory() -> Path:
     return local_share_grapejuice() / "prefixes"
 
 
+def roblox_version_archive_directory() -> Path:
+    return local_share_grapejuice() / "roblox_version_archive"
+
+
 def application_manifest() -> Path:
     return local_share_grapejuice() / "package_manifest.json"
 
@@ -171,6 +176,35 @@ def fast_flag_cache_location() -> Path:
     return grapejuice_cache_directory() / "fast_flags.json"
 
 
+def wine_build_cache_location() -> Path:
+    return grapejuice_cache_directory() / "wine_builds.json"
+
+
+def artifact_cache_directory() -> Path:
+    return grapejuice_cache_directory() / "artifacts"
+
+
+def http_cache_directory() -> Path:
+    return grapejuice_cache_directory() / "http"
+
+
+def registry_index_directory() -> Path:
+    return grapejuice_cache_directory() / "registry_index"
+
+
+def hardware_profile_cache_location() -> Path:
+    return grapejuice_cache_directory() / "hardware_profiles.json"
+
+
+def shared_hardware_profile_directories() -> List[Path]:
+    directories = [Path("/etc/grapejuice/hardware_profiles")]
+
+    if "GRAPEJUICE_HARDWARE_PROFILE_DIRECTORY" in os.environ:
+        directories.insert(0, Path(os.environ["GRAPEJUICE_HARDWARE_PROFILE_DIRECTORY"]).resolve())
+
+    return directories
+
+
 # TODO: Add method to extract this data
 path_resolve_record = dict()
 
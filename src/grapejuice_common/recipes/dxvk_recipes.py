@@ -1,14 +1,12 @@
-import io
 import json
 import logging
 import tarfile
 from pathlib import Path
 
-import requests
-
 from grapejuice_common import variables
 from grapejuice_common.recipes.recipe import Recipe
-from grapejuice_common.wine.registry_file import RegistryFile
+from grapejuice_common.util.downloader import artifact_downloader
+from grapejuice_common.wine.registry_index import find_registry_key
 from grapejuice_common.wine.wineprefix import Wineprefix
 
 DXVK_OVERRIDES = ('d3d10core', 'd3d11', 'd3d9')
@@ -28,10 +26,7 @@ def _dxvk_is_installed(prefix: Wineprefix) -> bool:
     if not prefix.paths.user_registry_hive.exists():
         return False
 
-    hive = RegistryFile(prefix.paths.user_registry_hive)
-    hive.load()
-
-    dll_overrides_key = hive.find_key(r"Software\\Wine\\DllOverrides")
+    dll_overrides_key = find_registry_key(prefix.paths.user_registry_hive, r"Software\\Wine\\DllOverrides")
     if not dll_overrides_key:
         return False
 
@@ -90,14 +85,13 @@ class InstallDXVKRecipe(Recipe):
     def _make_in(self, prefix: Wineprefix):
         release = variables.current_dxvk_release()
 
-        response = requests.get(release.download_url)
-        response.raise_for_status()
+        # Release URLs are versioned, so a tarball downloaded for another prefix can be used as-is
+        artifact = artifact_downloader.value.fetch(release.download_url, revalidate=False)
 
         prefix.paths.dxvk_directory.mkdir(parents=True, exist_ok=True)
 
-        with io.BytesIO(response.content) as fp:
-            with tarfile.open(fileobj=fp, mode="r:gz") as tf:
-                tf.extractall(prefix.paths.dxvk_directory)
+        with tarfile.open(artifact.path, mode="r:gz") as tf:
+            tf.extractall(prefix.paths.dxvk_directory)
 
         versioned_dxvk_directory = prefix.paths.dxvk_directory / f"dxvk-{release.version}"
         if not versioned_dxvk_directory.exists():
@@ -1,11 +1,9 @@
-import io
 import json
 import logging
 import zipfile
 
-import requests
-
 from grapejuice_common.recipes.recipe import Recipe
+from grapejuice_common.util.downloader import artifact_downloader
 from grapejuice_common.wine.wineprefix import Wineprefix
 
 log = logging.getLogger(__name__)
@@ -50,12 +48,10 @@ class FpsUnlockerRecipe(Recipe):
         package_path = prefix.paths.fps_unlocker_directory
         package_path.mkdir(parents=True, exist_ok=True)
 
-        response = requests.get(release.download_url)
-        response.raise_for_status()
+        artifact = artifact_downloader.value.fetch(release.download_url, revalidate=False)
 
-        with io.BytesIO(response.content) as fp:
-            with zipfile.ZipFile(fp) as zf:
-                zf.extractall(package_path)
+        with zipfile.ZipFile(artifact.path) as zf:
+            zf.extractall(package_path)
 
         md_path = _fps_unlocker_metadata_path(prefix)
         with md_path.open("w+", encoding=variables.text_encoding()) as fp:
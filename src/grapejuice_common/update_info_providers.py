@@ -1,4 +1,3 @@
-import io
 import logging
 import os
 import re
@@ -15,10 +14,13 @@ from packaging import version
 from grapejuice_common import variables, paths
 from grapejuice_common.features import settings
 from grapejuice_common.logs.log_util import log_function
+from grapejuice_common.util.downloader import artifact_downloader
+from grapejuice_common.util.http_client import http_client
 
 LOG = logging.getLogger(__name__)
 
 VERSION_PTN = re.compile(r"__version__\s*=\s*\"([\d\.]+)\".*")
+UPDATE_CHECK_TTL = 60 * 15
 
 
 class UpdateError(RuntimeError):
@@ -39,9 +41,15 @@ class UpdateInformationProvider(ABC):
             return UpdateInformationProvider._cached_gitlab_version
 
         url = variables.git_grapejuice_init()
-        response = requests.get(url)
 
-        if response.status_code < 200 or response.status_code > 299:
+        try:
+            response = http_client.value.get_metadata(url, ttl=UPDATE_CHECK_TTL)
+
+        except requests.exceptions.RequestException as e:
+            LOG.error(f"Failed to reach GitLab for the version of grapejuice, returning version 0: {e}")
+            return version.parse("0.0.0")
+
+        if not response.ok:
             LOG.error(
                 "Failed to get the version of grapejuice on GitLab. Returning version 0\n"
                 f"URL: {url}\n"
@@ -109,9 +117,11 @@ class SourceUpdateInformationProvider(UpdateInformationProvider):
         LOG.info(f"Temporary files path at: {tmp_path}")
         update_package_path = os.path.join(tmp_path, "update")
 
-        response = requests.get(variables.git_source_tarball())
-        if response.status_code < 200 or response.status_code > 299:
-            raise UpdateError(f"Received HTTP error {response.status_code} from GitLab")
+        try:
+            artifact = artifact_downloader.value.fetch(variables.git_source_tarball())
+
+        except requests.exceptions.HTTPError as e:
+            raise UpdateError(f"Received HTTP error {e.response.status_code} from GitLab") from e
 
         if os.path.exists(update_package_path):
             LOG.warning(f"Removing existing update package: {update_package_path}")
@@ -121,8 +131,7 @@ class SourceUpdateInformationProvider(UpdateInformationProvider):
             LOG.debug(f"Creating update package directory: {update_package_path}")
             os.makedirs(update_package_path)
 
-        fp = io.BytesIO(response.content)
-        with tarfile.open(fileobj=fp) as tar:
+        with tarfile.open(artifact.path) as tar:
             tar.extractall(update_package_path)
 
         cwd = os.getcwd()
@@ -134,10 +143,6 @@ class SourceUpdateInformationProvider(UpdateInformationProvider):
         subprocess.check_call([sys.executable, "./install.py"])
         os.chdir(cwd)
 
-        fp.close()
-        del fp
-        del response
-
         shutil.rmtree(tmp_path)
 
 
@@ -18,14 +18,16 @@ def prepare_uri(uri):
         return None
 
 
-def download_file(url, target_path: Path):
-    import requests
-
-    response = requests.get(url)
-    response.raise_for_status()
-
-    with open(target_path, "wb+") as fp:
-        fp.write(response.content)
+def download_file(url, target_path: Path, **kwargs):
+    """
+    Downloads a file through the shared artifact cache and copies it to the target path
+    :param kwargs: Passed on to ArtifactDownloader.fetch
+    """
+    import shutil
+    from grapejuice_common.util.downloader import artifact_downloader
+
+    artifact = artifact_downloader.value.fetch(url, **kwargs)
+    shutil.copyfile(artifact.path, target_path)
 
     return target_path
 
@@ -1,22 +1,373 @@
-from typing import Optional, MutableMapping
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Optional, MutableMapping, Dict, Callable, Any, Hashable, Tuple
 
+from grapejuice_common.util.event import Event
 
-def cache(cache_object: Optional[MutableMapping] = None):
-    if cache_object is None:
-        cache_object = dict()
+log = logging.getLogger(__name__)
+
+_NOTHING = object()
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    invalidations: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return (self.hits / total) if total > 0 else 0.0
+
+    @property
+    def as_dict(self) -> Dict[str, Any]:
+        return {**asdict(self), "hit_ratio": self.hit_ratio}
+
+
+@dataclass
+class CacheEntry:
+    value: Any
+    expires_at: Optional[float] = None
+
+    def is_expired(self, now: float) -> bool:
+        return self.expires_at is not None and now >= self.expires_at
+
+
+class _Computation:
+    """
+    A computation in progress, callers asking for the same key wait for it instead of computing the value again
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = _NOTHING
+        self.error: Optional[BaseException] = None
+
+
+def _persistent_cache_location(name: str) -> Path:
+    from grapejuice_common import paths
+
+    return paths.grapejuice_cache_directory() / "memo" / f"{name}.json"
+
+
+class MemoCache:
+    """
+    A thread safe LRU cache with optional per-entry expiry and optional persistence to the user's cache directory.
+    Persisted caches can only hold JSON serializable keys and values.
+    """
+    name: str
+    invalidated: Event
+
+    _storage: MutableMapping[Hashable, CacheEntry]
+    _max_size: Optional[int]
+    _ttl: Optional[float]
+    _persist: bool
+    _persistent_location: Optional[Path] = None
+    _did_load_persistent_entries: bool = False
+
+    def __init__(
+        self,
+        name: str,
+        max_size: Optional[int] = None,
+        ttl: Optional[float] = None,
+        persist: bool = False,
+        storage: Optional[MutableMapping] = None,
+        persistent_location: Optional[Path] = None
+    ):
+        """
+        :param name: Name of the cache, used for statistics and as the persistent file name
+        :param max_size: Maximum number of entries, the least recently used entries are evicted first
+        :param ttl: Seconds an entry stays valid, entries do not expire when omitted
+        :param persist: Store entries on disk so they outlive the process
+        :param storage: Mapping that holds the entries, useful for sharing entries between caches
+        :param persistent_location: Overrides the location of the persistent cache file
+        """
+        self.name = name
+        self.invalidated = Event()
+        self.stats = CacheStats()
+
+        self._storage = OrderedDict() if storage is None else storage
+        self._max_size = max_size
+        self._ttl = ttl
+        self._persist = persist or (persistent_location is not None)
+        self._persistent_location = persistent_location
+        self._lock = threading.RLock()
+        self._computations: Dict[Hashable, _Computation] = dict()
+
+    @property
+    def persistent_location(self) -> Path:
+        if self._persistent_location is None:
+            self._persistent_location = _persistent_cache_location(self.name)
+
+        return self._persistent_location
+
+    def __len__(self):
+        with self._lock:
+            return len(self._storage)
+
+    def _now(self) -> float:
+        # Wall clock time because persisted expiry times have to make sense in another process
+        return time.time()
+
+    def _load_persistent_entries(self):
+        if not self._persist or self._did_load_persistent_entries:
+            return
+
+        self._did_load_persistent_entries = True
+        location = self.persistent_location
+
+        if not location.exists():
+            return
+
+        try:
+            with location.open("r") as fp:
+                persisted = json.load(fp)
+
+            now = self._now()
+
+            for item in persisted:
+                key = _thaw_key(item["key"])
+                entry = CacheEntry(item["value"], item.get("expires_at", None))
+
+                if not entry.is_expired(now):
+                    self._storage[key] = entry
+
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            log.warning(f"Ignoring unreadable persistent cache '{location}': {e}")
+
+    def _save_persistent_entries(self):
+        if not self._persist:
+            return
+
+        location = self.persistent_location
+        # Written next to the cache and moved over it, so a crash or another process never sees half a file
+        temporary_location = location.with_name(f"{location.name}.{os.getpid()}.tmp")
+
+        try:
+            items = [
+                {"key": key, "value": entry.value, "expires_at": entry.expires_at}
+                for key, entry in self._storage.items()
+            ]
+            json_string = json.dumps(items)
+
+            location.parent.mkdir(parents=True, exist_ok=True)
+            temporary_location.write_text(json_string)
+            os.replace(temporary_location, location)
+
+        except (OSError, TypeError, ValueError) as e:
+            log.warning(f"Could not persist cache '{self.name}': {e}")
+
+            if temporary_location.exists():
+                temporary_location.unlink()
+
+    def _lookup(self, key: Hashable):
+        entry = self._storage.get(key, None)
+        if entry is None:
+            return _NOTHING
+
+        if entry.is_expired(self._now()):
+            self._storage.pop(key, None)
+            self.stats.expirations += 1
+
+            return _NOTHING
+
+        if isinstance(self._storage, OrderedDict):
+            self._storage.move_to_end(key)
+
+        return entry.value
+
+    def _store(self, key: Hashable, value: Any):
+        expires_at = None if self._ttl is None else self._now() + self._ttl
+        self._storage[key] = CacheEntry(value, expires_at)
+
+        if isinstance(self._storage, OrderedDict):
+            self._storage.move_to_end(key)
+
+        while self._max_size is not None and len(self._storage) > self._max_size:
+            self._storage.pop(next(iter(self._storage)))
+            self.stats.evictions += 1
+
+        self._save_persistent_entries()
+
+    def get(self, key: Hashable, default_value: Any = None) -> Any:
+        with self._lock:
+            self._load_persistent_entries()
+            value = self._lookup(key)
+
+        return default_value if value is _NOTHING else value
+
+    def put(self, key: Hashable, value: Any):
+        with self._lock:
+            self._load_persistent_entries()
+            self._store(key, value)
+
+    def get_or_compute(self, key: Hashable, factory: Callable[[], Any], store_none: bool = True) -> Any:
+        """
+        Returns the cached value, or computes it. Concurrent callers for the same key share a single computation.
+        """
+        with self._lock:
+            self._load_persistent_entries()
+            value = self._lookup(key)
+
+            if value is not _NOTHING:
+                self.stats.hits += 1
+                return value
+
+            self.stats.misses += 1
+            computation = self._computations.get(key, None)
+            is_owner = computation is None
+
+            if is_owner:
+                computation = _Computation()
+                self._computations[key] = computation
+
+        if not is_owner:
+            computation.done.wait()
+
+            if computation.error is not None:
+                raise computation.error
+
+            return computation.value
+
+        try:
+            computation.value = factory()
+
+            with self._lock:
+                # The computation may have been invalidated while running, do not store stale values in that case
+                if self._computations.get(key, None) is computation and \
+                    (store_none or computation.value is not None):
+                    self._store(key, computation.value)
+
+            return computation.value
+
+        except BaseException as e:
+            computation.error = e
+            raise
+
+        finally:
+            with self._lock:
+                if self._computations.get(key, None) is computation:
+                    self._computations.pop(key)
+
+            computation.done.set()
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._load_persistent_entries()
+            self._storage.pop(key, None)
+            self._computations.pop(key, None)
+            self.stats.invalidations += 1
+
+            self._save_persistent_entries()
+
+        self.invalidated(key)
+
+    def clear(self):
+        with self._lock:
+            self._storage.clear()
+            self._computations.clear()
+            self.stats.invalidations += 1
+            self._did_load_persistent_entries = True
+
+            self._save_persistent_entries()
+
+        self.invalidated(None)
+
+
+def _thaw_key(key: Any) -> Hashable:
+    if isinstance(key, list):
+        return tuple(map(_thaw_key, key))
+
+    return key
+
+
+def _make_key(args: Tuple, kwargs: Dict[str, Any]) -> Hashable:
+    if not kwargs:
+        return args
+
+    return args, tuple(sorted(kwargs.items()))
+
+
+_registry: Dict[str, MemoCache] = dict()
+_registry_lock = threading.Lock()
+
+
+def _register(memo_cache: MemoCache):
+    with _registry_lock:
+        _registry[memo_cache.name] = memo_cache
+
+
+def cache_statistics() -> Dict[str, Dict[str, Any]]:
+    with _registry_lock:
+        return {name: memo_cache.stats.as_dict for name, memo_cache in _registry.items()}
+
+
+def invalidate_all_caches():
+    with _registry_lock:
+        caches = list(_registry.values())
+
+    for memo_cache in caches:
+        memo_cache.clear()
+
+
+def log_cache_statistics(level: int = logging.DEBUG):
+    for name, stats in cache_statistics().items():
+        if stats["hits"] or stats["misses"]:
+            log.log(level, f"Cache {name}: {json.dumps(stats)}")
+
+
+def cache(
+    cache_object: Optional[MutableMapping] = None,
+    max_size: Optional[int] = 128,
+    ttl: Optional[float] = None,
+    persist: bool = False,
+    cache_none: bool = False
+):
+    """
+    Memoizes a function by its arguments, which have to be hashable.
+    The wrapped function exposes `cache`, `invalidate(*args, **kwargs)` and `cache_clear()`.
+    :param cache_object: Mapping to keep the entries in
+    :param max_size: Maximum number of remembered results, unbounded when None
+    :param ttl: Seconds a result stays valid
+    :param persist: Keep results on disk in the user's cache directory, results must be JSON serializable
+    :param cache_none: Whether None results should be remembered, by default they are computed again on the next call
+    """
 
     def decorator(fn):
-        def wrapper(*args, **kwargs):
-            cache_key = hash((hash(fn) * args, *list(kwargs.items())))
-            cache_item = cache_object.get(cache_key, None)
+        memo_cache = MemoCache(
+            f"{fn.__module__}.{fn.__qualname__}",
+            max_size=max_size,
+            ttl=ttl,
+            persist=persist,
+            storage=cache_object
+        )
 
-            if cache_item is not None:
-                return cache_item
+        _register(memo_cache)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            return memo_cache.get_or_compute(
+                _make_key(args, kwargs),
+                lambda: fn(*args, **kwargs),
+                store_none=cache_none
+            )
 
-            cache_item = fn(*args, **kwargs)
-            cache_object[cache_key] = cache_item
+        def invalidate(*args, **kwargs):
+            memo_cache.invalidate(_make_key(args, kwargs))
 
-            return cache_item
+        wrapper.cache = memo_cache
+        wrapper.invalidate = invalidate
+        wrapper.cache_clear = memo_cache.clear
 
         return wrapper
 
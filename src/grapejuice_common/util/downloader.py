@@ -0,0 +1,546 @@
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Dict, Callable, Any, List, Tuple
+
+import requests
+
+from grapejuice_common import paths
+from grapejuice_common.errors import DownloadVerificationError
+from grapejuice_common.util.computed_field import ComputedField
+from grapejuice_common.util.event import Event
+from grapejuice_common.util.http_client import HTTPClient, http_client
+
+log = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 256
+
+# Seconds between progress events, the final event is always emitted
+PROGRESS_INTERVAL = 0.1
+
+# Files no URL refers to any more are kept within these bounds, a download that names its digest can still use them
+UNREFERENCED_BUDGET_BYTES = 64 * 1024 * 1024
+MAX_UNREFERENCED_AGE_SECONDS = 7 * 24 * 60 * 60
+
+# Interrupted downloads that were not resumed for this long are given up on
+MAX_PARTIAL_AGE_SECONDS = 7 * 24 * 60 * 60
+
+k_url = "url"
+k_sha256 = "sha256"
+k_size = "size"
+k_etag = "etag"
+k_last_modified = "last_modified"
+k_total = "total"
+
+
+@dataclass(frozen=True)
+class DownloadProgress:
+    url: str
+    received_bytes: int
+    total_bytes: Optional[int]
+    from_cache: bool = False
+
+    @property
+    def fraction(self) -> Optional[float]:
+        if not self.total_bytes:
+            return None
+
+        return min(1.0, self.received_bytes / self.total_bytes)
+
+
+ProgressCallback = Callable[[DownloadProgress], None]
+
+# Fired for every download, in the thread that performs the download
+download_progress = Event()
+
+
+@dataclass(frozen=True)
+class Artifact:
+    url: str
+    sha256: str
+    size: int
+    path: Path
+
+
+def _url_digest(url: str) -> str:
+    return hashlib.sha256(url.encode("UTF-8")).hexdigest()
+
+
+def _sha256_of_file(path: Path) -> "hashlib._Hash":
+    digest = hashlib.sha256()
+
+    with path.open("rb") as fp:
+        for chunk in iter(lambda: fp.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+
+    return digest
+
+
+def _write_json(path: Path, value: Any):
+    temporary_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    temporary_path.write_text(json.dumps(value))
+    os.replace(temporary_path, path)
+
+
+def _stat_or_none(path: Path) -> Optional[os.stat_result]:
+    try:
+        return path.stat()
+
+    except FileNotFoundError:
+        return None
+
+
+def _read_json(path: Path) -> Optional[Dict]:
+    try:
+        return json.loads(path.read_text())
+
+    except FileNotFoundError:
+        return None
+
+    except (OSError, ValueError) as e:
+        log.warning(f"Ignoring unreadable download metadata at '{path}': {e}")
+        return None
+
+
+class ArtifactCache:
+    """
+    Downloaded files stored by their SHA-256 digest, with an index of the URL each file was downloaded from.
+    The cache is shared by every wineprefix.
+    """
+    _directory: Path
+
+    def __init__(self, directory: Optional[Path] = None):
+        self._directory = directory or paths.artifact_cache_directory()
+
+    @property
+    def directory(self) -> Path:
+        return self._directory
+
+    @property
+    def _index_path(self) -> Path:
+        return self._directory / "index.json"
+
+    def blob_path(self, sha256: str) -> Path:
+        return self._directory / "blobs" / sha256[:2] / sha256
+
+    def partial_path(self, url: str) -> Path:
+        return self._directory / "partial" / f"{_url_digest(url)}.part"
+
+    def partial_metadata_path(self, url: str) -> Path:
+        return self._directory / "partial" / f"{_url_digest(url)}.json"
+
+    @contextmanager
+    def lock(self, name: str):
+        """
+        Locks a name across processes, so two Grapejuice instances never write the same file
+        """
+        lock_path = self._directory / "locks" / f"{name}.lock"
+        lock_path.parent.mkdir(parents=True, exist_ok=True)
+
+        with lock_path.open("a+") as fp:
+            fcntl.flock(fp, fcntl.LOCK_EX)
+
+            try:
+                yield
+
+            finally:
+                fcntl.flock(fp, fcntl.LOCK_UN)
+
+    def _index(self) -> Dict[str, Dict]:
+        return _read_json(self._index_path) or dict()
+
+    def artifact_for_digest(self, sha256: str, url: str = "") -> Optional[Artifact]:
+        blob = self.blob_path(sha256)
+
+        try:
+            return Artifact(url, sha256, blob.stat().st_size, blob)
+
+        except FileNotFoundError:
+            return None
+
+    def lookup(self, url: str) -> Optional[Dict]:
+        """
+        :return: The index record of the URL, if its file is still present
+        """
+        record = self._index().get(url, None)
+
+        if record is None:
+            return None
+
+        artifact = self.artifact_for_digest(record.get(k_sha256, ""), url)
+        if artifact is None or artifact.size != record.get(k_size, -1):
+            return None
+
+        return record
+
+    def artifact(self, record: Dict) -> Artifact:
+        return Artifact(record[k_url], record[k_sha256], record[k_size], self.blob_path(record[k_sha256]))
+
+    def store(self, url: str, partial_path: Path, sha256: str, size: int, validators: Dict[str, str]) -> Artifact:
+        blob = self.blob_path(sha256)
+        blob.parent.mkdir(parents=True, exist_ok=True)
+
+        record = {k_url: url, k_sha256: sha256, k_size: size, **validators}
+
+        # The file is moved in while the index is locked, so a sweep never sees it before its record
+        with self.lock("index"):
+            if blob.exists():
+                # Same content from a different URL, the existing file is just as good
+                partial_path.unlink()
+
+            else:
+                os.replace(partial_path, blob)
+
+            index = self._index()
+            previous_record = index.get(url, None)
+            index[url] = record
+            _write_json(self._index_path, index)
+
+            if previous_record is not None and previous_record.get(k_sha256, sha256) != sha256:
+                self._remove_unreferenced(previous_record[k_sha256], index)
+
+            self._sweep(index)
+
+        return self.artifact(record)
+
+    def _remove_unreferenced(self, sha256: str, index: Dict[str, Dict]):
+        if any(record.get(k_sha256, None) == sha256 for record in index.values()):
+            return
+
+        log.info(f"Removing {sha256} from the artifact cache, no URL refers to it any more")
+
+        try:
+            self.blob_path(sha256).unlink()
+
+        except FileNotFoundError:
+            pass
+
+    def _stale_partial_files(self, now: float) -> List[Path]:
+        partial_directory = self._directory / "partial"
+        if not partial_directory.is_dir():
+            return []
+
+        stale = []
+
+        for path in partial_directory.iterdir():
+            stat = _stat_or_none(path)
+
+            # A download in progress keeps writing to its partial file
+            if stat is not None and now - stat.st_mtime > MAX_PARTIAL_AGE_SECONDS:
+                stale.append(path)
+
+        return stale
+
+    def _unreferenced_blobs(self, index: Dict[str, Dict]) -> List[Tuple[Path, os.stat_result]]:
+        blobs_directory = self._directory / "blobs"
+        if not blobs_directory.is_dir():
+            return []
+
+        referenced = {record.get(k_sha256, None) for record in index.values()}
+        blobs = []
+
+        for path in blobs_directory.glob("*/*"):
+            stat = None if path.name in referenced else _stat_or_none(path)
+
+            if stat is not None:
+                blobs.append((path, stat))
+
+        # Newest first
+        return sorted(blobs, key=lambda blob: blob[1].st_mtime, reverse=True)
+
+    def _sweep(self, index: Dict[str, Dict], now: Optional[float] = None) -> int:
+        now = time.time() if now is None else now
+        doomed = self._stale_partial_files(now)
+        kept_bytes = 0
+
+        for path, stat in self._unreferenced_blobs(index):
+            too_old = now - stat.st_mtime > MAX_UNREFERENCED_AGE_SECONDS
+
+            if too_old or kept_bytes + stat.st_size > UNREFERENCED_BUDGET_BYTES:
+                doomed.append(path)
+
+            else:
+                kept_bytes += stat.st_size
+
+        removed_bytes = 0
+
+        for path in doomed:
+            try:
+                size = path.stat().st_size
+                path.unlink()
+                removed_bytes += size
+
+            except FileNotFoundError:
+                continue
+
+        if doomed:
+            log.info(f"Swept {len(doomed)} files ({removed_bytes} bytes) from the artifact cache")
+
+        return removed_bytes
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        """
+        Removes interrupted downloads that were not resumed in time, and the files no URL refers to that are too old
+        or do not fit in the budget for them. Files are swept after every download as well.
+        :return: The number of bytes that were freed
+        """
+        with self.lock("index"):
+            return self._sweep(self._index(), now)
+
+
+class ArtifactDownloader:
+    """
+    Streams files into the artifact cache. Interrupted downloads are resumed with HTTP range requests.
+    """
+    _cache: ArtifactCache
+    _client: Optional[HTTPClient]
+    _url_locks: Dict[str, threading.Lock]
+    _url_locks_lock: threading.Lock
+
+    def __init__(self, cache: Optional[ArtifactCache] = None, client: Optional[HTTPClient] = None):
+        self._cache = cache or ArtifactCache()
+        self._client = client
+        self._url_locks = dict()
+        self._url_locks_lock = threading.Lock()
+
+    @property
+    def cache(self) -> ArtifactCache:
+        return self._cache
+
+    @property
+    def _http(self) -> HTTPClient:
+        return self._client or http_client.value
+
+    def _url_lock(self, url: str) -> threading.Lock:
+        with self._url_locks_lock:
+            return self._url_locks.setdefault(url, threading.Lock())
+
+    def fetch(
+        self,
+        url: str,
+        sha256: Optional[str] = None,
+        size: Optional[int] = None,
+        revalidate: bool = True,
+        on_progress: Optional[ProgressCallback] = None
+    ) -> Artifact:
+        """
+        Makes sure the file at the URL is in the artifact cache
+        :param sha256: Expected digest, a cached file with this digest is used without asking the remote
+        :param size: Expected size in bytes
+        :param revalidate: Ask the remote whether a previously downloaded file is still current. Versioned URLs that
+        never change their content do not need this.
+        :param on_progress: Called with progress of the download, in addition to the download_progress event
+        """
+
+        def emit(progress: DownloadProgress):
+            if on_progress is not None:
+                on_progress(progress)
+
+            download_progress(progress)
+
+        if sha256 is not None:
+            artifact = self._cache.artifact_for_digest(sha256.lower(), url)
+
+            if artifact is not None:
+                emit(DownloadProgress(url, artifact.size, artifact.size, from_cache=True))
+                return artifact
+
+        with self._url_lock(url), self._cache.lock(_url_digest(url)):
+            record = self._cache.lookup(url)
+
+            if record is not None and not revalidate:
+                artifact = self._cache.artifact(record)
+                emit(DownloadProgress(url, artifact.size, artifact.size, from_cache=True))
+
+                return artifact
+
+            return self._download(url, record, sha256, size, emit)
+
+    def _download(
+        self,
+        url: str,
+        record: Optional[Dict],
+        expected_sha256: Optional[str],
+        expected_size: Optional[int],
+        emit: ProgressCallback
+    ) -> Artifact:
+        partial_path = self._cache.partial_path(url)
+        metadata_path = self._cache.partial_metadata_path(url)
+        partial_path.parent.mkdir(parents=True, exist_ok=True)
+
+        headers, offset = _request_headers(url, record, partial_path, metadata_path)
+
+        try:
+            response = self._http.get(url, headers=headers, stream=True)
+
+        except requests.exceptions.RequestException as e:
+            if record is None:
+                raise
+
+            log.warning(f"Could not reach {url}, using the previously downloaded file: {e}")
+            return self._cached(record, emit)
+
+        with response:
+            if response.status_code == 304 and record is not None:
+                return self._cached(record, emit)
+
+            if response.status_code == 416 and offset > 0:
+                log.warning(f"The remote rejected resuming {url}, starting over")
+                partial_path.unlink()
+                metadata_path.unlink()
+
+                return self._download(url, record, expected_sha256, expected_size, emit)
+
+            response.raise_for_status()
+
+            validators = {
+                k_etag: response.headers.get("ETag", None),
+                k_last_modified: response.headers.get("Last-Modified", None)
+            }
+
+            digest, received, total = _receive(url, response, offset, partial_path, metadata_path, validators, emit)
+
+        emit(DownloadProgress(url, received, total))
+
+        if total is not None and received < total:
+            # Keep the partial file, the next attempt continues where this one stopped
+            raise DownloadVerificationError(url, f"received {received} of {total} bytes")
+
+        sha256 = digest.hexdigest()
+        rejection = _verification_failure(sha256, received, total, expected_sha256, expected_size)
+
+        if rejection is not None:
+            partial_path.unlink()
+            metadata_path.unlink()
+
+            raise DownloadVerificationError(url, rejection)
+
+        artifact = self._cache.store(url, partial_path, sha256, received, validators)
+        metadata_path.unlink()
+
+        log.info(f"Downloaded {url} ({received} bytes) to {artifact.path}")
+
+        return artifact
+
+    def _cached(self, record: Dict, emit: ProgressCallback) -> Artifact:
+        artifact = self._cache.artifact(record)
+        emit(DownloadProgress(artifact.url, artifact.size, artifact.size, from_cache=True))
+
+        return artifact
+
+
+def _request_headers(
+    url: str,
+    record: Optional[Dict],
+    partial_path: Path,
+    metadata_path: Path
+) -> Tuple[Dict[str, str], int]:
+    """
+    :return: The headers to request the URL with, and the offset the download resumes at
+    """
+    # Content-Encoding would make the received bytes differ from the advertised length and ranges
+    headers = {"Accept-Encoding": "identity"}
+
+    if record is not None:
+        if record.get(k_etag, None):
+            headers["If-None-Match"] = record[k_etag]
+
+        if record.get(k_last_modified, None):
+            headers["If-Modified-Since"] = record[k_last_modified]
+
+    partial_metadata = _read_json(metadata_path) if partial_path.exists() else None
+    offset = 0
+
+    if partial_metadata is not None and partial_metadata.get(k_url, None) == url:
+        resume_validator = partial_metadata.get(k_etag, None) or partial_metadata.get(k_last_modified, None)
+
+        if resume_validator:
+            offset = partial_path.stat().st_size
+            headers["Range"] = f"bytes={offset}-"
+            headers["If-Range"] = resume_validator
+
+    return headers, offset
+
+
+def _receive(
+    url: str,
+    response: requests.Response,
+    offset: int,
+    partial_path: Path,
+    metadata_path: Path,
+    validators: Dict[str, str],
+    emit: ProgressCallback
+) -> Tuple["hashlib._Hash", int, Optional[int]]:
+    """
+    Streams the body of the response into the partial file
+    :return: The digest of the partial file, its size and the size of the whole file when the remote told it
+    """
+    if response.status_code == 206:
+        log.info(f"Resuming download of {url} at {offset} bytes")
+        digest = _sha256_of_file(partial_path)
+        total = _total_from_content_range(response.headers.get("Content-Range", ""))
+        mode = "ab"
+
+    else:
+        offset = 0
+        digest = hashlib.sha256()
+        content_length = response.headers.get("Content-Length", None)
+        total = int(content_length) if content_length and content_length.isdigit() else None
+        mode = "wb"
+
+    _write_json(metadata_path, {k_url: url, k_total: total, **validators})
+
+    received = offset
+    last_emit = 0.0
+
+    with partial_path.open(mode) as fp:
+        for chunk in response.raw.stream(CHUNK_SIZE, decode_content=False):
+            fp.write(chunk)
+            digest.update(chunk)
+            received += len(chunk)
+
+            now = time.monotonic()
+            if now - last_emit >= PROGRESS_INTERVAL:
+                emit(DownloadProgress(url, received, total))
+                last_emit = now
+
+    return digest, received, total
+
+
+def _verification_failure(
+    sha256: str,
+    received: int,
+    total: Optional[int],
+    expected_sha256: Optional[str],
+    expected_size: Optional[int]
+) -> Optional[str]:
+    """
+    :return: Why a downloaded file is rejected, None when it is good
+    """
+    if total is not None and received != total:
+        return f"received {received} bytes, but {total} bytes were advertised"
+
+    if expected_size is not None and received != expected_size:
+        return f"expected {expected_size} bytes, received {received} bytes"
+
+    if expected_sha256 is not None and sha256 != expected_sha256.lower():
+        return f"expected SHA-256 {expected_sha256}, got {sha256}"
+
+    return None
+
+
+def _total_from_content_range(content_range: str) -> Optional[int]:
+    # bytes 100-199/200
+    total = content_range.rpartition("/")[2].strip()
+
+    return int(total) if total.isdigit() else None
+
+
+artifact_downloader: ComputedField[ArtifactDownloader] = ComputedField(ArtifactDownloader)
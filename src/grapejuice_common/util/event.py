@@ -14,7 +14,8 @@ class Event:
             self._listeners.remove(listener)
 
     def __call__(self, *args, **kwargs):
-        for listener in self._listeners:
+        # Iterate over a copy, listeners may be added or removed from other threads while the event fires
+        for listener in list(self._listeners):
             listener(*args, **kwargs)
 
 
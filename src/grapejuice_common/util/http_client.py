@@ -0,0 +1,240 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Optional, Any, Union, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from grapejuice_common import paths
+from grapejuice_common.util.computed_field import ComputedField
+
+log = logging.getLogger(__name__)
+
+# (connect, read) timeouts in seconds
+DEFAULT_TIMEOUT: Tuple[float, float] = (5.0, 30.0)
+DEFAULT_TTL = 60 * 10
+POOL_SIZE = 8
+
+# Headers needed for revalidation and for interpreting the cached body
+STORED_HEADERS = ("ETag", "Last-Modified", "Content-Type")
+
+
+def _user_agent() -> str:
+    try:
+        from grapejuice.__about__ import package_version
+        return f"Grapejuice/{package_version}"
+
+    except ImportError:
+        return "Grapejuice"
+
+
+@dataclass
+class HTTPResponse:
+    """
+    A fully read response that may have been served from the on-disk HTTP cache
+    """
+    url: str
+    status_code: int
+    content: bytes
+    headers: Dict[str, str] = field(default_factory=dict)
+    from_cache: bool = False
+    is_stale: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status_code <= 299
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("UTF-8", errors="replace")
+
+    def json(self) -> Any:
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise requests.exceptions.HTTPError(f"HTTP {self.status_code} for url: {self.url}")
+
+
+@dataclass
+class HTTPCacheEntry:
+    url: str
+    status_code: int
+    headers: Dict[str, str]
+    stored_at: float
+
+    def is_fresh(self, ttl: float, now: float) -> bool:
+        return now < self.stored_at + ttl
+
+
+class HTTPCache:
+    """
+    Response bodies and their validators, stored as a metadata and a body file per URL
+    """
+    _directory: Path
+    _lock: threading.Lock
+
+    def __init__(self, directory: Optional[Path] = None):
+        self._directory = directory or paths.http_cache_directory()
+        self._lock = threading.Lock()
+
+    @property
+    def directory(self) -> Path:
+        return self._directory
+
+    def _paths(self, url: str) -> Tuple[Path, Path]:
+        name = hashlib.sha256(url.encode("UTF-8")).hexdigest()
+
+        return self._directory / f"{name}.json", self._directory / f"{name}.body"
+
+    def get(self, url: str) -> Tuple[Optional[HTTPCacheEntry], Optional[bytes]]:
+        metadata_path, body_path = self._paths(url)
+
+        try:
+            with metadata_path.open("r") as fp:
+                entry = HTTPCacheEntry(**json.load(fp))
+
+            if entry.url != url:
+                return None, None
+
+            return entry, body_path.read_bytes()
+
+        except FileNotFoundError:
+            return None, None
+
+        except (OSError, ValueError, TypeError) as e:
+            log.warning(f"Ignoring unreadable HTTP cache entry for {url}: {e}")
+            return None, None
+
+    def _write(self, path: Path, content: bytes):
+        # Write to a temporary file first so concurrent processes never read half written entries
+        temporary_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        temporary_path.write_bytes(content)
+        os.replace(temporary_path, path)
+
+    def put(self, entry: HTTPCacheEntry, body: Optional[bytes] = None):
+        """
+        :param body: The new response body, the stored body is kept when omitted
+        """
+        metadata_path, body_path = self._paths(entry.url)
+
+        with self._lock:
+            try:
+                self._directory.mkdir(parents=True, exist_ok=True)
+
+                if body is not None:
+                    self._write(body_path, body)
+
+                self._write(metadata_path, json.dumps(entry.__dict__).encode("UTF-8"))
+
+            except OSError as e:
+                log.warning(f"Could not store HTTP cache entry for {entry.url}: {e}")
+
+    def remove(self, url: str):
+        for path in self._paths(url):
+            try:
+                path.unlink()
+
+            except FileNotFoundError:
+                pass
+
+
+class HTTPClient:
+    """
+    A pooled HTTP session with default timeouts. Metadata requests go through an on-disk cache that is revalidated
+    with ETag/Last-Modified, and that serves stale results when the remote cannot be reached.
+    """
+    _session: requests.Session
+    _cache: HTTPCache
+    _timeout: Union[float, Tuple[float, float]]
+
+    def __init__(
+        self,
+        cache: Optional[HTTPCache] = None,
+        timeout: Union[float, Tuple[float, float]] = DEFAULT_TIMEOUT
+    ):
+        self._cache = cache or HTTPCache()
+        self._timeout = timeout
+
+        adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=1)
+
+        self._session = requests.Session()
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+        self._session.headers["User-Agent"] = _user_agent()
+
+    @property
+    def cache(self) -> HTTPCache:
+        return self._cache
+
+    @property
+    def session(self) -> requests.Session:
+        return self._session
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """
+        A plain GET through the shared session, for anything that should not be cached
+        """
+        kwargs.setdefault("timeout", self._timeout)
+
+        return self._session.get(url, **kwargs)
+
+    def get_metadata(self, url: str, ttl: float = DEFAULT_TTL) -> HTTPResponse:
+        """
+        GETs a small document through the HTTP cache.
+        :param ttl: Seconds a cached response is used without asking the remote
+        :raises requests.exceptions.RequestException: When the remote cannot be reached and nothing was cached
+        """
+        entry, body = self._cache.get(url)
+        now = time.time()
+
+        def cached_response(is_stale: bool) -> HTTPResponse:
+            return HTTPResponse(url, entry.status_code, body, dict(entry.headers), from_cache=True, is_stale=is_stale)
+
+        if entry is not None and entry.is_fresh(ttl, now):
+            return cached_response(False)
+
+        request_headers = dict()
+        if entry is not None:
+            if "ETag" in entry.headers:
+                request_headers["If-None-Match"] = entry.headers["ETag"]
+
+            if "Last-Modified" in entry.headers:
+                request_headers["If-Modified-Since"] = entry.headers["Last-Modified"]
+
+        try:
+            response = self.get(url, headers=request_headers)
+
+        except requests.exceptions.RequestException as e:
+            if entry is None:
+                raise
+
+            log.warning(f"Could not reach {url}, using the response cached at {time.ctime(entry.stored_at)}: {e}")
+            return cached_response(True)
+
+        if response.status_code == 304 and entry is not None:
+            entry.stored_at = now
+            self._cache.put(entry)
+
+            return cached_response(False)
+
+        if response.ok:
+            headers = {k: response.headers[k] for k in STORED_HEADERS if k in response.headers}
+            self._cache.put(HTTPCacheEntry(url, response.status_code, headers, now), response.content)
+
+            return HTTPResponse(url, response.status_code, response.content, headers)
+
+        if response.status_code >= 500 and entry is not None:
+            log.warning(f"{url} responded with HTTP {response.status_code}, using the cached response")
+            return cached_response(True)
+
+        return HTTPResponse(url, response.status_code, response.content, dict(response.headers))
+
+
+http_client: ComputedField[HTTPClient] = ComputedField(HTTPClient)
@@ -0,0 +1,171 @@
+import logging
+import os
+import selectors
+import subprocess
+import threading
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional
+
+log = logging.getLogger(__name__)
+
+ExitCallback = Callable[[subprocess.Popen], None]
+
+
+def _exit_code_from_wait_status(status: int) -> int:
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+
+    if os.WIFEXITED(status):
+        return os.WEXITSTATUS(status)
+
+    return status
+
+
+class SupervisorBackend(ABC):
+    @abstractmethod
+    def watch(self, proc: subprocess.Popen, on_exit: Callable[[], None]):
+        """
+        Calls on_exit once the process has exited and has been reaped, proc.returncode is set at that point
+        """
+
+
+class GLibChildWatchBackend(SupervisorBackend):
+    """
+    Reaps children from the GLib main loop, exit callbacks run on the main loop
+    """
+
+    def watch(self, proc: subprocess.Popen, on_exit: Callable[[], None]):
+        from gi.repository import GLib
+
+        def on_child_exited(pid: int, status: int):
+            # GLib reaped the child, so Popen can no longer learn its exit code by itself
+            proc.returncode = _exit_code_from_wait_status(status)
+            GLib.spawn_close_pid(pid)
+
+            on_exit()
+
+        GLib.child_watch_add(GLib.PRIORITY_DEFAULT, proc.pid, on_child_exited)
+
+
+class ThreadBackend(SupervisorBackend):
+    """
+    Reaps children without a main loop. Exit callbacks run on a supervisor thread.
+    A single thread waits on pidfds where the platform supports them, otherwise every child gets a waiting thread.
+    """
+    _selector: Optional[selectors.BaseSelector] = None
+    _thread: Optional[threading.Thread] = None
+
+    def __init__(self, use_pidfd: Optional[bool] = None):
+        self._use_pidfd = hasattr(os, "pidfd_open") if use_pidfd is None else use_pidfd
+        self._lock = threading.Lock()
+        self._wakeup_read: Optional[int] = None
+        self._wakeup_write: Optional[int] = None
+
+    def _ensure_selector_thread(self):
+        if self._thread is not None:
+            return
+
+        self._selector = selectors.DefaultSelector()
+        self._wakeup_read, self._wakeup_write = os.pipe()
+        self._selector.register(self._wakeup_read, selectors.EVENT_READ, None)
+
+        self._thread = threading.Thread(target=self._select_loop, name="process-supervisor", daemon=True)
+        self._thread.start()
+
+    def _select_loop(self):
+        while True:
+            for key, _ in self._selector.select():
+                if key.data is None:
+                    os.read(self._wakeup_read, 512)
+                    continue
+
+                proc, on_exit = key.data
+
+                with self._lock:
+                    self._selector.unregister(key.fd)
+
+                os.close(key.fd)
+                proc.wait()
+
+                _run_callback(on_exit)
+
+    def _watch_with_pidfd(self, proc: subprocess.Popen, on_exit: Callable[[], None]) -> bool:
+        try:
+            pidfd = os.pidfd_open(proc.pid)
+
+        except OSError as e:
+            log.warning(f"Could not open a pidfd for {proc.pid}, falling back to a waiting thread: {e}")
+            return False
+
+        with self._lock:
+            self._ensure_selector_thread()
+            self._selector.register(pidfd, selectors.EVENT_READ, (proc, on_exit))
+
+        # The selector thread has to pick up the new pidfd
+        os.write(self._wakeup_write, b"\0")
+
+        return True
+
+    def watch(self, proc: subprocess.Popen, on_exit: Callable[[], None]):
+        if self._use_pidfd and self._watch_with_pidfd(proc, on_exit):
+            return
+
+        def wait_for_exit():
+            proc.wait()
+            _run_callback(on_exit)
+
+        threading.Thread(target=wait_for_exit, name=f"process-supervisor-{proc.pid}", daemon=True).start()
+
+
+def _run_callback(callback: Callable[[], None]):
+    try:
+        callback()
+
+    except Exception as e:
+        log.error(f"Process exit callback failed: {e}")
+
+
+class ProcessSupervisor:
+    """
+    Keeps track of child processes and runs their exit callbacks as soon as they exit, without polling
+    """
+    _backend: SupervisorBackend
+    _processes: Dict[int, subprocess.Popen]
+
+    def __init__(self, backend: Optional[SupervisorBackend] = None):
+        self._backend = backend or ThreadBackend()
+        self._processes = dict()
+        self._lock = threading.Lock()
+
+    def use_backend(self, backend: SupervisorBackend):
+        """
+        Only affects processes that are supervised after this call
+        """
+        self._backend = backend
+
+    def use_glib_main_loop(self):
+        self.use_backend(GLibChildWatchBackend())
+
+    @property
+    def processes(self) -> List[subprocess.Popen]:
+        with self._lock:
+            return list(self._processes.values())
+
+    def supervise(self, proc: subprocess.Popen, on_exit: Optional[ExitCallback] = None):
+        with self._lock:
+            self._processes[proc.pid] = proc
+
+        def exited():
+            with self._lock:
+                self._processes.pop(proc.pid, None)
+
+            if proc.returncode != 0:
+                log.error(f"Process {proc.pid} returned with non-zero exit code {proc.returncode}")
+
+            if callable(on_exit):
+                on_exit(proc)
+
+        self._backend.watch(proc, exited)
+
+
+process_supervisor = ProcessSupervisor()
@@ -1,33 +1,34 @@
+import logging
 from typing import Optional
 
 import requests
 
 from grapejuice_common.util.cache_utils import cache
+from grapejuice_common.util.http_client import http_client
 
+log = logging.getLogger(__name__)
+
+# Launching Roblox spawns several short lived Grapejuice processes, they can share the version for a little while
+VERSION_TTL = 60
 
-@cache()
-def current_player_version() -> Optional[str]:
-    print("Gaming")
-    response = requests.get("https://s3.amazonaws.com/setup.roblox.com/version")
 
+def _fetch_version(url: str) -> Optional[str]:
     try:
+        response = http_client.value.get_metadata(url, ttl=VERSION_TTL)
         response.raise_for_status()
 
-    except requests.exceptions.HTTPError:
+    except requests.exceptions.RequestException as e:
+        log.error(f"Could not get the Roblox version from {url}: {e}")
         return None
 
     return response.text.strip()
 
 
-@cache()
-def current_studio_version() -> Optional[str]:
-    print("Gaming")
-    response = requests.get("https://setup.rbxcdn.com/versionQTStudio")
-
-    try:
-        response.raise_for_status()
+@cache(ttl=VERSION_TTL)
+def current_player_version() -> Optional[str]:
+    return _fetch_version("https://s3.amazonaws.com/setup.roblox.com/version")
 
-    except requests.exceptions.HTTPError:
-        return None
 
-    return response.text.strip()
+@cache(ttl=VERSION_TTL)
+def current_studio_version() -> Optional[str]:
+    return _fetch_version("https://setup.rbxcdn.com/versionQTStudio")
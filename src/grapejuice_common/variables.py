@@ -15,6 +15,9 @@ INSTANCE_ID = str(uuid.uuid4())
 
 LOG = logging.getLogger(__name__)
 
+# Seconds a GitHub release lookup is reused before asking GitHub again
+RELEASE_METADATA_TTL = 60 * 60
+
 
 def ensure_dir(p):
     if not os.path.exists(p):
@@ -99,11 +102,13 @@ class FpsUnlockerRelease:
 
 
 def current_rbxfpsunlocker_release() -> FpsUnlockerRelease:
-    import requests
+    from grapejuice_common.util.http_client import http_client
 
     try:
-
-        gh_release = requests.get("https://api.github.com/repos/axstin/rbxfpsunlocker/releases/latest")
+        gh_release = http_client.value.get_metadata(
+            "https://api.github.com/repos/axstin/rbxfpsunlocker/releases/latest",
+            ttl=RELEASE_METADATA_TTL
+        )
         gh_release.raise_for_status()
 
         gh_release = gh_release.json()
@@ -170,11 +175,13 @@ DXVK_VERSION_PTN = re.compile(r"^v(.*)")
 
 
 def current_dxvk_release() -> DXVKRelease:
-    import requests
+    from grapejuice_common.util.http_client import http_client
 
     try:
-
-        gh_release = requests.get("https://api.github.com/repos/doitsujin/dxvk/releases/latest")
+        gh_release = http_client.value.get_metadata(
+            "https://api.github.com/repos/doitsujin/dxvk/releases/latest",
+            ttl=RELEASE_METADATA_TTL
+        )
         gh_release.raise_for_status()
 
         gh_release = gh_release.json()
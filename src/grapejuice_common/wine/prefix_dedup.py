@@ -0,0 +1,394 @@
+import errno
+import fcntl
+import hashlib
+import logging
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+from stat import S_ISREG
+from typing import List, Dict, Tuple, Optional, Iterable
+
+from grapejuice_common import paths
+from grapejuice_common.wine.wineprefix_paths import WineprefixPaths
+
+log = logging.getLogger(__name__)
+
+# ioctl that makes a file share the extents of another file, on Btrfs, XFS and the like
+FICLONE = 0x40049409
+REFLINK_UNSUPPORTED = (errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL, errno.EXDEV, errno.ENOSYS)
+
+# Small files do not save enough to be worth the metadata
+MIN_SIZE = 16 * 1024
+PARTIAL_HASH_BYTES = 64 * 1024
+CHUNK_SIZE = 1024 * 1024
+MAX_WORKERS = 4
+
+k_auto = "auto"
+k_reflink = "reflink"
+k_hardlink = "hardlink"
+
+# Only parts of a prefix that are written once are deduplicated, a hard link would share every later change. The
+# documents of users are left alone for that reason, except for the Roblox versions in their AppData. Wine and
+# installers do rewrite files in the windows and Program Files directories in place, so those are only reflinked unless
+# hard links are asked for explicitly.
+DEDUPLICATED_DIRECTORIES = ("windows", "Program Files", "Program Files (x86)")
+MUTABLE_DIRECTORY_NAMES = {"clientsettings", "logs", "temp", "tmp", "cache", "localstorage"}
+MUTABLE_SUFFIXES = {".reg", ".log", ".json", ".ini", ".xml", ".txt", ".cfg", ".dat", ".db", ".tmp", ".lock", ".dmp"}
+
+FileIdentity = Tuple[int, int]
+
+
+@dataclass
+class DedupRoot:
+    path: Path
+    hard_linkable: bool
+
+
+@dataclass
+class _Inode:
+    identity: FileIdentity
+    size: int
+    blocks: int
+    links: int
+    mtime_ns: int
+    paths: List[Path] = field(default_factory=list)
+    hard_linkable: bool = True
+
+    @property
+    def is_freed_by_replacing(self) -> bool:
+        # Links outside of the prefixes keep the data around
+        return self.links <= len(self.paths)
+
+
+@dataclass
+class DedupReport:
+    dry_run: bool
+    scanned_files: int = 0
+    scanned_bytes: int = 0
+    duplicate_groups: int = 0
+    duplicate_files: int = 0
+    saved_bytes: int = 0
+    reflinked_files: int = 0
+    hard_linked_files: int = 0
+    errors: List[str] = field(default_factory=list)
+
+    @property
+    def as_dict(self) -> Dict:
+        return asdict(self)
+
+
+def _is_immutable(path: str) -> bool:
+    name = os.path.basename(path).lower()
+    _, suffix = os.path.splitext(name)
+
+    return suffix not in MUTABLE_SUFFIXES
+
+
+def candidate_roots(prefixes_directory: Optional[Path] = None) -> List[DedupRoot]:
+    prefixes_directory = prefixes_directory or paths.wineprefixes_directory()
+    roots = []
+
+    if not prefixes_directory.is_dir():
+        return roots
+
+    for base_directory in sorted(filter(Path.is_dir, prefixes_directory.iterdir())):
+        prefix_paths = WineprefixPaths(base_directory)
+
+        for root in [
+            *(DedupRoot(prefix_paths.drive_c / directory, False) for directory in DEDUPLICATED_DIRECTORIES),
+            *(DedupRoot(location / "Versions", True) for location in prefix_paths.possible_roblox_appdata)
+        ]:
+            if root.path.is_dir() and not root.path.is_symlink():
+                roots.append(root)
+
+    return roots
+
+
+def scan_inodes(roots: Iterable[DedupRoot], report: DedupReport) -> Dict[FileIdentity, _Inode]:
+    inodes: Dict[FileIdentity, _Inode] = dict()
+
+    for root in roots:
+        for directory, directory_names, file_names in os.walk(root.path):
+            directory_names[:] = [d for d in directory_names if d.lower() not in MUTABLE_DIRECTORY_NAMES]
+
+            for file_name in file_names:
+                path = os.path.join(directory, file_name)
+
+                if not _is_immutable(path):
+                    continue
+
+                try:
+                    stat = os.lstat(path)
+
+                except OSError:
+                    continue
+
+                # Wine links most of its own files into the prefix, only regular files are copies
+                if not S_ISREG(stat.st_mode) or stat.st_size < MIN_SIZE:
+                    continue
+
+                identity = stat.st_dev, stat.st_ino
+                inode = inodes.get(identity, None)
+
+                if inode is None:
+                    inode = _Inode(identity, stat.st_size, stat.st_blocks, stat.st_nlink, stat.st_mtime_ns)
+                    inodes[identity] = inode
+
+                    report.scanned_files += 1
+                    report.scanned_bytes += stat.st_size
+
+                inode.paths.append(Path(path))
+                inode.hard_linkable = inode.hard_linkable and root.hard_linkable
+
+    return inodes
+
+
+def _hash_file(path: Path, limit: Optional[int] = None) -> Optional[bytes]:
+    digest = hashlib.blake2b()
+    remaining = limit
+
+    try:
+        with path.open("rb") as fp:
+            while remaining is None or remaining > 0:
+                chunk = fp.read(CHUNK_SIZE if remaining is None else min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+
+                digest.update(chunk)
+
+                if remaining is not None:
+                    remaining -= len(chunk)
+
+    except OSError:
+        return None
+
+    return digest.digest()
+
+
+def _split_by_hash(
+    executor: ThreadPoolExecutor,
+    groups: List[List[_Inode]],
+    limit: Optional[int]
+) -> List[List[_Inode]]:
+    split = []
+
+    for group in groups:
+        digests = executor.map(lambda inode: _hash_file(inode.paths[0], limit), group)
+        by_digest: Dict[bytes, List[_Inode]] = dict()
+
+        for inode, digest in zip(group, digests):
+            if digest is not None:
+                by_digest.setdefault(digest, []).append(inode)
+
+        split.extend(g for g in by_digest.values() if len(g) > 1)
+
+    return split
+
+
+def duplicate_groups(inodes: Iterable[_Inode]) -> List[List[_Inode]]:
+    """
+    Groups of distinct files with identical contents on the same filesystem. Files are only read when another file on
+    the filesystem has the same size, and are only read fully when their first bytes are the same as well.
+    """
+    by_size: Dict[Tuple[int, int], List[_Inode]] = dict()
+
+    for inode in inodes:
+        by_size.setdefault((inode.identity[0], inode.size), []).append(inode)
+
+    groups = [g for g in by_size.values() if len(g) > 1]
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        groups = _split_by_hash(executor, groups, PARTIAL_HASH_BYTES)
+        groups = _split_by_hash(executor, [g for g in groups if g[0].size > PARTIAL_HASH_BYTES], None) + \
+            [g for g in groups if g[0].size <= PARTIAL_HASH_BYTES]
+
+    return groups
+
+
+def _remove_if_present(path: Path):
+    try:
+        path.unlink()
+
+    except FileNotFoundError:
+        pass
+
+
+def _reflink(source: Path, target: Path):
+    with source.open("rb") as source_fp, target.open("wb") as target_fp:
+        fcntl.ioctl(target_fp.fileno(), FICLONE, source_fp.fileno())
+
+
+def _scratch_path(target: Path) -> Path:
+    return target.with_name(f".{target.name}.{os.getpid()}.dedup")
+
+
+class _Linker:
+    _reflink_support: Dict[int, bool]
+
+    def __init__(self, link_mode: str):
+        self._link_mode = link_mode
+        self._reflink_support = dict()
+
+    def may_hard_link(self, source: _Inode, inode: _Inode) -> bool:
+        if self._link_mode == k_auto:
+            return source.hard_linkable and inode.hard_linkable
+
+        return self._link_mode == k_hardlink
+
+    def can_reflink(self, source: Path, target: Path, device: int) -> bool:
+        """
+        Whether the filesystem of a device supports reflinks, found out once by cloning source into a scratch file
+        next to target
+        """
+        if device not in self._reflink_support:
+            scratch_path = _scratch_path(target)
+
+            try:
+                _reflink(source, scratch_path)
+                self._reflink_support[device] = True
+
+            except OSError as e:
+                if e.errno not in REFLINK_UNSUPPORTED:
+                    log.info(f"Could not find out whether {target.parent} supports reflinks: {e}")
+                    return False
+
+                self._reflink_support[device] = False
+
+            finally:
+                _remove_if_present(scratch_path)
+
+        return self._reflink_support[device]
+
+    def would_link(self, source: _Inode, inode: _Inode) -> bool:
+        return self.may_hard_link(source, inode) or self.can_reflink(source.paths[0], inode.paths[0], inode.identity[0])
+
+    def replace(self, source: Path, target: Path, device: int, hard_link: bool) -> Optional[str]:
+        """
+        Replaces target by a link to source, without a moment where target does not exist
+        :param hard_link: Whether target may become a hard link when the filesystem cannot reflink
+        :return: The kind of link that was made, None when neither is possible
+        """
+        temporary_path = _scratch_path(target)
+
+        try:
+            if self._reflink_support.get(device, True):
+                try:
+                    _reflink(source, temporary_path)
+                    shutil.copystat(target, temporary_path)
+                    os.replace(temporary_path, target)
+                    self._reflink_support[device] = True
+
+                    return k_reflink
+
+                except OSError as e:
+                    if e.errno not in REFLINK_UNSUPPORTED:
+                        raise
+
+                    self._reflink_support[device] = False
+                    _remove_if_present(temporary_path)
+
+            if not hard_link:
+                return None
+
+            os.link(source, temporary_path)
+            os.replace(temporary_path, target)
+
+            return k_hardlink
+
+        finally:
+            _remove_if_present(temporary_path)
+
+
+def _unchanged(inode: _Inode, path: Path) -> bool:
+    try:
+        stat = path.stat()
+
+    except OSError:
+        return False
+
+    return (stat.st_dev, stat.st_ino) == inode.identity and stat.st_size == inode.size and \
+        stat.st_mtime_ns == inode.mtime_ns
+
+
+def _still_referenced(inode: _Inode) -> bool:
+    """
+    Whether any of the paths of a file still refer to its original data
+    """
+    for path in inode.paths:
+        try:
+            stat = path.stat()
+
+        except OSError:
+            continue
+
+        if (stat.st_dev, stat.st_ino) == inode.identity:
+            return True
+
+    return False
+
+
+def deduplicate_prefixes(
+    dry_run: bool = False,
+    link_mode: str = k_auto,
+    prefixes_directory: Optional[Path] = None
+) -> DedupReport:
+    """
+    Replaces identical files across the prefixes by reflinks where the filesystem supports them. Without reflinks, only
+    the Roblox versions are hard linked, unless link_mode is set to hardlink. With link_mode set to reflink, files are
+    never hard linked.
+    """
+    report = DedupReport(dry_run)
+    inodes = scan_inodes(candidate_roots(prefixes_directory), report)
+    linker = _Linker(link_mode)
+
+    for group in duplicate_groups(inodes.values()):
+        # A file that may be hard linked is kept, so the others in the group can still be linked to it. Then the file
+        # with the most links already is preferred, so the fewest links have to change.
+        group.sort(key=lambda inode: (not inode.hard_linkable, -inode.links, str(inode.paths[0])))
+        source, duplicates = group[0], group[1:]
+
+        report.duplicate_groups += 1
+
+        for inode in duplicates:
+            report.duplicate_files += len(inode.paths)
+            saved_bytes = inode.blocks * 512 if inode.is_freed_by_replacing else 0
+
+            if dry_run:
+                # Without reflinks, files that may not be hard linked stay as they are
+                if linker.would_link(source, inode):
+                    report.saved_bytes += saved_bytes
+
+                continue
+
+            link_kind = None
+            hard_link = linker.may_hard_link(source, inode)
+
+            for path in inode.paths:
+                if not _unchanged(inode, path) or not _unchanged(source, source.paths[0]):
+                    log.info(f"Not deduplicating {path}, it changed since it was read")
+                    continue
+
+                try:
+                    link_kind = linker.replace(source.paths[0], path, inode.identity[0], hard_link)
+
+                except OSError as e:
+                    report.errors.append(f"{path}: {e}")
+                    continue
+
+                if link_kind == k_reflink:
+                    report.reflinked_files += 1
+
+                elif link_kind == k_hardlink:
+                    report.hard_linked_files += 1
+
+            if link_kind is not None and not _still_referenced(inode):
+                report.saved_bytes += saved_bytes
+
+    log.info(
+        f"{'Could save' if dry_run else 'Saved'} {report.saved_bytes} bytes by deduplicating "
+        f"{report.duplicate_files} files in {report.duplicate_groups} groups"
+    )
+
+    return report
@@ -0,0 +1,197 @@
+import os
+import time
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from grapejuice_common.wine.process_table import PROC, ProcStat, process_ids_by_prefix, read_stat, read_io, \
+    read_cmdline, image_name
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+# A process is identified by its pid and start time, pids get reused
+ProcessIdentity = Tuple[int, int]
+
+
+@dataclass(frozen=True)
+class ProcessSample:
+    pid: int
+    image: str
+    cpu_percent: float
+    rss_bytes: int
+    threads: int
+    read_bytes_per_second: Optional[float]
+    write_bytes_per_second: Optional[float]
+
+    @property
+    def as_dict(self) -> Dict:
+        return asdict(self)
+
+
+@dataclass(frozen=True)
+class PrefixSample:
+    name: str
+    base_directory: Path
+    processes: List[ProcessSample]
+
+    @property
+    def cpu_percent(self) -> float:
+        return sum(p.cpu_percent for p in self.processes)
+
+    @property
+    def rss_bytes(self) -> int:
+        return sum(p.rss_bytes for p in self.processes)
+
+    @property
+    def threads(self) -> int:
+        return sum(p.threads for p in self.processes)
+
+    @property
+    def read_bytes_per_second(self) -> float:
+        return sum(p.read_bytes_per_second or 0 for p in self.processes)
+
+    @property
+    def write_bytes_per_second(self) -> float:
+        return sum(p.write_bytes_per_second or 0 for p in self.processes)
+
+    @property
+    def as_dict(self) -> Dict:
+        return {
+            "name": self.name,
+            "base_directory": str(self.base_directory),
+            "cpu_percent": self.cpu_percent,
+            "rss_bytes": self.rss_bytes,
+            "threads": self.threads,
+            "read_bytes_per_second": self.read_bytes_per_second,
+            "write_bytes_per_second": self.write_bytes_per_second,
+            "processes": [p.as_dict for p in self.processes]
+        }
+
+
+@dataclass(frozen=True)
+class _Counters:
+    stat: ProcStat
+    io: Optional[Dict[str, int]]
+    timestamp: float
+
+
+def _rate(current: Optional[Dict[str, int]], previous: Optional[Dict[str, int]], key: str, elapsed: float):
+    if current is None or previous is None or key not in current or key not in previous or elapsed <= 0:
+        return None
+
+    return max(0, current[key] - previous[key]) / elapsed
+
+
+class ProcessMonitor:
+    """
+    Samples the resource usage of the processes of prefixes. CPU and I/O rates are computed from the difference with
+    the previous sample, so the first sample of a process only has its memory and threads.
+    :param prefixes: The name to show for each prefix, by its base directory, as display names need not be unique
+    """
+    _prefixes: Dict[Path, str]
+    _previous: Dict[ProcessIdentity, _Counters]
+    _images: Dict[ProcessIdentity, str]
+
+    def __init__(self, prefixes: Dict[Path, str], proc: Path = PROC):
+        self._prefixes = dict(prefixes)
+        self._proc = proc
+        self._previous = dict()
+        self._images = dict()
+
+    def _sample_process(self, pid: int, now: float, counters: Dict[ProcessIdentity, _Counters]):
+        stat = read_stat(pid, self._proc)
+        if stat is None:
+            return None
+
+        identity = pid, stat.start_time
+        current = _Counters(stat, read_io(pid, self._proc), now)
+        previous = self._previous.get(identity, None)
+        counters[identity] = current
+
+        if identity not in self._images:
+            # Wine changes the command line once a process turns into a Windows process, then it stays the same
+            self._images[identity] = image_name(read_cmdline(pid, self._proc))
+
+        cpu_percent = 0.0
+        elapsed = 0.0
+
+        if previous is not None:
+            elapsed = now - previous.timestamp
+            cpu_ticks = (stat.utime + stat.stime) - (previous.stat.utime + previous.stat.stime)
+
+            if elapsed > 0:
+                cpu_percent = 100.0 * cpu_ticks / CLOCK_TICKS / elapsed
+
+        return ProcessSample(
+            pid=pid,
+            image=self._images[identity],
+            cpu_percent=cpu_percent,
+            rss_bytes=stat.rss_pages * PAGE_SIZE,
+            threads=stat.threads,
+            read_bytes_per_second=_rate(current.io, previous and previous.io, "read_bytes", elapsed),
+            write_bytes_per_second=_rate(current.io, previous and previous.io, "write_bytes", elapsed)
+        )
+
+    def sample(self) -> List[PrefixSample]:
+        now = time.monotonic()
+        counters: Dict[ProcessIdentity, _Counters] = dict()
+        samples = []
+
+        for base_directory, pids in process_ids_by_prefix(self._prefixes, self._proc).items():
+            processes = list(filter(None, (self._sample_process(pid, now, counters) for pid in pids)))
+            processes.sort(key=lambda p: (-p.cpu_percent, -p.rss_bytes))
+
+            samples.append(PrefixSample(self._prefixes[base_directory], base_directory, processes))
+
+        # Forget processes that exited
+        self._previous = counters
+        self._images = {identity: self._images[identity] for identity in counters}
+
+        return samples
+
+
+def _format_bytes(n: Optional[float]) -> str:
+    if n is None:
+        return "-"
+
+    if n < 1024:
+        return f"{n:.0f}B"
+
+    for unit in ("K", "M"):
+        n /= 1024
+
+        if n < 1024:
+            return f"{n:.1f}{unit}"
+
+    return f"{n / 1024:.1f}G"
+
+
+def render_table(samples: List[PrefixSample]) -> str:
+    row = "{:<8} {:<32} {:>6} {:>8} {:>4} {:>8} {:>8}"
+    lines = [row.format("PID", "IMAGE", "CPU%", "RSS", "THR", "READ/s", "WRITE/s")]
+
+    for prefix_sample in samples:
+        lines.append("")
+        lines.append(row.format(
+            "",
+            prefix_sample.name[:32],
+            f"{prefix_sample.cpu_percent:.1f}",
+            _format_bytes(prefix_sample.rss_bytes),
+            prefix_sample.threads,
+            _format_bytes(prefix_sample.read_bytes_per_second),
+            _format_bytes(prefix_sample.write_bytes_per_second)
+        ))
+
+        for p in prefix_sample.processes:
+            lines.append(row.format(
+                p.pid,
+                f"  {p.image}"[:32],
+                f"{p.cpu_percent:.1f}",
+                _format_bytes(p.rss_bytes),
+                p.threads,
+                _format_bytes(p.read_bytes_per_second),
+                _format_bytes(p.write_bytes_per_second)
+            ))
+
+    return "\n".join(lines)
@@ -0,0 +1,205 @@
+import logging
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Iterator, Iterable, Dict, Set
+
+log = logging.getLogger(__name__)
+
+PROC = Path("/proc")
+
+WINE_LOADERS = ("wine", "wine64", "wine-preloader", "wine64-preloader")
+WINEPREFIX_VARIABLE = b"WINEPREFIX="
+
+
+@dataclass(frozen=True)
+class WineProcess:
+    """
+    :param pid: The Windows process id in hexadecimal when listed by winedbg, the Unix process id otherwise
+    """
+    pid: str
+    threads: int
+    image: str
+    unix_pid: Optional[int] = None
+
+
+@dataclass(frozen=True)
+class ProcStat:
+    """
+    The fields of /proc/<pid>/stat that are of interest, times are in clock ticks
+    """
+    pid: int
+    state: str
+    utime: int
+    stime: int
+    threads: int
+    start_time: int
+    rss_pages: int
+
+    @classmethod
+    def parse(cls, pid: int, stat: bytes) -> "ProcStat":
+        # The command name is in parentheses, and may contain spaces and parentheses itself
+        fields = stat[stat.rindex(b")") + 2:].split()
+
+        return cls(
+            pid=pid,
+            state=fields[0].decode("ASCII"),
+            utime=int(fields[11]),
+            stime=int(fields[12]),
+            threads=int(fields[17]),
+            start_time=int(fields[19]),
+            rss_pages=int(fields[21])
+        )
+
+
+def _read_bytes(path: str) -> Optional[bytes]:
+    try:
+        with open(path, "rb") as fp:
+            return fp.read()
+
+    except OSError:
+        # The process exited, or belongs to someone else
+        return None
+
+
+def process_ids(proc: Path = PROC) -> Iterator[int]:
+    own_pid = os.getpid()
+
+    for entry in os.scandir(proc):
+        if entry.name.isdigit() and int(entry.name) != own_pid:
+            yield int(entry.name)
+
+
+def read_stat(pid: int, proc: Path = PROC) -> Optional[ProcStat]:
+    stat = _read_bytes(f"{proc}/{pid}/stat")
+
+    if not stat:
+        return None
+
+    try:
+        return ProcStat.parse(pid, stat)
+
+    except (ValueError, IndexError):
+        return None
+
+
+def read_io(pid: int, proc: Path = PROC) -> Optional[Dict[str, int]]:
+    """
+    I/O counters of a process, like read_bytes and write_bytes for storage I/O, and rchar and wchar for all I/O
+    """
+    io = _read_bytes(f"{proc}/{pid}/io")
+
+    if not io:
+        return None
+
+    counters = dict()
+
+    for line in io.decode("ASCII", errors="replace").splitlines():
+        name, _, value = line.partition(":")
+
+        if value.strip().isdigit():
+            counters[name] = int(value)
+
+    return counters
+
+
+def read_cmdline(pid: int, proc: Path = PROC) -> List[str]:
+    cmdline = _read_bytes(f"{proc}/{pid}/cmdline") or b""
+
+    return [argument.decode("UTF-8", errors="replace") for argument in cmdline.split(b"\0") if argument]
+
+
+def open_files_in(directory: Path, proc: Path = PROC) -> Set[str]:
+    """
+    Files in a directory that any process has open, including this one, by their resolved paths
+    """
+    directory_prefix = os.path.realpath(directory) + os.path.sep
+    open_files = set()
+
+    for entry in os.scandir(proc):
+        if not entry.name.isdigit():
+            continue
+
+        try:
+            fds = os.listdir(os.path.join(entry.path, "fd"))
+
+        except OSError:
+            # Processes of other users, or processes that exited in the meantime
+            continue
+
+        for fd in fds:
+            try:
+                target = os.readlink(os.path.join(entry.path, "fd", fd))
+
+            except OSError:
+                continue
+
+            if target.startswith(directory_prefix):
+                open_files.add(target)
+
+    return open_files
+
+
+def wineprefix_of(pid: int, proc: Path = PROC) -> Optional[str]:
+    environ = _read_bytes(f"{proc}/{pid}/environ")
+
+    if not environ or WINEPREFIX_VARIABLE not in environ:
+        return None
+
+    for variable in environ.split(b"\0"):
+        if variable.startswith(WINEPREFIX_VARIABLE):
+            return variable[len(WINEPREFIX_VARIABLE):].decode("UTF-8", errors="surrogateescape")
+
+    return None
+
+
+def _basename(path: str) -> str:
+    # Wine shows the Windows path of the executable as the command line of a process
+    return path.replace("\\", "/").rstrip("/").rsplit("/", 1)[-1]
+
+
+def image_name(cmdline: List[str]) -> str:
+    if not cmdline:
+        return ""
+
+    executable = _basename(cmdline[0])
+
+    # Processes that have not been turned into a Windows process yet, like `wine RobloxPlayerLauncher.exe`
+    if executable in WINE_LOADERS and len(cmdline) > 1:
+        return _basename(cmdline[1])
+
+    return executable
+
+
+def process_ids_by_prefix(base_directories: Iterable[Path], proc: Path = PROC) -> Dict[Path, List[int]]:
+    """
+    Processes started with the WINEPREFIX of each of the prefixes, found through their environment in one pass
+    """
+    prefixes = {os.path.normpath(str(base_directory)): base_directory for base_directory in base_directories}
+    pids: Dict[Path, List[int]] = {base_directory: [] for base_directory in prefixes.values()}
+
+    for pid in process_ids(proc):
+        wineprefix = wineprefix_of(pid, proc)
+        base_directory = None if wineprefix is None else prefixes.get(os.path.normpath(wineprefix), None)
+
+        if base_directory is not None:
+            pids[base_directory].append(pid)
+
+    return pids
+
+
+def prefix_process_ids(base_directory: Path, proc: Path = PROC) -> List[int]:
+    return process_ids_by_prefix([base_directory], proc)[base_directory]
+
+
+def prefix_processes(base_directory: Path, proc: Path = PROC) -> List[WineProcess]:
+    processes = []
+
+    for pid in prefix_process_ids(base_directory, proc):
+        stat = read_stat(pid, proc)
+        if stat is None:
+            continue
+
+        processes.append(WineProcess(str(pid), stat.threads, image_name(read_cmdline(pid, proc)), unix_pid=pid))
+
+    return processes
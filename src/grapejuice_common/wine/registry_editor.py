@@ -0,0 +1,223 @@
+import logging
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Dict, Tuple
+
+from grapejuice_common.errors import RegistryFormatError
+from grapejuice_common.wine.registry_file import RegistryFile, string_value, unescape_string, DEFAULT_ATTRIBUTE
+from grapejuice_common.wine.wineprefix_paths import WineprefixPaths
+
+log = logging.getLogger(__name__)
+
+REGEDIT_HEADERS = ("Windows Registry Editor Version 5.00", "REGEDIT4")
+
+REGEDIT_KEY_PTN = re.compile(r"\[(-?)([^\]]+)]")
+REGEDIT_ATTRIBUTE_PTN = re.compile(r"(@|\"(?:[^\"\\]|\\.)*\")\s*=\s*(.*)")
+REGEDIT_STRING_PTN = re.compile(r"\"((?:[^\"\\]|\\.)*)\"")
+
+k_user_hive = "user"
+k_system_hive = "system"
+
+# 32-bit programs see their own view of HKEY_LOCAL_MACHINE\Software, which is why regedit used to run twice
+WOW64_SHARED_KEY = "Software"
+WOW64_EXCLUDED_KEYS = ("Software\\Classes", "Software\\Wow6432Node")
+WOW64_KEY = "Software\\Wow6432Node"
+
+# Root key in a .reg file -> the hive Wine stores it in, and the key the hive is relative to
+HIVE_ROOTS: Dict[str, Tuple[str, str]] = {
+    "HKEY_CURRENT_USER": (k_user_hive, ""),
+    "HKCU": (k_user_hive, ""),
+    "HKEY_LOCAL_MACHINE": (k_system_hive, ""),
+    "HKLM": (k_system_hive, ""),
+    "HKEY_CLASSES_ROOT": (k_system_hive, "Software\\Classes"),
+    "HKCR": (k_system_hive, "Software\\Classes")
+}
+
+
+@dataclass(frozen=True)
+class RegistryEdit:
+    """
+    A single change from a .reg file, where key_path is relative to its hive and name is None for key operations
+    """
+    hive: str
+    key_path: str
+    name: Optional[str] = None
+    value: Optional[str] = None
+    delete: bool = False
+
+    @property
+    def wine_key_path(self) -> str:
+        # Backslashes in key paths are escaped in Wine registry files
+        return self.key_path.replace("\\", "\\\\")
+
+
+def _regedit_lines(text: str) -> List[str]:
+    lines = []
+    continued_line = ""
+
+    for line in text.splitlines():
+        line = line.strip()
+
+        if line.endswith("\\") and not line.startswith("["):
+            continued_line += line[:-1]
+            continue
+
+        lines.append(continued_line + line)
+        continued_line = ""
+
+    if continued_line:
+        lines.append(continued_line)
+
+    return lines
+
+
+def _hive_path(root_path: str) -> Tuple[str, str]:
+    root, _, key_path = root_path.partition("\\")
+    hive_root = HIVE_ROOTS.get(root.upper(), None)
+
+    if hive_root is None:
+        raise RegistryFormatError(f"Unsupported registry root '{root}'")
+
+    hive, hive_key_path = hive_root
+
+    return hive, "\\".join(filter(None, [hive_key_path, key_path]))
+
+
+def _wine_value(regedit_value: str) -> Optional[str]:
+    """
+    :return: The value in the format of a Wine registry file, None when the value should be deleted
+    """
+    if regedit_value == "-":
+        return None
+
+    match = REGEDIT_STRING_PTN.fullmatch(regedit_value)
+    if match:
+        # Regedit only escapes backslashes and quotes, Wine escapes everything outside of printable ASCII
+        return string_value(unescape_string(match.group(1)))
+
+    lower_value = regedit_value.lower()
+    if lower_value.startswith("dword:") or lower_value.startswith("hex"):
+        return lower_value.replace(" ", "")
+
+    raise RegistryFormatError(f"Unsupported registry value '{regedit_value}'")
+
+
+def parse_regedit(text: str) -> List[RegistryEdit]:
+    """
+    Parses a file in the format of regedit, the format Grapejuice ships registry patches in
+    """
+    lines = _regedit_lines(text)
+
+    if not lines or lines[0].lstrip("\ufeff") not in REGEDIT_HEADERS:
+        raise RegistryFormatError("Not a regedit file")
+
+    edits = []
+    current_key: Optional[Tuple[str, str]] = None
+
+    for line in lines[1:]:
+        if not line or line.startswith(";"):
+            continue
+
+        key_match = REGEDIT_KEY_PTN.fullmatch(line)
+        if key_match:
+            hive, key_path = _hive_path(key_match.group(2))
+
+            if key_match.group(1):
+                edits.append(RegistryEdit(hive, key_path, delete=True))
+                current_key = None
+
+            else:
+                edits.append(RegistryEdit(hive, key_path))
+                current_key = hive, key_path
+
+            continue
+
+        attribute_match = REGEDIT_ATTRIBUTE_PTN.fullmatch(line)
+        if attribute_match is None or current_key is None:
+            raise RegistryFormatError(f"Unexpected line in regedit file: {line}")
+
+        raw_name = attribute_match.group(1)
+        name = DEFAULT_ATTRIBUTE if raw_name == "@" else unescape_string(raw_name[1:-1])
+        value = _wine_value(attribute_match.group(2))
+
+        edits.append(RegistryEdit(*current_key, name=name, value=value, delete=value is None))
+
+    return edits
+
+
+def _wow64_edit(edit: RegistryEdit) -> Optional[RegistryEdit]:
+    lower_path = edit.key_path.lower()
+
+    if edit.hive != k_system_hive or not lower_path.startswith(WOW64_SHARED_KEY.lower() + "\\"):
+        return None
+
+    if any(lower_path == k.lower() or lower_path.startswith(k.lower() + "\\") for k in WOW64_EXCLUDED_KEYS):
+        return None
+
+    key_path = WOW64_KEY + edit.key_path[len(WOW64_SHARED_KEY):]
+
+    return RegistryEdit(edit.hive, key_path, edit.name, edit.value, edit.delete)
+
+
+def with_wow64_edits(edits: List[RegistryEdit]) -> List[RegistryEdit]:
+    """
+    Adds the edits regedit makes when it runs as a 32-bit program
+    """
+    return [*edits, *filter(None, map(_wow64_edit, edits))]
+
+
+def apply_edits(hive: RegistryFile, edits: List[RegistryEdit]):
+    for edit in edits:
+        if edit.name is None:
+            if edit.delete:
+                hive.delete_key(edit.wine_key_path)
+
+            else:
+                hive.create_key(edit.wine_key_path)
+
+            continue
+
+        registry_key = hive.create_key(edit.wine_key_path)
+
+        if edit.delete:
+            registry_key.delete_attribute(edit.name)
+
+        else:
+            registry_key.set_attribute(edit.name, edit.value)
+
+        registry_key.touch()
+
+
+def hive_paths(prefix_paths: WineprefixPaths) -> Dict[str, Path]:
+    return {
+        k_user_hive: prefix_paths.user_registry_hive,
+        k_system_hive: prefix_paths.system_registry_hive
+    }
+
+
+def apply_regedit_offline(prefix_paths: WineprefixPaths, text: str) -> bool:
+    """
+    Edits the registry files of a prefix directly, which only is safe when no wineserver is running for the prefix
+    :return: Whether the edits could be applied, edits to a hive that has not been created by Wine yet cannot
+    """
+    edits = with_wow64_edits(parse_regedit(text))
+    paths = hive_paths(prefix_paths)
+    edits_by_hive: Dict[str, List[RegistryEdit]] = dict()
+
+    for edit in edits:
+        edits_by_hive.setdefault(edit.hive, []).append(edit)
+
+    if not all(paths[hive].is_file() for hive in edits_by_hive):
+        return False
+
+    for hive_name, hive_edits in edits_by_hive.items():
+        hive = RegistryFile(paths[hive_name])
+        hive.load()
+
+        apply_edits(hive, hive_edits)
+        hive.save()
+
+        log.info(f"Applied {len(hive_edits)} registry edits to {hive.path}")
+
+    return True
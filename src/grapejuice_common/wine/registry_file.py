@@ -1,27 +1,316 @@
 import logging
+import os
 import re
+import time
 from copy import deepcopy
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Union, IO, List, Callable, Dict
+from typing import Union, IO, List, Callable, Dict, Optional, Iterable, Iterator, Tuple
+
+from grapejuice_common.errors import RegistryFormatError
 
 LOG = logging.getLogger(__name__)
 
-KEY_PTN = re.compile(r"\[(.*)?].*")
+# Wine escapes backslashes and square brackets in key paths
+KEY_PTN = re.compile(r"\[((?:[^\]\\]|\\.)*)]\s*(\S*)")
+META_ATTRIBUTE_PTN = re.compile(r"#([^=]*)=(.*)")
+ATTRIBUTE_PTN = re.compile(r"\"((?:[^\"\\]|\\.)*)\"\s*=\s*(.*)")
+DEFAULT_ATTRIBUTE_PTN = re.compile(r"@\s*=\s*(.*)")
+STRING_VALUE_PTN = re.compile(r"\"((?:[^\"\\]|\\.)*)\"")
+TYPED_STRING_VALUE_PTN = re.compile(r"str\(([0-9a-fA-F]+)\):\"((?:[^\"\\]|\\.)*)\"")
+HEX_VALUE_PTN = re.compile(r"hex(?:\(([0-9a-fA-F]+)\))?:([0-9a-fA-F,\s]*)")
+
+# Kinds of the entries parse_registry yields
+ENTRY_VERSION = "version"
+ENTRY_COMMENT = "comment"
+ENTRY_KEY = "key"
+ENTRY_SKIPPED_KEY = "skipped_key"
+ENTRY_METADATA = "metadata"
+ENTRY_ATTRIBUTE = "attribute"
+
+RegistryEntry = Tuple[str, str, Optional[str]]
+
+REG_NONE = 0
+REG_SZ = 1
+REG_EXPAND_SZ = 2
+REG_BINARY = 3
+REG_DWORD = 4
+REG_MULTI_SZ = 7
+REG_QWORD = 11
+
+WINE_REGISTRY_VERSION = "WINE REGISTRY Version 2"
+
+# Name of the default value of a key, written as @ in registry files
+DEFAULT_ATTRIBUTE = ""
+
+# Seconds between 1601-01-01, the epoch of Windows file times, and 1970-01-01
+FILETIME_EPOCH_OFFSET = 11644473600
+
+# Control characters with a C escape, the others are written in octal
+_ESCAPES = {"\a": "a", "\b": "b", "\t": "t", "\n": "n", "\v": "v", "\f": "f", "\r": "r", "\x1b": "e"}
+_UNESCAPES = {escape: c for c, escape in _ESCAPES.items()}
+_HEX_ESCAPE_PTN = re.compile(r"[0-9a-fA-F]{1,4}")
+_OCTAL_ESCAPE_PTN = re.compile(r"[0-7]{1,3}")
+_HEX_DIGITS = frozenset("0123456789abcdefABCDEF")
+_OCTAL_DIGITS = frozenset("01234567")
+
+
+def escape_string(s: str) -> str:
+    """
+    Escapes a string the way Wine writes strings to registry files, everything outside of printable ASCII is written
+    as UTF-16 code units. Escapes are padded to their full width when the next character would extend them.
+    """
+    encoded = s.encode("UTF-16-LE", errors="surrogatepass")
+    code_units = [int.from_bytes(encoded[i:i + 2], "little") for i in range(0, len(encoded), 2)]
+    escaped = []
+
+    for i, unit in enumerate(code_units):
+        c = chr(unit)
+        next_c = chr(code_units[i + 1]) if i + 1 < len(code_units) else ""
+
+        if unit > 0x7E:
+            escaped.append(f"\\x{unit:04x}" if next_c in _HEX_DIGITS else f"\\x{unit:x}")
+
+        elif c in _ESCAPES:
+            escaped.append("\\" + _ESCAPES[c])
+
+        elif unit < 0x20:
+            escaped.append(f"\\{unit:03o}" if next_c in _OCTAL_DIGITS else f"\\{unit:o}")
+
+        elif c in "\\\"":
+            escaped.append("\\" + c)
+
+        else:
+            escaped.append(c)
+
+    return "".join(escaped)
+
+
+def unescape_string(s: str) -> str:
+    if "\\" not in s:
+        return s
+
+    code_units = []
+    i = 0
+
+    def flush_text(text: str):
+        encoded = text.encode("UTF-16-LE")
+        code_units.extend(int.from_bytes(encoded[j:j + 2], "little") for j in range(0, len(encoded), 2))
+
+    while i < len(s):
+        c = s[i]
+
+        if c != "\\" or i + 1 >= len(s):
+            flush_text(c)
+            i += 1
+            continue
+
+        escaped = s[i + 1]
+        match = None
+
+        if escaped == "x":
+            match = _HEX_ESCAPE_PTN.match(s, i + 2)
+
+        elif escaped in _OCTAL_DIGITS:
+            match = _OCTAL_ESCAPE_PTN.match(s, i + 1)
+
+        if match:
+            code_units.append(int(match.group(0), 16 if escaped == "x" else 8))
+            i = match.end()
+            continue
+
+        flush_text(_UNESCAPES.get(escaped, escaped))
+        i += 2
+
+    return b"".join(unit.to_bytes(2, "little") for unit in code_units).decode("UTF-16-LE", errors="surrogatepass")
+
+
+def string_value(s: str) -> str:
+    return f"\"{escape_string(s)}\""
+
+
+def dword_value(n: int) -> str:
+    return f"dword:{n & 0xFFFFFFFF:08x}"
+
+
+@dataclass(frozen=True)
+class RegistryValue:
+    type: int
+    data: Union[str, int, bytes, List[str]]
+
+
+def _split_multi_string(s: str) -> List[str]:
+    strings = s.split("\0")
+
+    while strings and not strings[-1]:
+        strings.pop()
+
+    return strings
+
+
+def _decode_binary(value_type: int, data: bytes) -> RegistryValue:
+    if value_type in (REG_SZ, REG_EXPAND_SZ):
+        return RegistryValue(value_type, data.decode("UTF-16-LE", errors="replace").rstrip("\0"))
+
+    if value_type == REG_MULTI_SZ:
+        return RegistryValue(value_type, _split_multi_string(data.decode("UTF-16-LE", errors="replace")))
+
+    if value_type in (REG_DWORD, REG_QWORD) and len(data) == (4 if value_type == REG_DWORD else 8):
+        return RegistryValue(value_type, int.from_bytes(data, "little"))
 
+    return RegistryValue(value_type, data)
 
-def line_iterator(fp: IO):
-    for line in fp.read().split("\n"):
-        yield line.strip("\r").strip()
+
+def decode_value(raw: str) -> RegistryValue:
+    """
+    Decodes a value as written in a Wine registry file: strings, str(n):"...", dword:... and hex(n):...
+    :raises RegistryFormatError: When the value is not in any of those formats
+    """
+    match = STRING_VALUE_PTN.fullmatch(raw)
+    if match:
+        return RegistryValue(REG_SZ, unescape_string(match.group(1)))
+
+    if raw.startswith("dword:"):
+        try:
+            return RegistryValue(REG_DWORD, int(raw[6:], 16))
+
+        except ValueError as e:
+            raise RegistryFormatError(f"Invalid dword value '{raw}'") from e
+
+    match = TYPED_STRING_VALUE_PTN.fullmatch(raw)
+    if match:
+        value_type = int(match.group(1), 16)
+        s = unescape_string(match.group(2))
+
+        return RegistryValue(value_type, _split_multi_string(s) if value_type == REG_MULTI_SZ else s)
+
+    match = HEX_VALUE_PTN.fullmatch(raw)
+    if match:
+        value_type = int(match.group(1), 16) if match.group(1) else REG_BINARY
+
+        try:
+            data = bytes.fromhex(re.sub(r"[,\s]", "", match.group(2)))
+
+        except ValueError as e:
+            raise RegistryFormatError(f"Invalid hex value '{raw}'") from e
+
+        return _decode_binary(value_type, data)
+
+    raise RegistryFormatError(f"Unsupported registry value '{raw}'")
+
+
+def _parse_key_line(line: str) -> Optional[RegistryEntry]:
+    """
+    Parses a line within a key: an attribute, a metadata attribute or a comment
+    """
+    first = line[0]
+
+    if first == "\"":
+        match = ATTRIBUTE_PTN.match(line)
+
+        if match:
+            return ENTRY_ATTRIBUTE, unescape_string(match.group(1)), match.group(2)
+
+    elif first == "#":
+        match = META_ATTRIBUTE_PTN.match(line)
+
+        if match:
+            return ENTRY_METADATA, match.group(1), match.group(2)
+
+    elif first == "@":
+        match = DEFAULT_ATTRIBUTE_PTN.match(line)
+
+        if match:
+            return ENTRY_ATTRIBUTE, DEFAULT_ATTRIBUTE, match.group(1)
+
+    elif line.startswith(";;"):
+        return ENTRY_COMMENT, line, None
+
+    return None
+
+
+def parse_registry(
+    lines: Iterable[str],
+    wanted: Optional[Callable[[str], bool]] = None,
+    header: bool = True
+) -> Iterator[RegistryEntry]:
+    """
+    Streams the entries of a Wine registry file as (kind, name, value) tuples, where name is the path of a key
+    :param wanted: Decides which keys to parse by their lowercase path, lines of other keys are skipped unparsed.
+    Their paths are still yielded, as ENTRY_SKIPPED_KEY.
+    :param header: Whether the lines start with the version line, which is not the case when reading from the middle
+    of a file
+    """
+    lines = iter(lines)
+
+    if header:
+        for line in lines:
+            yield ENTRY_VERSION, line.strip(), None
+            break
+
+    skipping = False
+    continued_line = ""
+
+    for line in lines:
+        line = line.strip()
+
+        if not line:
+            continue
+
+        if line[0] == "[":
+            match = KEY_PTN.match(line)
+
+            if match:
+                path = match.group(1)
+                skipping = wanted is not None and not wanted(path.lower())
+                continued_line = ""
+
+                yield ENTRY_SKIPPED_KEY if skipping else ENTRY_KEY, path, match.group(2) or None
+
+                continue
+
+        if skipping:
+            continue
+
+        if continued_line or line.endswith("\\"):
+            # Long hexadecimal values continue on the next line
+            if line.endswith("\\"):
+                continued_line += line[:-1]
+                continue
+
+            line = continued_line + line
+            continued_line = ""
+
+        entry = _parse_key_line(line)
+
+        if entry is not None:
+            yield entry
+
+
+def key_path_filter(key_prefixes: Iterable[str]) -> Callable[[str], bool]:
+    """
+    Selects the keys at, and below, the given paths
+    """
+    prefixes = tuple(p.lower() for p in key_prefixes)
+    subkey_prefixes = tuple(p + "\\\\" for p in prefixes)
+
+    return lambda lower_path: lower_path in prefixes or lower_path.startswith(subkey_prefixes)
 
 
 class RegistryKey:
     _path: str
-    _value: any
+    _value: any = None
     _attributes: Dict[str, str]
+    _metadata: Dict[str, str]
 
     def __init__(self, path: str):
         self._path = path
         self._attributes = dict()
+        self._metadata = dict()
+
+    @property
+    def path(self) -> str:
+        return self._path
 
     @property
     def value(self):
@@ -31,16 +320,125 @@ class RegistryKey:
     def value(self, v):
         self._value = v
 
+    def _attribute_name(self, key: str) -> str:
+        # Value names are case insensitive in Windows
+        lower_key = key.lower()
+
+        return next(filter(lambda name: name.lower() == lower_key, self._attributes.keys()), key)
+
     def set_attribute(self, key: str, value: str):
+        """
+        :param value: The value as written in a registry file, see string_value and dword_value
+        """
+        name = self._attribute_name(key)
+
+        if name != key:
+            self._attributes.pop(name)
+
         self._attributes[key] = value
 
     def get_attribute(self, key: str):
         return self._attributes.get(key, None)
 
+    def get_value(self, key: str) -> Optional[RegistryValue]:
+        """
+        The decoded value of an attribute, looked up case insensitively
+        :raises RegistryFormatError: When the value cannot be decoded
+        """
+        raw = self._attributes.get(self._attribute_name(key), None)
+
+        return None if raw is None else decode_value(raw)
+
+    def delete_attribute(self, key: str) -> bool:
+        return self._attributes.pop(self._attribute_name(key), None) is not None
+
     @property
     def attributes(self) -> Dict[str, str]:
         return deepcopy(self._attributes)
 
+    def set_metadata(self, key: str, value: str):
+        self._metadata[key] = value
+
+    def get_metadata(self, key: str) -> Optional[str]:
+        return self._metadata.get(key, None)
+
+    @property
+    def metadata(self) -> Dict[str, str]:
+        return deepcopy(self._metadata)
+
+    def add_entry(self, kind: str, name: str, value: str):
+        """
+        Adds metadata or an attribute read by parse_registry
+        """
+        if kind == ENTRY_METADATA:
+            self._metadata[name] = value
+
+        elif kind == ENTRY_ATTRIBUTE:
+            # Wine writes every name once, the case insensitive lookup of set_attribute is not needed
+            self._attributes[name] = value
+
+    @property
+    def as_dict(self) -> Dict:
+        return {"path": self._path, "value": self._value, "metadata": self.metadata, "attributes": self.attributes}
+
+    @classmethod
+    def from_dict(cls, d: Dict) -> "RegistryKey":
+        registry_key = cls(d["path"])
+        registry_key.value = d["value"]
+
+        for name, value in d["metadata"].items():
+            registry_key.add_entry(ENTRY_METADATA, name, value)
+
+        for name, value in d["attributes"].items():
+            registry_key.add_entry(ENTRY_ATTRIBUTE, name, value)
+
+        return registry_key
+
+    def touch(self):
+        """
+        Updates the modification time of the key
+        """
+        now = time.time()
+        filetime = int((now + FILETIME_EPOCH_OFFSET) * 10 ** 7)
+
+        self._value = str(int(now))
+        self._metadata["time"] = f"{filetime:x}"
+
+    def serialize(self) -> List[str]:
+        lines = [f"[{self._path}]" if self._value is None else f"[{self._path}] {self._value}"]
+        lines.extend(self.serialize_metadata())
+
+        for name, value in self._attributes.items():
+            serialized_name = "@" if name == DEFAULT_ATTRIBUTE else string_value(name)
+            lines.append(f"{serialized_name}={value}")
+
+        return lines
+
+    def serialize_metadata(self) -> List[str]:
+        return [f"#{name}={value}" for name, value in self._metadata.items()]
+
+
+def read_key(lines: Iterable[str], path: str, header: bool = True) -> Optional[RegistryKey]:
+    """
+    Parses a single key from the lines of a registry file, and stops reading once it is complete
+    """
+    lower_path = path.lower()
+    registry_key = None
+
+    for kind, name, value in parse_registry(lines, wanted=lambda p: p == lower_path, header=header):
+        if kind == ENTRY_SKIPPED_KEY:
+            if registry_key is not None:
+                break
+
+        elif kind == ENTRY_KEY:
+            registry_key = RegistryKey(name)
+            registry_key.value = value
+
+        elif registry_key is not None:
+            registry_key.add_entry(kind, name, value)
+
+    return registry_key
+
 
 class RegistryFile:
     _path: Path
@@ -49,7 +447,8 @@ class RegistryFile:
     _comments: List[str]
     _root_key: RegistryKey
     _keys: Dict[str, RegistryKey]
-    _last_key_read: Union[RegistryKey, None] = None
+    _loaded: bool = False
+    _partial: bool = False
 
     def __init__(self, path: Union[str, Path]):
         if isinstance(path, str):
@@ -63,70 +462,114 @@ class RegistryFile:
         self._root_key = RegistryKey("\\")
 
     @property
-    def _current_key(self) -> RegistryKey:
-        if self._last_key_read is not None:
-            return self._last_key_read
+    def path(self) -> Path:
+        return self._path
 
-        else:
-            return self._root_key
+    @property
+    def keys(self) -> List[RegistryKey]:
+        return list(self._keys.values())
 
-    def find_key(self, path: str):
-        return self._keys.get(path, None)
+    def _open(self) -> IO:
+        # Wine writes ASCII, whatever else is in the file is kept as-is when it is saved again
+        return self._path.open("r", encoding="UTF-8", errors="surrogateescape")
 
-    def load(self):
-        class LoadState:
-            operator: Callable[[str], None]
+    def find_key(self, path: str) -> Optional[RegistryKey]:
+        """
+        Finds a key in the loaded file. When the file has not been loaded, only the requested key is parsed and
+        reading stops once it is complete.
+        :param path: Path of the key as written in the registry file, where backslashes are escaped
+        """
+        # Key names are case insensitive in Windows
+        lower_path = path.lower()
 
-        def normal(ln: str):
-            if ln.startswith(";;"):
-                return comment(ln)
+        if self._loaded:
+            return self._keys.get(lower_path, None)
 
-            match = KEY_PTN.match(ln)
-            if match:
-                return key(ln)
+        with self._open() as fp:
+            return read_key(fp, path)
 
-            return attribute(ln)
+    def create_key(self, path: str) -> RegistryKey:
+        """
+        Finds a key, and adds it when it is not present. Wine creates missing parent keys when loading the file.
+        """
+        registry_key = self._keys.get(path.lower(), None)
 
-        def version(ln: str):
-            self._version = ln
-            LoadState.operator = normal
+        if registry_key is None:
+            registry_key = self._keys.setdefault(path.lower(), RegistryKey(path))
+            registry_key.touch()
 
-        def comment(ln: str):
-            self._comments.append(ln)
+        return registry_key
 
-        def key(ln: str):
-            split = ln.split(" ")
-            path = split[0].lstrip("[").strip("]")
-            registry_key = self._keys.setdefault(path, RegistryKey(path))
+    def delete_key(self, path: str) -> bool:
+        """
+        Deletes a key and all of its subkeys
+        """
+        wanted = key_path_filter([path])
+        doomed = list(filter(wanted, self._keys.keys()))
 
-            if len(split) > 1:
-                registry_key.value = split[1].strip()
+        for p in doomed:
+            self._keys.pop(p)
 
-            self._last_key_read = registry_key
+        return len(doomed) > 0
 
-        def attribute(ln: str):
-            if not ln:
-                return
+    def load(self, key_prefixes: Optional[Iterable[str]] = None):
+        """
+        :param key_prefixes: Only keep these keys and their subkeys, the lines of other keys are skipped unparsed.
+        A file loaded this way cannot be saved.
+        """
+        wanted = None if key_prefixes is None else key_path_filter(key_prefixes)
+        current_key = self._root_key
 
-            match = re.match(r"#(.*)?=(.*)", ln)
-            if match:
-                self._current_key.set_attribute(match.group(1), match.group(2))
-                return
+        with self._open() as fp:
+            for kind, name, value in parse_registry(fp, wanted=wanted):
+                if kind == ENTRY_SKIPPED_KEY:
+                    continue
 
-            match = re.match(r"\"(.*)?\"\s*=\s*(.*)", ln)
-            if match:
-                self._current_key.set_attribute(match.group(1), match.group(2))
-                return
+                if kind == ENTRY_KEY:
+                    current_key = self._keys.setdefault(name.lower(), RegistryKey(name))
+
+                    if value is not None:
+                        current_key.value = value
+
+                elif kind == ENTRY_VERSION:
+                    self._version = name
+
+                elif kind == ENTRY_COMMENT:
+                    self._comments.append(name)
+
+                else:
+                    current_key.add_entry(kind, name, value)
+
+        self._loaded = True
+        self._partial = wanted is not None
+
+    def serialize(self) -> str:
+        lines = [self._version or WINE_REGISTRY_VERSION, *self._comments, ""]
+
+        # Metadata before the first key, like #arch, applies to the entire file
+        root_metadata = self._root_key.serialize_metadata()
+        if root_metadata:
+            lines.extend([*root_metadata, ""])
+
+        for registry_key in self._keys.values():
+            lines.extend([*registry_key.serialize(), ""])
+
+        return "\n".join(lines)
+
+    def save(self, path: Optional[Path] = None):
+        """
+        Writes the registry file, Wine must not have the hive loaded at the same time
+        """
+        if self._partial:
+            raise RuntimeError(f"Only some keys of {self._path} were loaded, saving it would lose the others")
 
-        LoadState.operator = version
+        path = path or self._path
+        temporary_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
 
-        with self._path.open("r") as fp:
-            if callable(LoadState.operator):
-                for line in line_iterator(fp):
-                    LoadState.operator(line)
+        with temporary_path.open("w+", encoding="UTF-8", errors="surrogateescape") as fp:
+            fp.write(self.serialize())
 
-            else:
-                LOG.warning("LoadState.operator is not callable")
+        os.replace(temporary_path, path)
 
     def __enter__(self):
         return self
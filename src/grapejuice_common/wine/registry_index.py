@@ -0,0 +1,235 @@
+import hashlib
+import io
+import json
+import logging
+import mmap
+import os
+import re
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional, Dict, Tuple, Union
+
+from grapejuice_common import paths
+from grapejuice_common.util.cache_utils import MemoCache
+from grapejuice_common.wine.registry_file import RegistryFile, RegistryKey, read_key
+
+log = logging.getLogger(__name__)
+
+INDEX_FORMAT_VERSION = 1
+
+# Parsed keys are kept for the keys Grapejuice actually asks for, which are only a handful
+MAX_SNAPSHOTS = 64
+
+KEY_LINE_PTN = re.compile(rb"^\[((?:[^\]\\\n]|\\.)*)]", re.MULTILINE)
+
+k_format_version = "format_version"
+k_signature = "signature"
+k_offsets = "offsets"
+k_snapshots = "snapshots"
+
+HiveSignature = Tuple[str, int, int]
+
+
+def hive_signature(hive_path: Path) -> Optional[HiveSignature]:
+    try:
+        stat = hive_path.stat()
+
+    except FileNotFoundError:
+        return None
+
+    return str(hive_path), stat.st_size, stat.st_mtime_ns
+
+
+def scan_key_offsets(hive_path: Path) -> Dict[str, int]:
+    """
+    Byte offsets of the key lines in a hive by lowercase key path, found without parsing anything else
+    """
+    offsets = dict()
+
+    with hive_path.open("rb") as fp:
+        if os.fstat(fp.fileno()).st_size == 0:
+            return offsets
+
+        with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for match in KEY_LINE_PTN.finditer(mm):
+                path = match.group(1).decode("UTF-8", errors="surrogateescape").lower()
+                offsets.setdefault(path, match.start())
+
+    return offsets
+
+
+def _write_json(path: Path, value: Dict):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    temporary_path.write_text(json.dumps(value))
+    os.replace(temporary_path, path)
+
+
+def _read_json(path: Path) -> Optional[Dict]:
+    try:
+        return json.loads(path.read_text())
+
+    except FileNotFoundError:
+        return None
+
+    except (OSError, ValueError) as e:
+        log.warning(f"Ignoring unreadable registry index at '{path}': {e}")
+        return None
+
+
+@dataclass
+class _IndexState:
+    signature: HiveSignature
+    offsets: Dict[str, int]
+    snapshots: Dict[str, Dict] = field(default_factory=dict)
+
+
+class RegistryIndex:
+    """
+    Where every key of a hive starts, and the parsed contents of the keys that were asked for. The index is stored in
+    the cache directory and belongs to a version of the hive identified by its path, size and modification time.
+    """
+    _hive_path: Path
+    _directory: Path
+    _state: Optional[_IndexState] = None
+    _lock: threading.Lock
+
+    def __init__(self, hive_path: Path, directory: Optional[Path] = None):
+        self._hive_path = hive_path.absolute()
+        self._directory = directory or paths.registry_index_directory()
+        self._lock = threading.Lock()
+
+    @property
+    def _name(self) -> str:
+        return hashlib.sha256(str(self._hive_path).encode("UTF-8")).hexdigest()
+
+    @property
+    def _offsets_path(self) -> Path:
+        return self._directory / f"{self._name}.offsets.json"
+
+    @property
+    def _snapshots_path(self) -> Path:
+        return self._directory / f"{self._name}.snapshots.json"
+
+    def _stored_state(self, signature: HiveSignature) -> Optional[_IndexState]:
+        stored_offsets = _read_json(self._offsets_path)
+
+        if stored_offsets is None or stored_offsets.get(k_format_version, None) != INDEX_FORMAT_VERSION:
+            return None
+
+        if tuple(stored_offsets.get(k_signature, ())) != signature:
+            return None
+
+        state = _IndexState(signature, stored_offsets[k_offsets])
+
+        # Snapshots are written separately, so adding one does not rewrite every offset
+        stored_snapshots = _read_json(self._snapshots_path) or dict()
+        if tuple(stored_snapshots.get(k_signature, ())) == signature:
+            state.snapshots = stored_snapshots.get(k_snapshots, dict())
+
+        return state
+
+    def _build_state(self, signature: HiveSignature) -> _IndexState:
+        log.info(f"Indexing registry keys in {self._hive_path}")
+
+        state = _IndexState(signature, scan_key_offsets(self._hive_path))
+
+        try:
+            _write_json(self._offsets_path, {
+                k_format_version: INDEX_FORMAT_VERSION,
+                k_signature: signature,
+                k_offsets: state.offsets
+            })
+
+        except OSError as e:
+            log.warning(f"Could not save the registry index of {self._hive_path}: {e}")
+
+        return state
+
+    def _current_state(self) -> Optional[_IndexState]:
+        signature = hive_signature(self._hive_path)
+
+        if signature is None:
+            self._state = None
+
+        elif self._state is None or self._state.signature != signature:
+            self._state = self._stored_state(signature) or self._build_state(signature)
+
+        return self._state
+
+    def _read_key_at(self, offset: int, path: str) -> Optional[RegistryKey]:
+        with self._hive_path.open("rb") as fp:
+            fp.seek(offset)
+
+            with io.TextIOWrapper(fp, encoding="UTF-8", errors="surrogateescape") as text:
+                return read_key(text, path, header=False)
+
+    def _snapshot(self, state: _IndexState, lower_path: str, registry_key: RegistryKey):
+        if len(state.snapshots) >= MAX_SNAPSHOTS:
+            return
+
+        state.snapshots[lower_path] = registry_key.as_dict
+
+        try:
+            _write_json(self._snapshots_path, {k_signature: state.signature, k_snapshots: state.snapshots})
+
+        except OSError as e:
+            log.warning(f"Could not save registry key snapshots of {self._hive_path}: {e}")
+
+    def find_key(self, path: str) -> Optional[RegistryKey]:
+        """
+        :param path: Path of the key as written in the registry file, where backslashes are escaped
+        """
+        lower_path = path.lower()
+
+        with self._lock:
+            state = self._current_state()
+            if state is None:
+                return None
+
+            snapshot = state.snapshots.get(lower_path, None)
+            if snapshot is not None:
+                return RegistryKey.from_dict(snapshot)
+
+            offset = state.offsets.get(lower_path, None)
+            if offset is None:
+                return None
+
+            registry_key = self._read_key_at(offset, path)
+
+            if registry_key is None:
+                # The hive was replaced between looking at it and reading from it
+                log.warning(f"Registry index of {self._hive_path} is out of date, reading the hive instead")
+                return RegistryFile(self._hive_path).find_key(path)
+
+            self._snapshot(state, lower_path, registry_key)
+
+            return registry_key
+
+    def invalidate(self):
+        with self._lock:
+            self._state = None
+
+            for index_path in (self._offsets_path, self._snapshots_path):
+                try:
+                    index_path.unlink()
+
+                except FileNotFoundError:
+                    pass
+
+
+_indexes = MemoCache("registry_indexes", max_size=16)
+
+
+def registry_index(hive_path: Union[str, Path]) -> RegistryIndex:
+    hive_path = Path(hive_path).absolute()
+
+    return _indexes.get_or_compute(hive_path, lambda: RegistryIndex(hive_path))
+
+
+def find_registry_key(hive_path: Union[str, Path], path: str) -> Optional[RegistryKey]:
+    """
+    Finds a key in a hive through its index, without parsing the hive when it has not changed
+    """
+    return registry_index(hive_path).find_key(path)
@@ -0,0 +1,226 @@
+import gzip
+import logging
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+from typing import List, Dict, Iterator, Optional
+
+from grapejuice_common.wine.process_table import PROC, prefix_processes
+from grapejuice_common.wine.wineprefix_paths import WineprefixPaths
+
+log = logging.getLogger(__name__)
+
+MIB = 1024 * 1024
+
+DEFAULT_BUDGET_MIB = 512
+DEFAULT_MAX_AGE_DAYS = 14
+
+# Roblox writes a log for the whole session, a log that was written to recently may still be open
+COMPRESS_AFTER_SECONDS = 60 * 60
+
+CHUNK_SIZE = MIB
+MAX_WORKERS = 4
+
+ROTATED_SUFFIXES = (".log", ".dmp")
+COMPRESSED_SUFFIX = ".gz"
+
+
+@dataclass(frozen=True)
+class RotationPolicy:
+    """
+    :param budget_bytes: Bytes the Roblox logs and crash dumps of a prefix may take up, the oldest files go first
+    :param max_age_seconds: Files that have not been written to for this long are removed
+    """
+    budget_bytes: int = DEFAULT_BUDGET_MIB * MIB
+    max_age_seconds: int = DEFAULT_MAX_AGE_DAYS * 24 * 60 * 60
+    compress_after_seconds: int = COMPRESS_AFTER_SECONDS
+
+    @classmethod
+    def from_settings(cls) -> "RotationPolicy":
+        from grapejuice_common.features.settings import current_settings, k_roblox_log_budget_mib, \
+            k_roblox_log_max_age_days
+
+        return cls(
+            budget_bytes=int(current_settings.get(k_roblox_log_budget_mib, DEFAULT_BUDGET_MIB)) * MIB,
+            max_age_seconds=int(current_settings.get(k_roblox_log_max_age_days, DEFAULT_MAX_AGE_DAYS)) * 24 * 60 * 60
+        )
+
+
+@dataclass
+class RotationReport:
+    base_directory: Path
+    skipped: bool = False
+    bytes_before: int = 0
+    bytes_after: int = 0
+    compressed_files: int = 0
+    removed_files: int = 0
+    errors: List[str] = field(default_factory=list)
+
+    @property
+    def reclaimed_bytes(self) -> int:
+        return self.bytes_before - self.bytes_after
+
+    @property
+    def as_dict(self) -> Dict:
+        return {**asdict(self), "base_directory": str(self.base_directory), "reclaimed_bytes": self.reclaimed_bytes}
+
+
+@dataclass
+class _RotatedFile:
+    path: Path
+    size: int
+    mtime: float
+
+    @property
+    def is_compressed(self) -> bool:
+        return self.path.name.endswith(COMPRESSED_SUFFIX)
+
+
+def rotation_directories(prefix_paths: WineprefixPaths) -> List[Path]:
+    return [prefix_paths.roblox_logs_directory, *prefix_paths.roblox_temp_directories]
+
+
+def _rotated_files(directories: List[Path]) -> Iterator[_RotatedFile]:
+    seen = set()
+
+    for directory in directories:
+        for root, _, file_names in os.walk(directory):
+            for file_name in file_names:
+                name = file_name.lower()
+
+                if name.endswith(COMPRESSED_SUFFIX):
+                    name = name[:-len(COMPRESSED_SUFFIX)]
+
+                    # Left behind by an interrupted rotation, the original is compressed again
+                    if os.path.exists(os.path.join(root, file_name[:-len(COMPRESSED_SUFFIX)])):
+                        continue
+
+                if not name.endswith(ROTATED_SUFFIXES):
+                    continue
+
+                path = Path(root, file_name)
+
+                try:
+                    stat = path.lstat()
+
+                except FileNotFoundError:
+                    continue
+
+                if (stat.st_dev, stat.st_ino) not in seen:
+                    seen.add((stat.st_dev, stat.st_ino))
+                    yield _RotatedFile(path, stat.st_size, stat.st_mtime)
+
+
+def _compress(rotated: _RotatedFile) -> _RotatedFile:
+    compressed_path = rotated.path.with_name(rotated.path.name + COMPRESSED_SUFFIX)
+
+    with rotated.path.open("rb") as source, gzip.open(compressed_path, "wb", compresslevel=6) as target:
+        shutil.copyfileobj(source, target, CHUNK_SIZE)
+
+    # Age is judged by modification time, which should stay that of the original
+    os.utime(compressed_path, (rotated.mtime, rotated.mtime))
+    rotated.path.unlink()
+
+    return _RotatedFile(compressed_path, compressed_path.stat().st_size, rotated.mtime)
+
+
+def roblox_is_running(prefix_paths: WineprefixPaths, proc: Path = PROC) -> bool:
+    return any(p.image.lower().startswith("roblox") for p in prefix_processes(prefix_paths.base_directory, proc))
+
+
+def rotate_roblox_logs(
+    prefix_paths: WineprefixPaths,
+    policy: Optional[RotationPolicy] = None,
+    now: Optional[float] = None
+) -> RotationReport:
+    """
+    Compresses the logs and crash dumps Roblox leaves in a prefix, and removes them by age and budget
+    """
+    policy = policy or RotationPolicy.from_settings()
+    now = time.time() if now is None else now
+    report = RotationReport(prefix_paths.base_directory)
+
+    if roblox_is_running(prefix_paths):
+        log.info(f"Not rotating Roblox logs in {prefix_paths.base_directory}, Roblox is running")
+        report.skipped = True
+        return report
+
+    files = list(_rotated_files(rotation_directories(prefix_paths)))
+    report.bytes_before = sum(f.size for f in files)
+
+    def remove(rotated: _RotatedFile) -> bool:
+        try:
+            rotated.path.unlink()
+            report.removed_files += 1
+            return True
+
+        except FileNotFoundError:
+            return True
+
+        except OSError as e:
+            report.errors.append(f"{rotated.path}: {e}")
+            return False
+
+    kept = []
+    to_compress = []
+
+    for rotated in files:
+        if now - rotated.mtime > policy.max_age_seconds and remove(rotated):
+            continue
+
+        if not rotated.is_compressed and now - rotated.mtime > policy.compress_after_seconds:
+            to_compress.append(rotated)
+
+        else:
+            kept.append(rotated)
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        for rotated, future in [(f, executor.submit(_compress, f)) for f in to_compress]:
+            try:
+                kept.append(future.result())
+                report.compressed_files += 1
+
+            except OSError as e:
+                report.errors.append(f"{rotated.path}: {e}")
+                kept.append(rotated)
+
+    total_size = sum(f.size for f in kept)
+
+    for rotated in sorted(kept, key=lambda f: f.mtime):
+        if total_size <= policy.budget_bytes:
+            break
+
+        if remove(rotated):
+            total_size -= rotated.size
+
+    report.bytes_after = total_size
+
+    log.info(
+        f"Rotated Roblox logs in {prefix_paths.base_directory}: reclaimed {report.reclaimed_bytes} bytes, "
+        f"compressed {report.compressed_files} and removed {report.removed_files} files"
+    )
+
+    return report
+
+
+def rotate_all_roblox_logs(policy: Optional[RotationPolicy] = None) -> List[RotationReport]:
+    from grapejuice_common.features.settings import current_settings
+
+    policy = policy or RotationPolicy.from_settings()
+    reports = []
+
+    for configuration in current_settings.parsed_wineprefixes_sorted:
+        prefix_paths = WineprefixPaths(configuration.base_directory)
+
+        if prefix_paths.present_on_disk:
+            reports.append(rotate_roblox_logs(prefix_paths, policy))
+
+    return reports
+
+
+def rotate_all_roblox_logs_in_background():
+    threading.Thread(target=rotate_all_roblox_logs, name="rotate-roblox-logs", daemon=True).start()
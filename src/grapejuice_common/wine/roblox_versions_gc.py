@@ -0,0 +1,295 @@
+import logging
+import os
+import shutil
+import tarfile
+import time
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+from typing import List, Dict, Set, Optional, Iterable
+
+from grapejuice_common import paths
+from grapejuice_common.wine.process_table import PROC, prefix_process_ids
+from grapejuice_common.wine.roblox_log_rotation import roblox_is_running
+from grapejuice_common.wine.wineprefix_paths import WineprefixPaths
+
+log = logging.getLogger(__name__)
+
+DEFAULT_KEEP = 2
+
+# Installers younger than this may still be running, or be about to be
+INSTALLER_GRACE_SECONDS = 60 * 60
+
+VERSION_PREFIX = "version-"
+
+k_player = "player"
+k_studio = "studio"
+
+# A version directory holds one product, which is recognised by its executables
+PRODUCT_EXECUTABLES: Dict[str, List[str]] = {
+    k_player: ["RobloxPlayerBeta.exe", "RobloxPlayerLauncher.exe"],
+    k_studio: ["RobloxStudioBeta.exe", "RobloxStudioLauncherBeta.exe"]
+}
+
+
+@dataclass
+class RobloxVersion:
+    path: Path
+    product: str
+    mtime: float
+
+    @property
+    def name(self) -> str:
+        return self.path.name
+
+
+@dataclass
+class VersionsReport:
+    base_directory: Path
+    dry_run: bool
+    skipped: bool = False
+    kept: List[str] = field(default_factory=list)
+    in_use: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    archived: List[str] = field(default_factory=list)
+    installers: List[str] = field(default_factory=list)
+    reclaimed_bytes: int = 0
+    errors: List[str] = field(default_factory=list)
+
+    @property
+    def as_dict(self) -> Dict:
+        return {**asdict(self), "base_directory": str(self.base_directory)}
+
+
+def disk_usage(path: Path) -> int:
+    """
+    Bytes that are freed by removing a file or a directory tree. Files with hard links outside of the tree are not
+    counted, as removing the tree does not free them.
+    """
+    links: Dict[tuple, int] = dict()
+    sizes: Dict[tuple, os.stat_result] = dict()
+
+    def visit(file_path: str):
+        try:
+            stat = os.lstat(file_path)
+
+        except FileNotFoundError:
+            return
+
+        identity = stat.st_dev, stat.st_ino
+        links[identity] = links.get(identity, 0) + 1
+        sizes[identity] = stat
+
+    if path.is_dir() and not path.is_symlink():
+        for root, directories, file_names in os.walk(path):
+            for name in (*directories, *file_names):
+                visit(os.path.join(root, name))
+
+    visit(str(path))
+
+    return sum(stat.st_blocks * 512 for identity, stat in sizes.items() if stat.st_nlink <= links[identity])
+
+
+def _product_of(version_path: Path) -> Optional[RobloxVersion]:
+    for product, executables in PRODUCT_EXECUTABLES.items():
+        mtimes = []
+
+        for executable in executables:
+            try:
+                mtimes.append((version_path / executable).stat().st_mtime)
+
+            except FileNotFoundError:
+                continue
+
+        if mtimes:
+            return RobloxVersion(version_path, product, max(mtimes))
+
+    # A version that is being installed, or one that is not Roblox at all
+    return None
+
+
+def roblox_versions(prefix_paths: WineprefixPaths) -> List[RobloxVersion]:
+    versions = []
+
+    for versions_directory in prefix_paths.roblox_versions_directories:
+        if not versions_directory.is_dir():
+            continue
+
+        for entry in os.scandir(versions_directory):
+            if entry.name.lower().startswith(VERSION_PREFIX) and entry.is_dir(follow_symlinks=False):
+                version = _product_of(Path(entry.path))
+
+                if version is not None:
+                    versions.append(version)
+
+    return versions
+
+
+def paths_in_use(base_directory: Path, proc: Path = PROC) -> Set[str]:
+    """
+    Files that the processes of a prefix have mapped, which include the executables and libraries of Roblox, and their
+    working directories
+    """
+    in_use = set()
+
+    for pid in prefix_process_ids(base_directory, proc):
+        for link in ("exe", "cwd"):
+            try:
+                in_use.add(os.readlink(f"{proc}/{pid}/{link}"))
+
+            except OSError:
+                pass
+
+        try:
+            with open(f"{proc}/{pid}/maps", "rb") as fp:
+                for line in fp:
+                    fields = line.split(maxsplit=5)
+
+                    if len(fields) == 6 and fields[5].startswith(b"/"):
+                        in_use.add(fields[5].rstrip(b"\n").decode("UTF-8", errors="surrogateescape"))
+
+        except OSError:
+            continue
+
+    return in_use
+
+
+def _is_in_use(path: Path, in_use: Iterable[str]) -> bool:
+    # The kernel shows resolved paths
+    path_string = os.path.realpath(path)
+
+    return any(p == path_string or p.startswith(path_string + os.path.sep) for p in in_use)
+
+
+def leftover_installers(prefix_paths: WineprefixPaths, now: float) -> List[Path]:
+    installers = []
+
+    if prefix_paths.temp_directory.is_dir():
+        installers.extend(prefix_paths.temp_directory.glob("Roblox*.exe"))
+
+    for directory in prefix_paths.roblox_temp_directories:
+        installers.extend(directory.rglob("*.exe"))
+
+    return [p for p in installers if p.is_file() and now - p.stat().st_mtime > INSTALLER_GRACE_SECONDS]
+
+
+def _archive_version(version: RobloxVersion, archive_directory: Path) -> Path:
+    archive_directory.mkdir(parents=True, exist_ok=True)
+    archive_path = archive_directory / f"{version.name}.tar.gz"
+    partial_path = archive_path.with_name(archive_path.name + ".partial")
+
+    with tarfile.open(partial_path, "w:gz") as tf:
+        tf.add(version.path, arcname=version.name)
+
+    os.replace(partial_path, archive_path)
+
+    return archive_path
+
+
+def _collectable_versions(
+    prefix_paths: WineprefixPaths,
+    keep: int,
+    in_use: Iterable[str],
+    report: VersionsReport
+) -> List[RobloxVersion]:
+    versions_by_product: Dict[str, List[RobloxVersion]] = dict()
+    for version in roblox_versions(prefix_paths):
+        versions_by_product.setdefault(version.product, []).append(version)
+
+    collectable: List[RobloxVersion] = []
+
+    for versions in versions_by_product.values():
+        versions.sort(key=lambda v: v.mtime, reverse=True)
+
+        for i, version in enumerate(versions):
+            if i < keep:
+                report.kept.append(version.name)
+
+            elif _is_in_use(version.path, in_use):
+                report.in_use.append(version.name)
+
+            else:
+                collectable.append(version)
+
+    return collectable
+
+
+def _remove_leftover_installers(
+    prefix_paths: WineprefixPaths,
+    in_use: Iterable[str],
+    dry_run: bool,
+    report: VersionsReport
+):
+    for installer in leftover_installers(prefix_paths, time.time()):
+        if _is_in_use(installer, in_use):
+            continue
+
+        size = disk_usage(installer)
+
+        try:
+            if not dry_run:
+                installer.unlink()
+
+            report.installers.append(installer.name)
+            report.reclaimed_bytes += size
+
+        except OSError as e:
+            report.errors.append(f"{installer}: {e}")
+
+
+def collect_roblox_versions(
+    prefix_paths: WineprefixPaths,
+    keep: Optional[int] = None,
+    archive: bool = False,
+    dry_run: bool = False,
+    archive_directory: Optional[Path] = None,
+    proc: Path = PROC,
+    skip_while_running: bool = False
+) -> VersionsReport:
+    """
+    Removes the Roblox versions of a prefix that are not in use. The newest versions of every product are kept, and
+    so is every version that a running process has files of mapped.
+    :param archive: Store the removed versions as archives instead of just removing them
+    :param skip_while_running: Leave the prefix alone while Roblox runs in it, as Roblox may be updating itself
+    """
+    keep = keep_versions_setting() if keep is None else max(1, keep)
+    report = VersionsReport(prefix_paths.base_directory, dry_run)
+
+    if skip_while_running and roblox_is_running(prefix_paths, proc):
+        log.info(f"Not removing Roblox versions in {prefix_paths.base_directory}, Roblox is running")
+        report.skipped = True
+        return report
+
+    archive_directory = archive_directory or paths.roblox_version_archive_directory() / prefix_paths.base_directory.name
+    in_use = paths_in_use(prefix_paths.base_directory, proc)
+
+    for version in _collectable_versions(prefix_paths, keep, in_use, report):
+        size = disk_usage(version.path)
+
+        try:
+            if archive and not dry_run:
+                size -= _archive_version(version, archive_directory).stat().st_size
+                report.archived.append(version.name)
+
+            if not dry_run:
+                shutil.rmtree(version.path)
+
+            report.removed.append(version.name)
+            report.reclaimed_bytes += size
+
+        except OSError as e:
+            report.errors.append(f"{version.path}: {e}")
+
+    _remove_leftover_installers(prefix_paths, in_use, dry_run, report)
+
+    log.info(
+        f"{'Would reclaim' if dry_run else 'Reclaimed'} {report.reclaimed_bytes} bytes of Roblox versions in "
+        f"{prefix_paths.base_directory}, removed {len(report.removed)} versions and {len(report.installers)} installers"
+    )
+
+    return report
+
+
+def keep_versions_setting() -> int:
+    from grapejuice_common.features.settings import current_settings, k_roblox_versions_keep
+
+    return max(1, int(current_settings.get(k_roblox_versions_keep, DEFAULT_KEEP)))
@@ -0,0 +1,292 @@
+import json
+import logging
+import mmap
+import os
+import re
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Optional, List, Tuple, Dict, Iterable
+
+from packaging import version
+
+from grapejuice_common import paths
+from grapejuice_common.util.computed_field import ComputedField
+
+log = logging.getLogger(__name__)
+
+WINE_BINARIES = ("wine", "wine64", "wineserver", "winedbg")
+OPT_WINE_GLOB = "wine-*"
+PROBE_TIMEOUT = 10
+N_PROBE_WORKERS = 4
+
+WINE_VERSION_PTN = re.compile(r"wine-(\d+(?:\.\d+)*)")
+
+# Wineserver builds with esync or fsync patches read these variables to enable them
+ESYNC_MARKER = b"WINEESYNC"
+FSYNC_MARKER = b"WINEFSYNC"
+
+
+@dataclass(frozen=True)
+class WineBuild:
+    wine_home: Path
+    version_string: str
+    is_staging: bool
+    binaries: Tuple[str, ...]
+    supports_esync: bool
+    supports_fsync: bool
+
+    @property
+    def version(self) -> Optional[version.Version]:
+        match = WINE_VERSION_PTN.search(self.version_string)
+
+        return version.parse(match.group(1)) if match else None
+
+    @property
+    def display_name(self) -> str:
+        return f"{self.version_string} ({self.wine_home})"
+
+    def meets_version(self, required_version_string: str) -> bool:
+        """
+        :param required_version_string: A version in the format of `wine --version`, like wine-7.0
+        """
+        match = WINE_VERSION_PTN.search(required_version_string)
+        if match is None or self.version is None:
+            return False
+
+        return self.version >= version.parse(match.group(1))
+
+    @property
+    def as_dict(self) -> Dict:
+        return {**asdict(self), "wine_home": str(self.wine_home), "binaries": list(self.binaries)}
+
+    @classmethod
+    def from_dict(cls, d: Dict) -> "WineBuild":
+        return cls(**{**d, "wine_home": Path(d["wine_home"]), "binaries": tuple(d["binaries"])})
+
+
+def _wine_binary(wine_home: Path) -> Optional[Path]:
+    for name in ("wine", "wine64"):
+        binary = wine_home / "bin" / name
+
+        if binary.is_file():
+            return binary
+
+    return None
+
+
+def _binary_contains(path: Path, *markers: bytes) -> Tuple[bool, ...]:
+    try:
+        with path.open("rb") as fp, mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return tuple(mm.find(marker) >= 0 for marker in markers)
+
+    except (OSError, ValueError):
+        return tuple(False for _ in markers)
+
+
+def probe_wine_build(wine_home: Path) -> Optional[WineBuild]:
+    """
+    Runs `wine --version` and inspects the binaries of a wine home. This is what the catalog caches.
+    """
+    wine_binary = _wine_binary(wine_home)
+    if wine_binary is None:
+        return None
+
+    try:
+        version_string = subprocess.check_output(
+            [str(wine_binary), "--version"],
+            stderr=subprocess.DEVNULL,
+            timeout=PROBE_TIMEOUT
+        ).decode("UTF-8", errors="replace").strip()
+
+    except (OSError, subprocess.SubprocessError) as e:
+        log.warning(f"Could not determine the version of the wine build at {wine_home}: {e}")
+        return None
+
+    binaries = tuple(name for name in WINE_BINARIES if (wine_home / "bin" / name).is_file())
+    supports_esync, supports_fsync = _binary_contains(wine_home / "bin" / "wineserver", ESYNC_MARKER, FSYNC_MARKER)
+
+    return WineBuild(
+        wine_home=wine_home,
+        version_string=version_string,
+        is_staging="staging" in version_string.lower(),
+        binaries=binaries,
+        supports_esync=supports_esync,
+        supports_fsync=supports_fsync
+    )
+
+
+def _homes_in_directory(directory: Path) -> List[Path]:
+    if _wine_binary(directory) is not None:
+        return [directory]
+
+    try:
+        return sorted(filter(lambda p: _wine_binary(p) is not None, directory.iterdir()))
+
+    except OSError:
+        return []
+
+
+def configured_wine_homes() -> List[str]:
+    from grapejuice_common.features.settings import current_settings, k_default_wine_home
+
+    return [
+        current_settings.get(k_default_wine_home, default_value=""),
+        *(prefix.wine_home for prefix in current_settings.parsed_wineprefixes_sorted)
+    ]
+
+
+def user_wine_build_directories() -> List[str]:
+    from grapejuice_common.features.settings import current_settings, k_wine_build_directories
+
+    return list(current_settings.get(k_wine_build_directories, default_value=[]))
+
+
+def discover_wine_homes(
+    configured_homes: Optional[Iterable[str]] = None,
+    build_directories: Optional[Iterable[str]] = None,
+    opt_directory: Path = Path("/opt")
+) -> List[Path]:
+    """
+    Every directory that looks like a wine home: builds in $PATH, /opt/wine-*, the configured wine homes and the builds
+    in directories added by the user
+    """
+    configured_homes = configured_wine_homes() if configured_homes is None else configured_homes
+    build_directories = user_wine_build_directories() if build_directories is None else build_directories
+
+    candidates: List[Path] = []
+
+    for bin_directory_string in filter(None, os.environ.get("PATH", "").split(os.path.pathsep)):
+        wine_home = Path(bin_directory_string).parent
+
+        if (Path(bin_directory_string) / "wine").is_file():
+            candidates.append(wine_home)
+
+    if opt_directory.is_dir():
+        candidates.extend(sorted(opt_directory.glob(OPT_WINE_GLOB)))
+
+    candidates.extend(Path(home).expanduser() for home in map(str.strip, configured_homes) if home)
+
+    for directory in map(str.strip, build_directories):
+        if directory:
+            candidates.extend(_homes_in_directory(Path(directory).expanduser()))
+
+    homes = []
+    seen = set()
+
+    for candidate in candidates:
+        try:
+            resolved = candidate.resolve()
+
+        except OSError:
+            continue
+
+        if resolved not in seen and _wine_binary(resolved) is not None:
+            seen.add(resolved)
+            homes.append(resolved)
+
+    return homes
+
+
+class WineBuildCatalog:
+    """
+    Probed wine builds, cached on disk by the modification time and size of their wine binary
+    """
+    _location: Path
+    _entries: Optional[Dict[str, Dict]] = None
+    _lock: threading.Lock
+
+    def __init__(self, location: Optional[Path] = None):
+        self._location = location or paths.wine_build_cache_location()
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, Dict]:
+        if self._entries is None:
+            self._entries = dict()
+
+            try:
+                with self._location.open("r") as fp:
+                    self._entries = json.load(fp)
+
+            except FileNotFoundError:
+                pass
+
+            except (OSError, ValueError) as e:
+                log.warning(f"Ignoring unreadable wine build cache at '{self._location}': {e}")
+
+        return self._entries
+
+    def _save(self):
+        try:
+            self._location.parent.mkdir(parents=True, exist_ok=True)
+
+            with self._location.open("w+") as fp:
+                json.dump(self._entries, fp, indent=2)
+
+        except OSError as e:
+            log.warning(f"Could not save the wine build cache: {e}")
+
+    @staticmethod
+    def _stat_key(wine_home: Path) -> Optional[Dict[str, int]]:
+        wine_binary = _wine_binary(wine_home)
+        if wine_binary is None:
+            return None
+
+        stat = wine_binary.stat()
+
+        return {"mtime": stat.st_mtime_ns, "size": stat.st_size}
+
+    def _cached(self, wine_home: Path, stat_key: Dict[str, int]) -> Optional[WineBuild]:
+        entry = self._load().get(str(wine_home), None)
+
+        if entry is None or entry.get("stat", None) != stat_key:
+            return None
+
+        try:
+            return WineBuild.from_dict(entry["build"])
+
+        except (KeyError, TypeError):
+            return None
+
+    def builds(self, wine_homes: Optional[Iterable[Path]] = None) -> List[WineBuild]:
+        """
+        :param wine_homes: The wine homes to look at, every discoverable wine home when omitted
+        """
+        wine_homes = discover_wine_homes() if wine_homes is None else list(wine_homes)
+        builds: Dict[Path, Optional[WineBuild]] = dict()
+        to_probe: Dict[Path, Dict[str, int]] = dict()
+
+        with self._lock:
+            for wine_home in wine_homes:
+                stat_key = self._stat_key(wine_home)
+                if stat_key is None:
+                    continue
+
+                builds[wine_home] = self._cached(wine_home, stat_key)
+                if builds[wine_home] is None:
+                    to_probe[wine_home] = stat_key
+
+        if to_probe:
+            with ThreadPoolExecutor(max_workers=N_PROBE_WORKERS) as executor:
+                probed = dict(zip(to_probe.keys(), executor.map(probe_wine_build, to_probe.keys())))
+
+            with self._lock:
+                entries = self._load()
+
+                for wine_home, build in probed.items():
+                    builds[wine_home] = build
+
+                    if build is not None:
+                        entries[str(wine_home)] = {"stat": to_probe[wine_home], "build": build.as_dict}
+
+                self._save()
+
+        return [build for build in builds.values() if build is not None]
+
+    def build(self, wine_home: Path) -> Optional[WineBuild]:
+        return next(iter(self.builds([wine_home])), None)
+
+
+wine_build_catalog: ComputedField[WineBuildCatalog] = ComputedField(WineBuildCatalog)
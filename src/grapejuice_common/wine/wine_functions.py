@@ -2,15 +2,17 @@ import logging
 import uuid
 from dataclasses import dataclass
 from pathlib import Path
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, TYPE_CHECKING
 
 from grapejuice_common.errors import WineprefixNotFoundUsingHints, HardwareProfilingError
-from grapejuice_common.hardware_info.hardware_profile import HardwareProfile
 from grapejuice_common.models.wineprefix_configuration_model import WineprefixConfigurationModel
 from grapejuice_common.roblox_renderer import RobloxRenderer
 from grapejuice_common.wine.wineprefix import Wineprefix
 from grapejuice_common.wine.wineprefix_hints import WineprefixHint
 
+if TYPE_CHECKING:
+    from grapejuice_common.hardware_info.hardware_profile import HardwareProfile
+
 LOG = logging.getLogger(__name__)
 
 
@@ -36,6 +38,18 @@ def get_wineprefix(hints: List[WineprefixHint], when_not_found_prefix_factory: O
         raise WineprefixNotFoundUsingHints(hints)
 
 
+def get_wineprefixes(hint: Optional[str] = None) -> List[Wineprefix]:
+    """
+    :param hint: Only get the wineprefix with this hint, every configured wineprefix is returned when omitted
+    """
+    from grapejuice_common.features.settings import current_settings
+
+    if hint:
+        return [get_wineprefix([WineprefixHint(hint)])]
+
+    return [Wineprefix(configuration) for configuration in current_settings.parsed_wineprefixes_sorted]
+
+
 def _create_and_save_wineprefix(model_factory):
     def factory():
         from grapejuice_common.features.settings import current_settings
@@ -84,7 +98,7 @@ def _wine_home(settings) -> str:
     return ""
 
 
-def _hardware_profile() -> Optional[HardwareProfile]:
+def _hardware_profile() -> Optional["HardwareProfile"]:
     from grapejuice_common.features.settings import current_settings
 
     try:
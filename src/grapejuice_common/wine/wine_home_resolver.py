@@ -0,0 +1,175 @@
+import logging
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, List, Tuple, Hashable
+
+from grapejuice_common.errors import CouldNotFindSystemWineHome, NoValidWineHomes
+from grapejuice_common.util.cache_utils import MemoCache
+
+log = logging.getLogger(__name__)
+
+# Failures are only detected by stat-ing the candidates again, so they are retried after a while regardless
+RESOLUTION_TTL = 60
+
+StatSignature = Tuple[Optional[int], ...]
+
+
+def _mtime(path: Path) -> Optional[int]:
+    try:
+        return path.stat().st_mtime_ns
+
+    except OSError:
+        return None
+
+
+def _string_to_path(home_string: str) -> Path:
+    if home_string.startswith(f"~{os.path.sep}"):
+        return Path(home_string).expanduser()
+
+    return Path(home_string)
+
+
+@dataclass(frozen=True)
+class WineHomeResolution:
+    wine_home: Optional[Path]
+    available_homes: Tuple[str, ...]
+    invalid_reasons: Tuple[Tuple[Path, str], ...]
+    candidates: Tuple[Path, ...]
+    signature: StatSignature
+
+    @property
+    def error(self) -> Optional[NoValidWineHomes]:
+        if self.wine_home is not None:
+            return None
+
+        return NoValidWineHomes(list(self.available_homes), list(self.invalid_reasons))
+
+    @property
+    def signature_paths(self) -> Tuple[Path, ...]:
+        if self.wine_home is not None:
+            return (self.wine_home / "bin",)
+
+        return self.candidates
+
+    @property
+    def is_current(self) -> bool:
+        """
+        A resolved home stays valid until its bin directory changes, a failure until any of the candidates change
+        """
+        return tuple(map(_mtime, self.signature_paths)) == self.signature
+
+
+def _available_homes(configuration_home: str, default_home: str) -> List[str]:
+    from grapejuice_common import variables
+
+    available_homes = [configuration_home, default_home]
+
+    try:
+        available_homes.append(str(variables.system_wine_home()))
+
+    except CouldNotFindSystemWineHome as e:
+        log.warning(str(e))
+
+    total_number_of_available_homes = len(available_homes)
+    available_homes = list(filter(None, map(str.strip, available_homes)))
+
+    filtered_available_homes = total_number_of_available_homes - len(available_homes)
+    if filtered_available_homes > 0:
+        log.info("Some wine homes were filtered out because they were empty strings")
+
+    return available_homes
+
+
+def _invalid_reason(home_path: Path) -> Optional[str]:
+    if not home_path.is_absolute():
+        return f"Home path '{home_path}' is not an absolute path starting at /"
+
+    if not home_path.exists():
+        return f"Home path '{home_path}' does not exist"
+
+    if not home_path.is_dir():
+        return f"Home path '{home_path}' is not a directory"
+
+    wine_bin = home_path / "bin"
+
+    if not wine_bin.exists():
+        return f"Wine bin path in wine home '{home_path}' does not exist"
+
+    if not wine_bin.is_dir():
+        return f"Wine bin path in wine home '{home_path}' is not a directory"
+
+    return None
+
+
+def resolve_wine_home(configuration_home: str, default_home: str) -> WineHomeResolution:
+    available_homes = _available_homes(configuration_home, default_home)
+    candidates = tuple(map(_string_to_path, available_homes))
+    invalid_reasons: List[Tuple[Path, str]] = []
+
+    for home_path in candidates:
+        reason = _invalid_reason(home_path)
+
+        if reason is None:
+            log.info(f"Using Wine Home {home_path}")
+
+            return WineHomeResolution(
+                home_path,
+                tuple(available_homes),
+                tuple(invalid_reasons),
+                candidates,
+                (_mtime(home_path / "bin"),)
+            )
+
+        invalid_reasons.append((home_path, reason))
+
+    return WineHomeResolution(
+        None,
+        tuple(available_homes),
+        tuple(invalid_reasons),
+        candidates,
+        tuple(map(_mtime, candidates))
+    )
+
+
+class WineHomeResolver:
+    """
+    Remembers which wine home the inputs of a prefix configuration resolve to
+    """
+    _resolutions: MemoCache
+
+    def __init__(self):
+        self._resolutions = MemoCache("wine_home_resolutions", max_size=32, ttl=RESOLUTION_TTL)
+
+    @staticmethod
+    def _key(configuration_home: str, default_home: str) -> Hashable:
+        # The system wine home is looked up in $PATH
+        return configuration_home.strip(), default_home.strip(), os.environ.get("PATH", "")
+
+    def resolution(self, configuration_home: str, default_home: str) -> WineHomeResolution:
+        key = self._key(configuration_home, default_home)
+        resolution: Optional[WineHomeResolution] = self._resolutions.get(key)
+
+        if resolution is not None and not resolution.is_current:
+            log.info("Wine home candidates changed on disk, resolving the wine home again")
+            self._resolutions.invalidate(key)
+
+        return self._resolutions.get_or_compute(key, lambda: resolve_wine_home(configuration_home, default_home))
+
+    def wine_home(self, configuration_home: str, default_home: str) -> Path:
+        """
+        :raises NoValidWineHomes: When none of the candidates are usable, with the reason for every candidate
+        """
+        resolution = self.resolution(configuration_home, default_home)
+        error = resolution.error
+
+        if error is not None:
+            raise error
+
+        return resolution.wine_home
+
+    def invalidate(self):
+        self._resolutions.clear()
+
+
+wine_home_resolver = WineHomeResolver()
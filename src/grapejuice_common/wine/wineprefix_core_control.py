@@ -3,24 +3,35 @@ import json
 import logging
 import os
 import re
-import shutil
 import signal
 import subprocess
 import sys
+import threading
 import time
 from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
 from string import Template
-from typing import Union, List, Dict, Optional, Tuple
+from types import MappingProxyType
+from typing import Union, List, Dict, Optional, Mapping, Hashable, TYPE_CHECKING
 
 from grapejuice_common import paths
-from grapejuice_common.errors import HardwareProfilingError, CouldNotFindSystemWineHome, NoValidWineHomes
+from grapejuice_common.errors import HardwareProfilingError, RegistryFormatError
 from grapejuice_common.hardware_info.graphics_card import GPUVendor
+from grapejuice_common.logs.log_capture import LogCapture, CaptureOptions, MIB, detach_all_captures
 from grapejuice_common.logs.log_util import log_function
 from grapejuice_common.models.wineprefix_configuration_model import WineprefixConfigurationModel
+from grapejuice_common.util.cache_utils import MemoCache
+from grapejuice_common.util.process_supervisor import process_supervisor
 from grapejuice_common.util.string_util import non_empty_string
+from grapejuice_common.wine.registry_editor import apply_regedit_offline
+from grapejuice_common.wine.process_table import WineProcess, prefix_processes
+from grapejuice_common.wine.wine_home_resolver import wine_home_resolver
 from grapejuice_common.wine.wineprefix_paths import WineprefixPaths
+from grapejuice_common.wine.wineserver_manager import ManagedWineserver
+
+if TYPE_CHECKING:
+    from grapejuice_common.wine.wine_build_catalog import WineBuild
 
 log = logging.getLogger(__name__)
 
@@ -51,62 +62,71 @@ class ProcessWrapper:
 
 open_fds = []
 
-processes: List[ProcessWrapper] = []
-is_polling = False
 
+def _supervise(wrapper: ProcessWrapper):
+    def on_exit(_proc: subprocess.Popen):
+        if callable(wrapper.on_exit):
+            wrapper.on_exit()
 
-@log_function
-def _poll_processes() -> bool:
-    """
-    Makes sure zombie launchers are taken care of
-    :return: Whether or not processes remain
-    """
-    global is_polling
-    exited = []
+    process_supervisor.supervise(wrapper.proc, on_exit=on_exit)
 
-    for proc in processes:
-        if proc.exited:
-            exited.append(proc)
 
-            if proc.proc.returncode != 0:
-                log.error(f"Process returned with non-zero exit code {proc.proc.returncode}")
+def close_fds(*_, **__):
+    log.info("Closing fds")
 
-    for proc in exited:
-        processes.remove(proc)
+    for fd in open_fds:
+        fd.close()
 
-        if callable(proc.on_exit):
-            proc.on_exit()
+    open_fds.clear()
+    detach_all_captures()
 
-        del proc
+    from grapejuice_common.logs.log_vacuum import remove_empty_logs
+    remove_empty_logs()
 
-    processes_left = len(processes) > 0
-    if not processes_left:
-        is_polling = False
-        log.info("No processes left to poll, exiting thread")
 
-    return processes_left
+def _run_captured(
+    command: List[str],
+    path_stem: Path,
+    capture_options: CaptureOptions,
+    run_async: bool,
+    working_directory: Optional[Path],
+    post_run_function: callable,
+    env: Optional[Dict[str, str]]
+) -> Union[ProcessWrapper, None]:
+    log.info("Capturing process output through pipes")
 
+    proc = subprocess.Popen(
+        command,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        cwd=working_directory,
+        env=env
+    )
 
-def poll_processes():
-    if is_polling:
-        return
+    capture = LogCapture(path_stem, capture_options)
+    capture.attach(proc)
 
-    log.info("Starting polling thread")
+    if run_async:
+        def on_exit():
+            # Finishing waits for the pipes, which should not hold up the other exit notifications
+            threading.Thread(target=capture.finish, name="log-capture-finish", daemon=True).start()
 
-    from gi.repository import GObject
-    GObject.timeout_add(100, _poll_processes)
+            if callable(post_run_function):
+                post_run_function()
 
+        wrapper = ProcessWrapper(proc, on_exit=on_exit)
+        _supervise(wrapper)
 
-def close_fds(*_, **__):
-    log.info("Closing fds")
+        return wrapper
 
-    for fd in open_fds:
-        fd.close()
+    proc.wait()
+    capture.finish()
 
-    open_fds.clear()
+    if callable(post_run_function):
+        post_run_function()
 
-    from grapejuice_common.logs.log_vacuum import remove_empty_logs
-    remove_empty_logs()
+    return None
 
 
 @log_function
@@ -115,16 +135,30 @@ def run_exe_no_daemon(
     exe_name: str,
     run_async: bool,
     working_directory: Optional[Path] = None,
-    post_run_function: callable = None
+    post_run_function: callable = None,
+    env: Optional[Dict[str, str]] = None,
+    capture_options: Optional[CaptureOptions] = None
 ) -> Union[ProcessWrapper, None]:
     log.info("Running in no_daemon_mode")
 
     log_dir = paths.logging_directory()
     os.makedirs(log_dir, exist_ok=True)
 
+    ts = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+
+    if capture_options is not None:
+        return _run_captured(
+            command,
+            log_dir / f"{ts}_{exe_name}",
+            capture_options,
+            run_async,
+            working_directory,
+            post_run_function,
+            env
+        )
+
     log.info("Opening log fds")
 
-    ts = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
     stdout_path = log_dir / f"{ts}_{exe_name}_stdout.log"
     stderr_path = log_dir / f"{ts}_{exe_name}_stderr.log"
 
@@ -141,13 +175,13 @@ def run_exe_no_daemon(
                 command,
                 stdout=stdout_fd,
                 stderr=stderr_fd,
-                cwd=working_directory
+                cwd=working_directory,
+                env=env
             ),
             on_exit=post_run_function
         )
 
-        processes.append(wrapper)
-        poll_processes()
+        _supervise(wrapper)
 
         return wrapper
 
@@ -158,7 +192,8 @@ def run_exe_no_daemon(
             command,
             stdout=stdout_fd,
             stderr=stderr_fd,
-            cwd=working_directory
+            cwd=working_directory,
+            env=env
         )
 
         if callable(post_run_function):
@@ -171,15 +206,21 @@ def run_exe_no_daemon(
 def run_exe_in_daemon(
     command: List[str],
     post_run_function: callable = None,
-    working_directory: Optional[Path] = None
+    working_directory: Optional[Path] = None,
+    env: Optional[Dict[str, str]] = None
 ) -> ProcessWrapper:
     log.info("Running process for daemon mode")
 
-    p = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=sys.stdout, stderr=sys.stderr, cwd=working_directory)
+    p = subprocess.Popen(
+        command,
+        stdin=subprocess.DEVNULL,
+        stdout=sys.stdout,
+        stderr=sys.stderr,
+        cwd=working_directory,
+        env=env
+    )
     wrapper = ProcessWrapper(p, on_exit=post_run_function)
-
-    processes.append(wrapper)
-    poll_processes()
+    _supervise(wrapper)
 
     return wrapper
 
@@ -188,10 +229,16 @@ WINE_PROCESS_PTN = re.compile(r"^\s*([a-f0-9]+)\s+(\d+).*\'([\w.]+)\'")
 
 
 @dataclass(frozen=True)
-class WineProcess:
-    pid: str
-    threads: int
-    image: str
+class LaunchEnvironment:
+    """
+    The environment Wine processes of a prefix are started with. Processes receive it through env= so the
+    environment of Grapejuice itself is never modified, and prefixes can launch concurrently.
+    """
+    variables: Mapping[str, str]
+    applied: Mapping[str, str]
+
+    def as_dict(self) -> Dict[str, str]:
+        return dict(self.variables)
 
 
 DLL_OVERRIDE_SEP = ";"
@@ -215,98 +262,50 @@ def _legacy_hardware_variables(configuration: WineprefixConfigurationModel):
 class WineprefixCoreControl:
     _prefix_paths: WineprefixPaths
     _configuration: WineprefixConfigurationModel
+    _launch_environments: MemoCache
+    _wineserver: ManagedWineserver
 
     def __init__(self, prefix_paths: WineprefixPaths, configuration: WineprefixConfigurationModel):
         self._prefix_paths = prefix_paths
         self._configuration = configuration
+        self._launch_environments = MemoCache(f"launch_environment:{prefix_paths.base_directory}", max_size=4)
+        self._wineserver = ManagedWineserver(self)
 
     @property
-    def wine_home(self) -> Path:
-        from grapejuice_common import variables
-        from grapejuice_common.features.settings import current_settings, k_default_wine_home
+    def prefix_paths(self) -> WineprefixPaths:
+        return self._prefix_paths
 
-        available_homes = [
-            self._configuration.wine_home.strip(),
-            current_settings.get(k_default_wine_home, default_value="").strip()
-        ]
-
-        try:
-            available_homes.append(str(variables.system_wine_home()))
-
-        except CouldNotFindSystemWineHome as e:
-            log.warning(str(e))
+    @property
+    def wineserver(self) -> ManagedWineserver:
+        return self._wineserver
 
-        total_number_of_available_homes = len(available_homes)
+    @property
+    def wine_home(self) -> Path:
+        from grapejuice_common.features.settings import current_settings, k_default_wine_home
 
-        available_homes = list(
-            filter(
-                None,
-                map(
-                    str.strip,
-                    available_homes
-                )
-            )
+        return wine_home_resolver.wine_home(
+            self._configuration.wine_home,
+            current_settings.get(k_default_wine_home, default_value="")
         )
 
-        filtered_available_homes = total_number_of_available_homes - len(available_homes)
-        if filtered_available_homes > 0:
-            log.info("Some wine homes were filtered out because they were empty strings")
-
-        def string_to_path(home_string: str) -> Optional[Path]:
-            if home_string.startswith(f"~{os.path.sep}"):
-                home_path = Path(home_string).expanduser()
-
-            else:
-                home_path = Path(home_string)
-
-            return home_path
-
-        invalid_reasons: List[Tuple[Path, str]] = []
-
-        def with_reason(home_path: Path, reason: str) -> bool:
-            invalid_reasons.append((home_path, reason))
-            return False
-
-        def is_valid_home_path(home_path: Path):
-            if not home_path.is_absolute():
-                return with_reason(home_path, f"Home path '{home_path}' is not an absolute path starting at /")
-
-            if not home_path.exists():
-                return with_reason(home_path, f"Home path '{home_path}' does not exist")
-
-            if not home_path.is_dir():
-                return with_reason(home_path, f"Home path '{home_path}' is not a directory")
-
-            wine_bin = home_path / "bin"
-
-            if not wine_bin.exists():
-                return with_reason(home_path, f"Wine bin path in wine home '{home_path}' does not exist")
-
-            if not wine_bin.is_dir():
-                return with_reason(home_path, f"Wine bin path in wine home '{home_path}' is not a directory")
+    @property
+    def wine_build(self) -> Optional["WineBuild"]:
+        from grapejuice_common.wine.wine_build_catalog import wine_build_catalog
 
-            return True
+        return wine_build_catalog.value.build(self.wine_home)
 
-        usable_homes = list(
-            filter(
-                is_valid_home_path,
-                filter(
-                    None,
-                    map(
-                        string_to_path,
-                        available_homes
-                    )
-                )
-            )
-        )
+    def _check_wine_version(self):
+        from grapejuice_common import variables
+        from grapejuice_common.features.settings import current_settings, k_ignore_wine_version
 
-        if len(usable_homes) <= 0:
-            raise NoValidWineHomes(available_homes, invalid_reasons)
+        if current_settings.get(k_ignore_wine_version, default_value=False):
+            return
 
-        wine_home = usable_homes[0]
-        log.info(f"Using Wine Home {wine_home}")
+        build = self.wine_build
+        required_version = variables.required_wine_version()
 
-        return wine_home
+        if build is not None and not build.meets_version(required_version):
+            log.warning(f"{build.version_string} at {build.wine_home} is older than the required {required_version}")
 
     @property
     def wine_bin(self):
@@ -337,18 +336,19 @@ class WineprefixCoreControl:
     def _dri_prime_variables(self) -> Dict[str, str]:
         from grapejuice_common.features.settings import current_settings
 
-        try:
-            profile = current_settings.hardware_profile
+        prime_env = dict()
 
-        except HardwareProfilingError as e:
-            log.error("Could not get hardware profile")
-            log.error(e)
+        # Only touch the hardware profile when PRIME is actually configured, validating it is expensive
+        if self._configuration.prime_offload_sink >= 0:
+            try:
+                profile = current_settings.hardware_profile
 
-            return dict()
+            except HardwareProfilingError as e:
+                log.error("Could not get hardware profile")
+                log.error(e)
 
-        prime_env = dict()
+                return dict()
 
-        if self._configuration.prime_offload_sink >= 0:
             sink = str(self._configuration.prime_offload_sink)
 
             prime_env = {"DRI_PRIME": sink}
@@ -365,7 +365,31 @@ class WineprefixCoreControl:
 
         return prime_env
 
-    def prepare_for_launch(self, accelerate_graphics: bool = False):
+    def _launch_environment_key(self, accelerate_graphics: bool) -> Hashable:
+        """
+        Everything the launch environment is derived from. The configuration model is edited in place by the GUI, so
+        a changed configuration results in a different key, and a new environment. The same inputs resolve to another
+        wine home when the one in use disappears, so the resolved home is part of the key as well.
+        """
+        from grapejuice_common.features.settings import current_settings, k_default_wine_home
+
+        configuration = self._configuration
+
+        return (
+            accelerate_graphics,
+            str(self.wine_home),
+            configuration.wine_home,
+            current_settings.get(k_default_wine_home, default_value=""),
+            configuration.dll_overrides,
+            configuration.prime_offload_sink,
+            configuration.use_mesa_gl_override,
+            configuration.enable_winedebug,
+            configuration.winedebug_string,
+            tuple(sorted(configuration.env.items())),
+            frozenset(os.environ.items())
+        )
+
+    def _build_launch_environment(self, accelerate_graphics: bool) -> LaunchEnvironment:
         user_env = self._configuration.env
         dll_overrides = list(filter(non_empty_string, self._configuration.dll_overrides.split(DLL_OVERRIDE_SEP)))
         dll_overrides.extend(default_dll_overrides())
@@ -406,30 +430,59 @@ class WineprefixCoreControl:
             path_components.insert(0, wine_bin_string)
             apply_env["PATH"] = os.path.pathsep.join(path_components)
 
-        log.info("Applying environment: " + json.dumps(apply_env))
+        log.info(f"Launch environment for {self._prefix_paths.base_directory}: " + json.dumps(apply_env))
+        self._check_wine_version()
 
-        # Apply env
-        for k, v in apply_env.items():
-            os.environ[k] = v
+        return LaunchEnvironment(
+            variables=MappingProxyType({**os.environ, **apply_env}),
+            applied=MappingProxyType(apply_env)
+        )
 
+    def launch_environment(self, accelerate_graphics: bool = False) -> LaunchEnvironment:
+        return self._launch_environments.get_or_compute(
+            self._launch_environment_key(accelerate_graphics),
+            lambda: self._build_launch_environment(accelerate_graphics)
+        )
+
+    def invalidate_launch_environment(self):
+        self._launch_environments.clear()
+
+    def prepare_for_launch(self, accelerate_graphics: bool = False) -> LaunchEnvironment:
         if not os.path.exists(self._prefix_paths.base_directory):
             self._prefix_paths.base_directory.mkdir(parents=True)
 
-    def load_registry_file(
-        self,
-        registry_file: Path,
-        prepare_wine: bool = True
-    ):
-        log.info(f"Loading registry file {registry_file} into the wineprefix")
+        return self.launch_environment(accelerate_graphics=accelerate_graphics)
 
-        if prepare_wine:
-            self.prepare_for_launch()
+    def _apply_registry_offline(self, registry_bytes: bytes) -> bool:
+        """
+        Writes the registry files of the prefix directly, which takes milliseconds instead of two Wine startups.
+        Wine keeps the registry in memory while a wineserver runs, edits then go through regedit.
+        """
+        with self._wineserver.lock():
+            if self._wineserver.is_running:
+                log.info("A wineserver is running for the prefix, using regedit")
+                return False
+
+            try:
+                applied = apply_regedit_offline(self._prefix_paths, registry_bytes.decode("UTF-8"))
 
+            except (RegistryFormatError, OSError, ValueError) as e:
+                log.warning(f"Could not edit the registry files directly, using regedit: {e}")
+                return False
+
+            if applied and self._wineserver.is_running:
+                # Started outside of Grapejuice, it may have loaded the registry before the files were replaced
+                log.warning("A wineserver started while editing the registry files, using regedit as well")
+                return False
+
+            return applied
+
+    def _run_regedit(self, registry_bytes: bytes):
         target_filename = str(int(time.time())) + ".reg"
         target_path = self._prefix_paths.temp_directory / target_filename
         target_path.parent.mkdir(parents=True, exist_ok=True)
 
-        shutil.copyfile(registry_file, target_path)
+        target_path.write_bytes(registry_bytes)
 
         winreg = f"C:\\windows\\temp\\{target_filename}"
         self.run_exe("regedit", "/S", winreg, run_async=False, use_wine64=False)
@@ -437,27 +490,36 @@ class WineprefixCoreControl:
 
         os.remove(target_path)
 
-    def load_patched_registry_files(
+    def load_registry_file(
         self,
         registry_file: Path,
-        patches: dict = None
+        prepare_wine: bool = True
     ):
-        self.prepare_for_launch()
+        log.info(f"Loading registry file {registry_file} into the wineprefix")
 
-        target_filename = str(int(time.time())) + ".reg"
-        target_path = self._prefix_paths.temp_directory / target_filename
+        registry_bytes = registry_file.read_bytes()
+        if self._apply_registry_offline(registry_bytes):
+            return
+
+        if prepare_wine:
+            self.prepare_for_launch()
+
+        self._run_regedit(registry_bytes)
 
+    def load_patched_registry_files(
+        self,
+        registry_file: Path,
+        patches: dict = None
+    ):
         with registry_file.open("r") as fp:
             template = Template(fp.read())
 
-        with target_path.open("w+") as fp:
-            fp.write(template.safe_substitute(patches))
+        registry_bytes = template.safe_substitute(patches).encode("UTF-8")
+        if self._apply_registry_offline(registry_bytes):
+            return
 
-        winreg = f"C:\\windows\\temp\\{target_filename}"
-        self.run_exe("regedit", "/S", winreg, run_async=False, use_wine64=False)
-        self.run_exe("regedit", "/S", winreg, run_async=False, use_wine64=True)
-
-        os.remove(target_path)
+        self.prepare_for_launch()
+        self._run_regedit(registry_bytes)
 
     def disable_mime_associations(self):
         self.load_registry_file(paths.assets_directory() / "disable_mime_assoc.reg")
@@ -492,7 +554,8 @@ class WineprefixCoreControl:
         from grapejuice_common.features.settings import current_settings
         from grapejuice_common.features import settings
 
-        self.prepare_for_launch(accelerate_graphics=accelerate_graphics)
+        launch_environment = self.prepare_for_launch(accelerate_graphics=accelerate_graphics)
+        self._wineserver.ensure_running()
         log.info("Prepared environment for wine")
 
         if isinstance(exe_path, Path):
@@ -520,14 +583,17 @@ class WineprefixCoreControl:
                 exe_name,
                 run_async,
                 post_run_function=post_run_function,
-                working_directory=working_directory
+                working_directory=working_directory,
+                env=launch_environment.as_dict(),
+                capture_options=self.capture_options
             )
 
         else:
             return run_exe_in_daemon(
                 command,
                 post_run_function=post_run_function,
-                working_directory=working_directory
+                working_directory=working_directory,
+                env=launch_environment.as_dict()
             )
 
     def run_linux_command(
@@ -536,7 +602,8 @@ class WineprefixCoreControl:
         arguments: Optional[List[str]] = None,
         working_directory: Optional[Path] = None
     ):
-        self.prepare_for_launch()
+        launch_environment = self.prepare_for_launch()
+        self._wineserver.ensure_running()
 
         command_name = Path(command).name
         command = [command]
@@ -548,20 +615,46 @@ class WineprefixCoreControl:
             command,
             command_name,
             run_async=False,
-            working_directory=working_directory
+            working_directory=working_directory,
+            env=launch_environment.as_dict(),
+            capture_options=self.capture_options
         )
 
-    def kill_wine_server(self):
-        self.prepare_for_launch()
+    @property
+    def capture_options(self) -> Optional[CaptureOptions]:
+        """
+        How the output of Wine is captured for this prefix, None when it is written to log files as-is
+        """
+        if not self._configuration.capture_logs:
+            return None
+
+        return CaptureOptions(
+            budget_bytes=max(1, self._configuration.log_budget_mib) * MIB,
+            channel_filter=self._configuration.log_filter_string.strip()
+        )
 
-        subprocess.check_call([str(self.wine_server()), "-k"])
+    def kill_wine_server(self):
+        self._wineserver.kill()
 
     @property
     def process_list(self) -> List[WineProcess]:
-        self.prepare_for_launch()
+        """
+        Processes running in the prefix, found in /proc without starting any Wine process
+        """
+        return prefix_processes(self._prefix_paths.base_directory)
+
+    @property
+    def winedbg_process_list(self) -> List[WineProcess]:
+        """
+        Processes running in the prefix as seen by Wine, with their Windows process ids. Slower, winedbg has to start.
+        """
+        launch_environment = self.prepare_for_launch()
 
         try:
-            output = subprocess.check_output([str(self.wine_dbg()), "--command", "info proc"])
+            output = subprocess.check_output(
+                [str(self.wine_dbg()), "--command", "info proc"],
+                env=launch_environment.as_dict()
+            )
             output = output.decode("UTF-8")
 
         except subprocess.CalledProcessError as e:
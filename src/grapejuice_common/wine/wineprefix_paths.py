@@ -58,6 +58,30 @@ class WineprefixPaths:
 
         return possible_locations[0]
 
+    @property
+    def roblox_versions_directories(self) -> List[Path]:
+        """
+        Every directory Roblox may install its versions in, whether it exists or not
+        """
+        return [
+            *(location / "Versions" for location in self.possible_roblox_appdata),
+            self.roblox_program_files / "Versions"
+        ]
+
+    @property
+    def roblox_logs_directory(self) -> Path:
+        return self.roblox_appdata / "logs"
+
+    @property
+    def roblox_temp_directories(self) -> List[Path]:
+        """
+        The directories Roblox and its crash handler leave logs and crash dumps in, like windows/temp/Roblox
+        """
+        if not self.temp_directory.is_dir():
+            return []
+
+        return [p for p in self.temp_directory.iterdir() if p.name.lower().startswith("roblox") and p.is_dir()]
+
     @property
     def installer_download_location(self):
         # Do not call it RobloxPlayerLauncherBeta because it will try to import itself
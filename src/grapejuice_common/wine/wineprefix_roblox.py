@@ -12,7 +12,7 @@ from grapejuice_common.models.wineprefix_configuration_model import WineprefixCo
 from grapejuice_common.roblox_product import RobloxProduct
 from grapejuice_common.roblox_renderer import RobloxRenderer
 from grapejuice_common.util import download_file, roblox_version
-from grapejuice_common.wine.registry_file import RegistryFile
+from grapejuice_common.wine.registry_index import find_registry_key
 from grapejuice_common.wine.wineprefix_core_control import WineprefixCoreControl, ProcessWrapper
 from grapejuice_common.wine.wineprefix_paths import WineprefixPaths
 
@@ -62,11 +62,12 @@ class WineprefixRoblox:
         )
 
     def is_logged_into_studio(self) -> bool:
-        with RegistryFile(self._prefix_paths.user_reg) as registry_file:
-            registry_file.load()
+        roblox_com = find_registry_key(
+            self._prefix_paths.user_reg,
+            r"Software\\Roblox\\RobloxStudioBrowser\\roblox.com"
+        )
 
-            roblox_com = registry_file.find_key(r"Software\\Roblox\\RobloxStudioBrowser\\roblox.com")
-            return (roblox_com is not None) and (roblox_com.get_attribute(".ROBLOSECURITY") is not None)
+        return (roblox_com is not None) and (roblox_com.get_attribute(".ROBLOSECURITY") is not None)
 
     def locate_all_roblox_executables_in_versions(self, executable_name: str) -> Generator[Path, None, None]:
         search_locations = [
@@ -133,10 +134,7 @@ class WineprefixRoblox:
 
     @property
     def versions_directory(self) -> Path:
-        candidates = [
-            *list(map(lambda p: p / "Versions", self._prefix_paths.possible_roblox_appdata)),
-            self._prefix_paths.roblox_program_files / "Versions"
-        ]
+        candidates = self._prefix_paths.roblox_versions_directories
 
         pick = next(filter(lambda p: p.exists(), candidates), None)
         if not pick:
@@ -301,4 +299,4 @@ class WineprefixRoblox:
         if studio_process:
             studio_process.kill()
             time.sleep(1)  # Give Roblox a chance
-            self._core_control.kill_wine_server()
+            self._core_control.wineserver.end_session()
@@ -0,0 +1,211 @@
+import fcntl
+import logging
+import os
+import subprocess
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional, Dict, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from grapejuice_common.wine.wineprefix_core_control import WineprefixCoreControl
+
+log = logging.getLogger(__name__)
+
+# Seconds an idle wineserver stays alive for, so consecutive operations on a prefix share it
+DEFAULT_IDLE_TIMEOUT = 300
+START_TIMEOUT = 30
+LOCK_FILE_NAME = ".grapejuice-wineserver.lock"
+
+_prefix_locks: Dict[Path, threading.Lock] = dict()
+_prefix_locks_lock = threading.Lock()
+
+
+@contextmanager
+def _prefix_lock(base_directory: Path):
+    """
+    Serializes starting, stopping and offline registry edits of a prefix, between threads and between Grapejuice
+    processes, like the GUI and the daemon. The file lock is held on a file in the prefix, so a prefix that does not
+    exist yet only takes the thread lock.
+    """
+    with _prefix_locks_lock:
+        thread_lock = _prefix_locks.setdefault(base_directory, threading.Lock())
+
+    with thread_lock:
+        if not base_directory.is_dir():
+            yield
+            return
+
+        with (base_directory / LOCK_FILE_NAME).open("a+") as fp:
+            fcntl.flock(fp, fcntl.LOCK_EX)
+
+            try:
+                yield
+
+            finally:
+                fcntl.flock(fp, fcntl.LOCK_UN)
+
+
+def wineserver_directory(base_directory: Path) -> Optional[Path]:
+    """
+    The directory the wineserver of a prefix creates its socket in, derived by Wine from the device and inode of the
+    prefix. The wineserver changes its working directory to it.
+    """
+    try:
+        stat = base_directory.stat()
+
+    except OSError:
+        return None
+
+    return Path("/tmp", f".wine-{os.getuid()}", f"server-{stat.st_dev:x}-{stat.st_ino:x}")
+
+
+def wineserver_pid(base_directory: Path, proc: Path = Path("/proc")) -> Optional[int]:
+    server_directory = wineserver_directory(base_directory)
+    if server_directory is None or not server_directory.is_dir():
+        return None
+
+    server_directory_string = str(server_directory)
+
+    for entry in os.scandir(proc):
+        if not entry.name.isdigit():
+            continue
+
+        try:
+            if os.readlink(os.path.join(entry.path, "cwd")) == server_directory_string:
+                return int(entry.name)
+
+        except OSError:
+            # Processes of other users, or processes that exited in the meantime
+            continue
+
+    return None
+
+
+def idle_timeout() -> int:
+    from grapejuice_common.features.settings import current_settings, k_wineserver_idle_timeout
+
+    return int(current_settings.get(k_wineserver_idle_timeout, default_value=DEFAULT_IDLE_TIMEOUT))
+
+
+class ManagedWineserver:
+    """
+    Keeps the wineserver of a prefix running between operations. Wine starts a wineserver that exits three seconds
+    after its last process, so every launch, registry import and winecfg run used to start a new one. A managed
+    wineserver is started with a persistence delay instead, and exits by itself once it has been idle that long.
+    A timeout of 0 disables management and leaves starting the wineserver to Wine.
+    """
+    _core_control: "WineprefixCoreControl"
+
+    def __init__(self, core_control: "WineprefixCoreControl"):
+        self._core_control = core_control
+
+    @property
+    def _base_directory(self) -> Path:
+        return self._core_control.prefix_paths.base_directory
+
+    @property
+    def is_managed(self) -> bool:
+        return idle_timeout() > 0
+
+    @property
+    def pid(self) -> Optional[int]:
+        return wineserver_pid(self._base_directory)
+
+    @property
+    def is_running(self) -> bool:
+        return self.pid is not None
+
+    @contextmanager
+    def lock(self):
+        """
+        Keeps every Grapejuice process from starting or stopping the wineserver of the prefix
+        """
+        with _prefix_lock(self._base_directory):
+            yield
+
+    def _wineserver_command(self, *args: str) -> int:
+        launch_environment = self._core_control.prepare_for_launch()
+
+        return subprocess.call(
+            [str(self._core_control.wine_server()), *args],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            env=launch_environment.as_dict(),
+            timeout=START_TIMEOUT
+        )
+
+    def ensure_running(self) -> bool:
+        """
+        Starts the wineserver of the prefix if it is not running yet
+        :return: Whether a managed wineserver is running
+        """
+        timeout = idle_timeout()
+        if timeout <= 0:
+            return False
+
+        with _prefix_lock(self._base_directory):
+            if self.is_running:
+                return True
+
+            log.info(f"Starting a wineserver for {self._base_directory} that persists for {timeout} idle seconds")
+
+            try:
+                # The wineserver forks into the background once it is ready to accept clients. When another one
+                # won the race it exits with an error, which is just as good.
+                self._wineserver_command(f"-p{timeout}")
+
+            except (OSError, subprocess.SubprocessError, AssertionError) as e:
+                log.error(f"Could not start a wineserver for {self._base_directory}: {e}")
+                return False
+
+            return self.is_running
+
+    def kill(self):
+        """
+        Kills every process in the prefix, and the wineserver itself
+        :raises subprocess.CalledProcessError: When the wineserver reports an error, like when none was running
+        """
+        with _prefix_lock(self._base_directory):
+            return_code = self._wineserver_command("-k")
+
+        if return_code != 0:
+            raise subprocess.CalledProcessError(return_code, [str(self._core_control.wine_server()), "-k"])
+
+    def end_session(self):
+        """
+        Ends the processes running in the prefix. A managed wineserver is kept around for whatever comes next.
+        """
+        if not self.is_managed:
+            self.kill()
+            return
+
+        self._core_control.run_exe("wineboot", "--kill", run_async=False)
+
+
+def prestart_wineservers():
+    """
+    Starts the wineservers of every prefix in advance, when the user asked for that
+    """
+    from grapejuice_common.errors import NoValidWineHomes
+    from grapejuice_common.features.settings import current_settings, k_prestart_wineservers
+    from grapejuice_common.wine.wineprefix import Wineprefix
+
+    if not current_settings.get(k_prestart_wineservers, default_value=False):
+        return
+
+    for configuration in current_settings.parsed_wineprefixes_sorted:
+        prefix = Wineprefix(configuration)
+
+        if not prefix.paths.base_directory.is_dir():
+            continue
+
+        try:
+            prefix.core_control.wineserver.ensure_running()
+
+        except NoValidWineHomes as e:
+            log.warning(f"Not starting a wineserver for {configuration.display_name}: {e}")
+
+
+def prestart_wineservers_in_background():
+    threading.Thread(target=prestart_wineservers, name="prestart-wineservers", daemon=True).start()
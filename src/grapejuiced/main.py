@@ -14,6 +14,8 @@ def cli():
 
 def _spawn(pid_file: PIDFile):
     from grapejuiced.state import State
+    from grapejuice_common.wine.wineserver_manager import prestart_wineservers_in_background
+    from grapejuice_common.wine.roblox_log_rotation import rotate_all_roblox_logs_in_background
     state = State()
 
     def on_sigint(*_) -> None:
@@ -25,6 +27,10 @@ def _spawn(pid_file: PIDFile):
     print("> Spawning a new daemon")
     pid_file.write_pid()
     state.start_service()
+
+    # The daemon is started right before a launch, the wineserver can start while the launch is prepared
+    prestart_wineservers_in_background()
+    rotate_all_roblox_logs_in_background()
     state.start()
 
 
@@ -3,6 +3,7 @@ from dbus.mainloop.glib import DBusGMainLoop
 from gi.repository import GLib
 
 from grapejuice_common.ipc.dbus_config import bus_path
+from grapejuice_common.util.process_supervisor import process_supervisor
 from grapejuiced.dbus_service import DBusService
 
 
@@ -22,6 +23,7 @@ class State:
             self.service = None
 
         self.loop = GLib.MainLoop()
+        process_supervisor.use_glib_main_loop()
 
     def start(self):
         self.loop.run()
@@ -0,0 +1,84 @@
+import threading
+import time
+
+from grapejuice_common.util.cache_utils import cache, MemoCache
+
+
+def test_results_are_cached_per_argument():
+    calls = []
+
+    @cache(max_size=2)
+    def square(x):
+        calls.append(x)
+        return x * x
+
+    assert [square(2), square(2), square(3)] == [4, 4, 9]
+    assert calls == [2, 3]
+    assert square.cache.stats.hits == 1
+
+    square(4)
+    square(2)
+
+    assert calls == [2, 3, 4, 2]
+    assert square.cache.stats.evictions == 2
+
+
+def test_invalidation_and_expiry():
+    calls = []
+
+    @cache(ttl=0.05)
+    def value(key):
+        calls.append(key)
+        return len(calls)
+
+    assert value("a") == value("a") == 1
+
+    value.invalidate("a")
+    assert value("a") == 2
+
+    time.sleep(0.06)
+    assert value("a") == 3
+    assert value.cache.stats.expirations == 1
+
+
+def test_concurrent_callers_share_one_computation():
+    calls = []
+    started = threading.Event()
+
+    @cache()
+    def slow():
+        calls.append(None)
+        started.set()
+        time.sleep(0.05)
+        return "done"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(slow())) for _ in range(8)]
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == ["done"] * 8
+
+
+def test_persistent_entries_outlive_the_cache(tmp_path):
+    location = tmp_path / "memo.json"
+    MemoCache("test", ttl=60, persistent_location=location).put(("key", 1), "value")
+
+    assert MemoCache("test", persistent_location=location).get(("key", 1)) == "value"
+
+
+def test_persistent_entries_replace_the_file_at_once(tmp_path):
+    location = tmp_path / "memo.json"
+    location.write_text("[]")
+    inode = location.stat().st_ino
+
+    MemoCache("test", persistent_location=location).put("key", "value")
+
+    # A new file took the place of the old one, nothing was written in place
+    assert location.stat().st_ino != inode
+    assert [path.name for path in tmp_path.iterdir()] == ["memo.json"]
@@ -0,0 +1,166 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from grapejuice_common.errors import DownloadVerificationError
+from grapejuice_common.util import downloader as downloader_module
+from grapejuice_common.util.downloader import ArtifactDownloader, ArtifactCache
+from grapejuice_common.util.http_client import HTTPClient, HTTPCache
+
+PAYLOAD = bytes(range(256)) * 4096
+PAYLOAD_SHA256 = hashlib.sha256(PAYLOAD).hexdigest()
+ETAG = '"payload-1"'
+DAY = 24 * 60 * 60
+
+
+class _ArtifactHandler(BaseHTTPRequestHandler):
+    requests_seen = []
+
+    def do_GET(self):
+        self.requests_seen.append(dict(self.headers))
+
+        if self.headers.get("If-None-Match", None) == ETAG:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        start = 0
+        byte_range = self.headers.get("Range", None)
+
+        if byte_range and self.headers.get("If-Range", None) == ETAG:
+            start = int(byte_range.split("=")[1].rstrip("-"))
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(PAYLOAD) - 1}/{len(PAYLOAD)}")
+
+        else:
+            self.send_response(200)
+
+        self.send_header("ETag", ETAG)
+        self.send_header("Content-Length", str(len(PAYLOAD) - start))
+        self.end_headers()
+        self.wfile.write(PAYLOAD[start:])
+
+    def log_message(self, *_):
+        pass
+
+
+@pytest.fixture
+def url():
+    _ArtifactHandler.requests_seen = []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _ArtifactHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+
+    yield f"http://127.0.0.1:{httpd.server_address[1]}/dxvk.tar.gz"
+
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def downloader(tmp_path):
+    return ArtifactDownloader(ArtifactCache(tmp_path / "artifacts"), HTTPClient(HTTPCache(tmp_path / "http")))
+
+
+def test_downloads_are_stored_by_content(url, downloader):
+    progress = []
+    artifact = downloader.fetch(url, on_progress=progress.append)
+
+    assert artifact.sha256 == PAYLOAD_SHA256
+    assert artifact.path.read_bytes() == PAYLOAD
+    assert progress[-1].fraction == 1.0
+
+    assert downloader.fetch(url, revalidate=False) == artifact
+    assert downloader.fetch("http://127.0.0.1:1/elsewhere", sha256=PAYLOAD_SHA256).path == artifact.path
+    assert len(_ArtifactHandler.requests_seen) == 1
+
+
+def test_downloads_are_revalidated(url, downloader):
+    first = downloader.fetch(url)
+    second = downloader.fetch(url)
+
+    assert first.path == second.path
+    assert _ArtifactHandler.requests_seen[1]["If-None-Match"] == ETAG
+
+
+def test_interrupted_downloads_are_resumed(url, downloader):
+    cache = downloader.cache
+    partial_path = cache.partial_path(url)
+    partial_path.parent.mkdir(parents=True)
+    partial_path.write_bytes(PAYLOAD[:1000])
+    cache.partial_metadata_path(url).write_text(json.dumps({"url": url, "etag": ETAG}))
+
+    artifact = downloader.fetch(url, sha256=None, size=len(PAYLOAD))
+
+    assert _ArtifactHandler.requests_seen[0]["Range"] == "bytes=1000-"
+    assert artifact.sha256 == PAYLOAD_SHA256
+    assert not partial_path.exists()
+
+
+def test_hash_mismatches_are_rejected(url, downloader):
+    with pytest.raises(DownloadVerificationError):
+        downloader.fetch(url, sha256="0" * 64)
+
+    assert not downloader.cache.partial_path(url).exists()
+    assert downloader.cache.lookup(url) is None
+
+
+def _store(cache: ArtifactCache, url: str, content: bytes):
+    partial_path = cache.partial_path(url)
+    partial_path.parent.mkdir(parents=True, exist_ok=True)
+    partial_path.write_bytes(content)
+
+    return cache.store(url, partial_path, hashlib.sha256(content).hexdigest(), len(content), dict())
+
+
+def _age(path, seconds: float):
+    timestamp = time.time() - seconds
+    os.utime(path, (timestamp, timestamp))
+
+
+def test_replaced_files_are_removed_once_unreferenced(tmp_path):
+    cache = ArtifactCache(tmp_path)
+
+    old = _store(cache, "https://example.com/latest.tar.gz", b"old")
+    shared = _store(cache, "https://example.com/v1.tar.gz", b"shared")
+    _store(cache, "https://example.com/mirror.tar.gz", b"shared")
+
+    _store(cache, "https://example.com/latest.tar.gz", b"new")
+    _store(cache, "https://example.com/v1.tar.gz", b"newer")
+
+    assert not old.path.exists()
+    assert shared.path.exists()
+
+
+def test_sweep_is_bounded_by_size_and_age(tmp_path, monkeypatch):
+    monkeypatch.setattr(downloader_module, "UNREFERENCED_BUDGET_BYTES", 1000)
+    cache = ArtifactCache(tmp_path)
+    referenced = _store(cache, "https://example.com/dxvk.tar.gz", bytes(2000))
+
+    def unreferenced(name: str, size: int, age: float):
+        blob = cache.blob_path(name)
+        blob.parent.mkdir(parents=True, exist_ok=True)
+        blob.write_bytes(bytes(size))
+        _age(blob, age)
+
+        return blob
+
+    recent = unreferenced("aa01", 600, age=60)
+    over_budget = unreferenced("aa02", 600, age=120)
+    expired = unreferenced("bb01", 10, age=30 * DAY)
+
+    stale_partial = cache.partial_path("https://example.com/abandoned.exe")
+    stale_partial.write_bytes(b"abandoned")
+    _age(stale_partial, 30 * DAY)
+
+    active_partial = cache.partial_path("https://example.com/downloading.exe")
+    active_partial.write_bytes(b"downloading")
+
+    assert cache.sweep() == 600 + 10 + len(b"abandoned")
+
+    assert referenced.path.exists() and recent.exists() and active_partial.exists()
+    assert not over_budget.exists() and not expired.exists() and not stale_partial.exists()
@@ -0,0 +1,49 @@
+import subprocess
+
+import pytest
+
+from grapejuice_common.hardware_info import glx_info
+from grapejuice_common.hardware_info.glx_info import GLXInfo
+
+FULL_OUTPUT = "OpenGL version string: 4.6 (Compatibility Profile) Mesa 22.2.0\n"
+
+
+def _fake_glxinfo(tmp_path, monkeypatch, script: str):
+    bin_directory = tmp_path / "bin"
+    bin_directory.mkdir()
+
+    glxinfo = bin_directory / "glxinfo"
+    glxinfo.write_text(f"#!/bin/sh\necho \"$@\" >> '{tmp_path / 'calls'}'\n{script}\n")
+    glxinfo.chmod(0o755)
+
+    monkeypatch.setenv("PATH", str(bin_directory))
+    monkeypatch.setattr(glx_info._GLXInfoFlags, "supports_brief", None)
+
+
+def _calls(tmp_path):
+    return (tmp_path / "calls").read_text().splitlines()
+
+
+def test_full_output_is_used_when_brief_mode_is_rejected(tmp_path, monkeypatch):
+    _fake_glxinfo(tmp_path, monkeypatch, f"""
+if [ "$1" = "-B" ]; then
+    echo "Unknown option \\`-B'"
+    echo "Usage: glxinfo [-v] [-t] [-h] [-i] [-b] [-s] [-display <dname>]"
+    exit 0
+fi
+printf '{FULL_OUTPUT}'
+""")
+
+    assert GLXInfo().version == (4, 6)
+    assert GLXInfo().version == (4, 6)
+    assert _calls(tmp_path) == ["-B", "", ""]
+
+
+def test_other_failures_do_not_give_up_on_brief_mode(tmp_path, monkeypatch):
+    _fake_glxinfo(tmp_path, monkeypatch, "echo \"Error: unable to open display\" >&2\nexit 1")
+
+    with pytest.raises(subprocess.CalledProcessError):
+        GLXInfo()
+
+    assert _calls(tmp_path) == ["-B"]
+    assert glx_info._GLXInfoFlags.supports_brief is None
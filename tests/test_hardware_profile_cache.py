@@ -0,0 +1,95 @@
+from dataclasses import replace
+
+from grapejuice_common.hardware_info.hardware_fingerprint import fingerprint_components, fingerprint_from_components
+from grapejuice_common.hardware_info.hardware_profile import HardwareProfile
+from grapejuice_common.hardware_info.hardware_profile_cache import HardwareProfileCache, N_KEEP_PROFILES, \
+    find_shared_profile, format_profiles, read_profiles_file
+from grapejuice_common.hardware_info.sysfs_pci import SysfsPCIDevice
+
+NVIDIA_CARD = SysfsPCIDevice("0000:01:00.0", 0x030200, 0x10de, 0x1f91, "nvidia")
+
+
+def _profile() -> HardwareProfile:
+    return HardwareProfile(
+        graphics_id="graphics-id",
+        gpu_vendor_id=2,
+        gpu_pci_id="01:00.0",
+        gpu_can_do_vulkan=True,
+        provider_index=1,
+        provider_name="NVIDIA-G0",
+        should_prime=True,
+        use_mesa_gl_override=False,
+        preferred_roblox_renderer_string="Vulkan",
+        is_multi_gpu=True
+    )
+
+
+def test_cached_profiles_survive_a_round_trip(tmp_path):
+    location = tmp_path / "hardware_profiles.json"
+    HardwareProfileCache(location).put("fingerprint", _profile())
+
+    assert HardwareProfileCache(location).get("fingerprint") == _profile()
+    assert HardwareProfileCache(location).get("other fingerprint") is None
+
+
+def test_outdated_profiles_are_ignored(tmp_path):
+    cache = HardwareProfileCache(tmp_path / "hardware_profiles.json")
+    cache.put("fingerprint", replace(_profile(), version=HardwareProfile.version - 1))
+
+    assert cache.get("fingerprint") is None
+
+
+def test_cache_only_keeps_recent_profiles(tmp_path):
+    cache = HardwareProfileCache(tmp_path / "hardware_profiles.json")
+
+    for i in range(N_KEEP_PROFILES + 1):
+        cache.put(str(i), _profile(), save=False)
+
+    assert cache.get("0") is None
+    assert cache.get(str(N_KEEP_PROFILES)) is not None
+
+
+def test_fingerprint_changes_with_the_driver_version(tmp_path):
+    module_directory = tmp_path / "nvidia"
+    module_directory.mkdir()
+    (module_directory / "version").write_text("515.65.01\n")
+
+    before = fingerprint_from_components(fingerprint_components([NVIDIA_CARD], tmp_path))
+    (module_directory / "version").write_text("520.56.06\n")
+    after = fingerprint_from_components(fingerprint_components([NVIDIA_CARD], tmp_path))
+
+    assert before != after
+
+
+def test_exported_profiles_can_be_imported(tmp_path):
+    exporting_cache = HardwareProfileCache(tmp_path / "exporting.json")
+    exporting_cache.put("fingerprint", _profile())
+
+    exported_file = tmp_path / "exported.json"
+    exported_file.write_text(format_profiles(exporting_cache.export_profiles()))
+
+    importing_cache = HardwareProfileCache(tmp_path / "importing.json")
+    imported = importing_cache.import_profiles(read_profiles_file(exported_file))
+
+    assert imported == ["fingerprint"]
+    assert HardwareProfileCache(tmp_path / "importing.json").get("fingerprint") == _profile()
+
+
+def test_only_profiles_that_fit_in_the_cache_are_reported_as_imported(tmp_path):
+    profiles = {f"fingerprint-{i}": _profile().as_dict for i in range(N_KEEP_PROFILES + 2)}
+    profiles["outdated"] = {**_profile().as_dict, "version": 0}
+
+    imported = HardwareProfileCache(tmp_path / "importing.json").import_profiles(profiles)
+
+    assert imported == [f"fingerprint-{i}" for i in range(2, N_KEEP_PROFILES + 2)]
+    assert HardwareProfileCache(tmp_path / "importing.json").get("fingerprint-0") is None
+
+
+def test_shared_profiles_are_found_by_fingerprint(tmp_path):
+    shared_directory = tmp_path / "shared"
+    shared_directory.mkdir()
+    (shared_directory / "workstations.json").write_text(format_profiles({"fingerprint": _profile().as_dict}))
+    (shared_directory / "broken.json").write_text("{")
+
+    assert find_shared_profile("fingerprint", [shared_directory]) == _profile()
+    assert find_shared_profile("other fingerprint", [shared_directory, tmp_path / "missing"]) is None
@@ -0,0 +1,84 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from grapejuice_common.util.http_client import HTTPClient, HTTPCache
+
+ETAG = '"version-1"'
+
+
+class _VersionHandler(BaseHTTPRequestHandler):
+    requests_seen = []
+
+    def do_GET(self):
+        self.requests_seen.append(self.headers.get("If-None-Match", None))
+
+        if self.headers.get("If-None-Match", None) == ETAG:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        body = b"version-1\n"
+        self.send_response(200)
+        self.send_header("ETag", ETAG)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *_):
+        pass
+
+
+@pytest.fixture
+def server():
+    _VersionHandler.requests_seen = []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _VersionHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+
+    yield httpd
+
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _url(httpd) -> str:
+    return f"http://127.0.0.1:{httpd.server_address[1]}/version"
+
+
+def test_fresh_responses_are_served_from_disk(server, tmp_path):
+    url = _url(server)
+
+    first = HTTPClient(HTTPCache(tmp_path)).get_metadata(url, ttl=60)
+    second = HTTPClient(HTTPCache(tmp_path)).get_metadata(url, ttl=60)
+
+    assert first.text == second.text == "version-1\n"
+    assert not first.from_cache and second.from_cache
+    assert len(_VersionHandler.requests_seen) == 1
+
+
+def test_expired_responses_are_revalidated(server, tmp_path):
+    client = HTTPClient(HTTPCache(tmp_path))
+    url = _url(server)
+
+    client.get_metadata(url, ttl=0)
+    response = client.get_metadata(url, ttl=0)
+
+    assert _VersionHandler.requests_seen == [None, ETAG]
+    assert response.from_cache and not response.is_stale
+    assert response.text == "version-1\n"
+
+
+def test_stale_responses_are_served_when_offline(server, tmp_path):
+    client = HTTPClient(HTTPCache(tmp_path), timeout=1)
+    url = _url(server)
+    client.get_metadata(url, ttl=0)
+
+    server.shutdown()
+    server.server_close()
+
+    response = client.get_metadata(url, ttl=0)
+
+    assert response.is_stale
+    assert response.text == "version-1\n"
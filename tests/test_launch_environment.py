@@ -0,0 +1,64 @@
+import os
+
+from grapejuice_common.features import settings
+from grapejuice_common.models.wineprefix_configuration_model import WineprefixConfigurationModel
+from grapejuice_common.wine.wineprefix_core_control import WineprefixCoreControl
+from grapejuice_common.wine.wineprefix_paths import WineprefixPaths
+
+
+def _core_control(tmp_path, monkeypatch) -> WineprefixCoreControl:
+    monkeypatch.setattr(settings.current_settings, "_loaded_settings_object", {settings.k_default_wine_home: ""})
+
+    wine_home = tmp_path / "wine"
+    (wine_home / "bin").mkdir(parents=True)
+
+    configuration = WineprefixConfigurationModel(
+        id="id",
+        priority=0,
+        name_on_disk="player",
+        display_name="Player",
+        wine_home=str(wine_home),
+        dll_overrides="dxgi=n"
+    )
+
+    return WineprefixCoreControl(WineprefixPaths(tmp_path / "prefix"), configuration)
+
+
+def test_launch_environment_leaves_os_environ_alone(tmp_path, monkeypatch):
+    monkeypatch.delenv("WINEPREFIX", raising=False)
+    core_control = _core_control(tmp_path, monkeypatch)
+
+    environment = core_control.prepare_for_launch()
+
+    assert environment.variables["WINEPREFIX"] == str(tmp_path / "prefix")
+    assert environment.variables["PATH"].startswith(str(tmp_path / "wine" / "bin"))
+    assert "winemenubuilder.exe=" in environment.variables["WINEDLLOVERRIDES"]
+    assert "WINEPREFIX" not in os.environ
+
+
+def test_launch_environment_is_rebuilt_when_the_configuration_changes(tmp_path, monkeypatch):
+    core_control = _core_control(tmp_path, monkeypatch)
+    environment = core_control.launch_environment()
+
+    assert core_control.launch_environment() is environment
+
+    core_control._configuration.env = {"DXVK_HUD": "fps"}
+    changed_environment = core_control.launch_environment()
+
+    assert changed_environment is not environment
+    assert changed_environment.variables["DXVK_HUD"] == "fps"
+
+
+def test_launch_environment_is_rebuilt_when_the_wine_home_resolves_differently(tmp_path, monkeypatch):
+    core_control = _core_control(tmp_path, monkeypatch)
+
+    default_home = tmp_path / "default"
+    (default_home / "bin").mkdir(parents=True)
+    settings.current_settings.set(settings.k_default_wine_home, str(default_home))
+
+    assert core_control.launch_environment().variables["PATH"].startswith(str(tmp_path / "wine" / "bin"))
+
+    # The configured home is removed, so the default home is used instead
+    (tmp_path / "wine" / "bin").rmdir()
+
+    assert core_control.launch_environment().variables["PATH"].startswith(str(default_home / "bin"))
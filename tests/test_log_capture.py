@@ -0,0 +1,132 @@
+import gzip
+import os
+import signal
+import subprocess
+import time
+
+import pytest
+
+from grapejuice_common.logs.log_capture import WinedebugFilter, LogCapture, CaptureOptions, k_gzip, DRAIN_TIMEOUT, \
+    detach_all_captures
+from grapejuice_common.wine.wineprefix_core_control import _run_captured
+
+
+def _capture(tmp_path, script: str, **options) -> LogCapture:
+    proc = subprocess.Popen(["sh", "-c", script], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    capture = LogCapture(tmp_path / "run", CaptureOptions(compression=k_gzip, **options))
+    capture.attach(proc)
+
+    proc.wait()
+    capture.join(10)
+
+    return capture
+
+
+def test_filter_follows_winedebug_syntax():
+    f = WinedebugFilter("fixme-all,err+module,-d3d")
+
+    assert not f.accepts(b"0024:fixme:ntdll:NtQuerySystemInformation info_class 0x99\n")
+    assert f.accepts(b"0024:err:module:import_dll Library not found\n")
+    assert not f.accepts(b"0024:warn:d3d:wined3d_adapter_init Unknown GPU\n")
+    assert f.accepts(b"0024:warn:seh:dispatch_exception unhandled exception\n")
+    assert f.accepts(b"123.456:0024:err:seh:NtRaiseException Unhandled exception\n")
+    assert f.accepts(b"Roblox is starting\n")
+
+
+def test_later_filter_rules_take_priority():
+    f = WinedebugFilter("-all,+seh")
+
+    assert f.accepts(b"0024:err:seh:handler\n")
+    assert not f.accepts(b"0024:err:module:handler\n")
+
+
+def test_invalid_filter_is_rejected():
+    with pytest.raises(ValueError):
+        WinedebugFilter("fixme-all,+d3d 11")
+
+
+def test_output_is_compressed_and_filtered(tmp_path):
+    capture = _capture(
+        tmp_path,
+        "echo hello; echo '0024:fixme:ntdll:Nt stub' >&2; echo '0024:err:seh:crash' >&2",
+        channel_filter="fixme-all"
+    )
+
+    stdout, stderr = capture.streams
+
+    assert gzip.decompress(stdout.log_path.read_bytes()) == b"hello\n"
+    assert gzip.decompress(stderr.log_path.read_bytes()) == b"0024:err:seh:crash\n"
+    assert stderr.filtered_bytes == len(b"0024:fixme:ntdll:Nt stub\n")
+    assert not stdout.truncated and not stdout.tail_path.exists()
+
+
+def test_budget_keeps_the_tail_of_the_log(tmp_path):
+    # Random lines do not compress, so the budget runs out quickly
+    capture = _capture(
+        tmp_path,
+        "head -c 2000000 /dev/urandom | od -An -x; echo the last line",
+        budget_bytes=64 * 1024,
+        tail_bytes=4096
+    )
+
+    stdout = next(s for s in capture.streams if s.name == "stdout")
+
+    assert stdout.truncated
+    assert stdout.dropped_bytes > 0
+    assert stdout.log_path.stat().st_size < 128 * 1024
+    assert b"log budget ran out" in gzip.decompress(stdout.log_path.read_bytes())
+
+    tail = stdout.tail_path.read_bytes()
+    assert tail.endswith(b"the last line\n")
+    assert len(tail) <= 4096
+
+
+def test_a_grandchild_holding_the_pipe_does_not_block_the_run(tmp_path):
+    pid_file = tmp_path / "grandchild"
+
+    # Like the wineserver, the grandchild inherits stderr and outlives the process that started it
+    script = f"sleep 30 >/dev/null & echo $! > '{pid_file}'; echo done; echo err >&2"
+
+    start = time.monotonic()
+
+    try:
+        _run_captured(
+            ["sh", "-c", script],
+            tmp_path / "run",
+            CaptureOptions(compression=k_gzip),
+            run_async=False,
+            working_directory=None,
+            post_run_function=None,
+            env=None
+        )
+        elapsed = time.monotonic() - start
+
+    finally:
+        os.kill(int(pid_file.read_text()), signal.SIGKILL)
+
+    assert elapsed < DRAIN_TIMEOUT + 2
+    assert gzip.decompress((tmp_path / "run_stdout.log.gz").read_bytes()) == b"done\n"
+
+    stderr = gzip.decompress((tmp_path / "run_stderr.log.gz").read_bytes())
+    assert stderr.startswith(b"err\n") and b"Stopped capturing" in stderr
+
+
+def test_running_captures_are_detached_on_exit(tmp_path):
+    proc = subprocess.Popen(["sh", "-c", "echo started; exec sleep 30"], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    capture = LogCapture(tmp_path / "run", CaptureOptions(compression=k_gzip))
+    capture.attach(proc)
+
+    try:
+        time.sleep(0.5)
+        detach_all_captures()
+
+    finally:
+        proc.kill()
+        proc.wait()
+
+    stdout = next(s for s in capture.streams if s.name == "stdout")
+
+    assert stdout.detached
+    assert gzip.decompress(stdout.log_path.read_bytes()).startswith(b"started\n")
@@ -0,0 +1,98 @@
+import gzip
+import os
+import subprocess
+import tarfile
+import time
+
+from grapejuice_common.logs.log_vacuum import vacuum_logs, VacuumPolicy, archive_files, MIB
+
+
+def _write_log(directory, name, content: bytes, age: float = 2 * 60 * 60):
+    path = directory / name
+    path.write_bytes(content)
+
+    timestamp = time.time() - age
+    os.utime(path, (timestamp, timestamp))
+
+    return path
+
+
+def _archived_names(directory):
+    names = []
+
+    for archive in archive_files(directory):
+        with tarfile.open(archive) as tf:
+            names.extend(tf.getnames())
+
+    return names
+
+
+def test_old_logs_are_compressed_into_an_archive(tmp_path):
+    big_log = _write_log(tmp_path, "big_stdout.log", b"fixme:stub\n" * 500_000)
+    captured_log = _write_log(tmp_path, "run_stderr.log.gz", gzip.compress(b"captured"))
+    empty_log = _write_log(tmp_path, "empty_stdout.log", b"")
+    recent_log = _write_log(tmp_path, "recent_stdout.log", b"still running", age=0)
+
+    report = vacuum_logs(VacuumPolicy(), tmp_path)
+
+    assert report.archived_logs == 2
+    assert report.removed_logs == 1
+    assert not big_log.exists() and not captured_log.exists() and not empty_log.exists()
+    assert recent_log.exists()
+
+    assert sorted(_archived_names(tmp_path)) == ["big_stdout.log.gz", "run_stderr.log.gz"]
+
+    with tarfile.open(archive_files(tmp_path)[0]) as tf:
+        assert gzip.decompress(tf.extractfile("big_stdout.log.gz").read()) == b"fixme:stub\n" * 500_000
+
+
+def test_logs_open_in_a_process_are_left_alone(tmp_path):
+    quiet_log = _write_log(tmp_path, "quiet_stdout.log", b"started")
+    empty_log = _write_log(tmp_path, "quiet_stderr.log", b"")
+
+    # Only the child keeps the logs open
+    with quiet_log.open("ab") as stdout, empty_log.open("ab") as stderr:
+        proc = subprocess.Popen(["sleep", "30"], stdout=stdout, stderr=stderr)
+
+    try:
+        report = vacuum_logs(VacuumPolicy(), tmp_path)
+
+    finally:
+        proc.kill()
+        proc.wait()
+
+    assert report.archived_logs == 0
+    assert report.removed_logs == 0
+    assert quiet_log.exists() and empty_log.exists()
+
+
+def test_newest_archive_is_appended_to(tmp_path):
+    _write_log(tmp_path, "first.log", b"first")
+    vacuum_logs(VacuumPolicy(), tmp_path)
+
+    _write_log(tmp_path, "second.log", b"second")
+    vacuum_logs(VacuumPolicy(), tmp_path)
+
+    assert len(archive_files(tmp_path)) == 1
+    assert sorted(_archived_names(tmp_path)) == ["first.log.gz", "second.log.gz"]
+
+
+def test_archives_beyond_the_budget_and_age_are_removed(tmp_path):
+    archive_directory = tmp_path / "archive"
+    archive_directory.mkdir()
+
+    expired = archive_directory / "2020-01-01_00-00-00.zip"
+    expired.write_bytes(b"x" * 1024)
+    os.utime(expired, (0, 0))
+
+    oldest = archive_directory / "2021-01-01_00-00-00.tar"
+    oldest.write_bytes(b"x" * MIB)
+    os.utime(oldest, (time.time() - 60, time.time() - 60))
+
+    newest = archive_directory / "2021-01-02_00-00-00.tar"
+    newest.write_bytes(b"x" * MIB)
+
+    report = vacuum_logs(VacuumPolicy(budget_bytes=MIB + 1024), tmp_path)
+
+    assert report.removed_archives == 2
+    assert archive_files(tmp_path) == [newest]
@@ -0,0 +1,77 @@
+import json
+from pathlib import Path
+
+from grapejuice_common.hardware_info.kernel_modules import PCIModulesAliasIndex
+from grapejuice_common.hardware_info.lspci import LSPci
+from grapejuice_common.hardware_info.sysfs_pci import sysfs_graphics_id
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures" / "lspci"
+
+SYSFS_ATTRIBUTES = ("kernel driver in use", "kernel modules")
+
+
+def _make_sysfs_tree(root: Path, fixture_name: str) -> Path:
+    devices_directory = root / "devices"
+
+    with (FIXTURES / fixture_name).open("r") as fp:
+        devices = json.load(fp)
+
+    for address, files in devices.items():
+        device_path = devices_directory / address
+        device_path.mkdir(parents=True)
+
+        for name, content in files.items():
+            (device_path / name).write_text(content)
+
+    return devices_directory
+
+
+def _both_backends(tmp_path: Path):
+    lspci = LSPci.from_lspci((FIXTURES / "hybrid_laptop.lspci.txt").read_text())
+    sysfs = LSPci.from_sysfs(
+        _make_sysfs_tree(tmp_path, "hybrid_laptop.sysfs.json"),
+        pci_ids_path=FIXTURES / "pci.ids",
+        modules_alias_index=PCIModulesAliasIndex(FIXTURES / "modules.alias")
+    )
+
+    return lspci, sysfs
+
+
+def test_sysfs_backend_finds_the_same_devices(tmp_path):
+    lspci, sysfs = _both_backends(tmp_path)
+
+    assert [e.pci_id for e in sysfs.entries] == [e.pci_id for e in lspci.entries]
+    assert [e.pci_id for e in sysfs.graphics_cards] == ["00:02.0", "01:00.0"]
+
+
+def test_sysfs_backend_matches_lspci_graphics_cards(tmp_path):
+    lspci, sysfs = _both_backends(tmp_path)
+
+    for lspci_card, sysfs_card in zip(lspci.graphics_cards, sysfs.graphics_cards):
+        assert sysfs_card.gpu_id_attribute == lspci_card.gpu_id_attribute
+        assert sysfs_card.kernel_driver == lspci_card.kernel_driver
+        assert sysfs_card.kernel_modules == lspci_card.kernel_modules
+
+    assert sysfs.graphics_id == lspci.graphics_id
+
+
+def test_sysfs_backend_matches_lspci_attributes(tmp_path):
+    lspci, sysfs = _both_backends(tmp_path)
+
+    for lspci_entry, sysfs_entry in zip(lspci.entries, sysfs.entries):
+        for k, v in sysfs_entry.attributes.items():
+            assert lspci_entry.attributes[k] == v
+
+        for k in SYSFS_ATTRIBUTES:
+            assert sysfs_entry.attributes.get(k) == lspci_entry.attributes.get(k)
+
+
+def test_sysfs_graphics_id_follows_the_driver(tmp_path):
+    devices_directory = _make_sysfs_tree(tmp_path, "hybrid_laptop.sysfs.json")
+    before = sysfs_graphics_id(devices_directory)
+
+    uevent_path = devices_directory / "0000:01:00.0" / "uevent"
+    uevent_path.write_text(uevent_path.read_text().replace("DRIVER=nvidia", "DRIVER=nouveau"))
+
+    assert sysfs_graphics_id(devices_directory) != before
+    assert sysfs_graphics_id(tmp_path / "does-not-exist") is None
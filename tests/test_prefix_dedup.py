@@ -0,0 +1,144 @@
+import errno
+import fcntl
+import os
+
+from grapejuice_common.wine.prefix_dedup import deduplicate_prefixes, k_reflink, k_hardlink, FICLONE
+from grapejuice_common.wine.wineprefix_paths import WineprefixPaths
+
+SIZE = 128 * 1024
+
+
+def _populate(prefixes_directory, name, payload: bytes, unique: bytes):
+    prefix_paths = WineprefixPaths(prefixes_directory / name)
+    files = {
+        "dll": prefix_paths.system32 / "d3dcompiler_47.dll",
+        "pak": prefix_paths.roblox_versions_directories[0] / "version-abc" / "content.pak",
+        "settings": prefix_paths.roblox_versions_directories[0] / "version-abc" / "ClientSettings" / "big.bin",
+        "json": prefix_paths.system32 / "state.json",
+        "unique": prefix_paths.system32 / "unique.dll",
+        "document": prefix_paths.user_directory / "Documents" / "place.rbxl"
+    }
+
+    for key, path in files.items():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(unique if key == "unique" else payload)
+
+    return files
+
+
+def _inode(path):
+    stat = path.stat()
+    return stat.st_dev, stat.st_ino
+
+
+def _supports_reflinks(directory) -> bool:
+    source, target = directory / "reflink-source", directory / "reflink-target"
+    source.write_bytes(os.urandom(SIZE))
+
+    try:
+        with source.open("rb") as source_fp, target.open("wb") as target_fp:
+            fcntl.ioctl(target_fp.fileno(), FICLONE, source_fp.fileno())
+
+    except OSError as e:
+        assert e.errno in (errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL, errno.EXDEV)
+        return False
+
+    finally:
+        source.unlink()
+        target.unlink()
+
+    return True
+
+
+def test_dry_run_reports_savings_without_linking(tmp_path):
+    payload = os.urandom(SIZE)
+    player = _populate(tmp_path, "player", payload, os.urandom(SIZE))
+    studio = _populate(tmp_path, "studio", payload, os.urandom(SIZE))
+
+    report = deduplicate_prefixes(dry_run=True, prefixes_directory=tmp_path)
+
+    # The dll and pak of both prefixes are identical, settings, state and documents are not considered
+    assert report.scanned_files == 6
+    assert report.duplicate_groups == 1
+    assert report.duplicate_files == 3
+
+    if _supports_reflinks(tmp_path):
+        assert report.saved_bytes >= 3 * SIZE
+
+    else:
+        # Only the pak of the studio prefix would be hard linked
+        assert SIZE <= report.saved_bytes < 2 * SIZE
+
+    assert _inode(player["dll"]) != _inode(studio["dll"])
+    assert not [p for p in tmp_path.rglob("*") if p.name.endswith(".dedup")]
+
+
+def test_dry_run_only_counts_files_that_would_be_linked(tmp_path):
+    payload = os.urandom(200 * 1024)
+
+    for name in ("player", "studio"):
+        dll = WineprefixPaths(tmp_path / name).system32 / "d3dcompiler_47.dll"
+        dll.parent.mkdir(parents=True)
+        dll.write_bytes(payload)
+
+    dry_run = deduplicate_prefixes(dry_run=True, prefixes_directory=tmp_path)
+    report = deduplicate_prefixes(prefixes_directory=tmp_path)
+
+    assert dry_run.duplicate_files == 1
+    assert dry_run.saved_bytes == report.saved_bytes
+
+    if not _supports_reflinks(tmp_path):
+        assert dry_run.saved_bytes == 0
+
+
+def test_duplicates_are_linked(tmp_path):
+    payload = os.urandom(SIZE)
+    player = _populate(tmp_path, "player", payload, os.urandom(SIZE))
+    studio = _populate(tmp_path, "studio", payload, os.urandom(SIZE))
+
+    report = deduplicate_prefixes(prefixes_directory=tmp_path)
+
+    assert not report.errors
+
+    for files in (player, studio):
+        for key in ("dll", "pak"):
+            assert files[key].read_bytes() == payload
+
+    if report.reflinked_files:
+        assert report.reflinked_files == 3
+
+    else:
+        # Without reflinks only the Roblox versions are hard linked, Wine rewrites its system files in place
+        assert report.hard_linked_files == 1
+        assert _inode(player["pak"]) == _inode(studio["pak"])
+        assert len({_inode(player["dll"]), _inode(studio["dll"]), _inode(player["pak"])}) == 3
+
+    # Mutable files and user documents keep their own copies
+    assert len({_inode(player[key]) for key in ("settings", "json", "document")} | {_inode(player["dll"])}) == 4
+    assert _inode(player["document"]) != _inode(studio["document"])
+
+
+def test_hard_links_everywhere_are_opt_in(tmp_path):
+    payload = os.urandom(SIZE)
+    player = _populate(tmp_path, "player", payload, os.urandom(SIZE))
+    studio = _populate(tmp_path, "studio", payload, os.urandom(SIZE))
+
+    report = deduplicate_prefixes(link_mode=k_hardlink, prefixes_directory=tmp_path)
+
+    assert report.reflinked_files + report.hard_linked_files == 3
+
+    if report.hard_linked_files == 3:
+        assert len({_inode(files[key]) for files in (player, studio) for key in ("dll", "pak")}) == 1
+        assert deduplicate_prefixes(dry_run=True, prefixes_directory=tmp_path).duplicate_files == 0
+
+
+def test_reflink_only_never_hard_links(tmp_path):
+    payload = os.urandom(SIZE)
+    player = _populate(tmp_path, "player", payload, os.urandom(SIZE))
+    studio = _populate(tmp_path, "studio", payload, os.urandom(SIZE))
+
+    report = deduplicate_prefixes(link_mode=k_reflink, prefixes_directory=tmp_path)
+
+    assert report.hard_linked_files == 0
+    assert _inode(player["dll"]) != _inode(studio["dll"])
+    assert studio["dll"].read_bytes() == payload
@@ -0,0 +1,55 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+from grapejuice_common.wine.process_monitor import ProcessMonitor, render_table
+
+
+def test_cpu_usage_is_sampled_per_process_and_prefix(tmp_path):
+    env = {**os.environ, "WINEPREFIX": str(tmp_path)}
+    busy = subprocess.Popen([sys.executable, "-c", "while True: pass"], env=env)
+    idle = subprocess.Popen(["sleep", "30"], env=env)
+
+    try:
+        monitor = ProcessMonitor({tmp_path: "Player"})
+        monitor.sample()
+        time.sleep(0.5)
+
+        prefix_sample, = monitor.sample()
+        busy_sample, idle_sample = prefix_sample.processes
+
+        assert busy_sample.pid == busy.pid
+        assert busy_sample.cpu_percent > 50
+        assert idle_sample.pid == idle.pid
+        assert idle_sample.cpu_percent < 10
+        assert busy_sample.rss_bytes > 0
+        assert prefix_sample.threads == busy_sample.threads + idle_sample.threads
+
+        json.dumps(prefix_sample.as_dict)
+        assert "Player" in render_table([prefix_sample])
+
+    finally:
+        for proc in (busy, idle):
+            proc.kill()
+            proc.wait()
+
+
+def test_prefixes_with_the_same_name_are_sampled_apart(tmp_path):
+    first, second = tmp_path / "first", tmp_path / "second"
+    procs = [subprocess.Popen(["sleep", "30"], env={**os.environ, "WINEPREFIX": str(p)}) for p in (first, second)]
+
+    try:
+        samples = ProcessMonitor({first: "Player", second: "Player"}).sample()
+
+        assert {s.base_directory: [p.pid for p in s.processes] for s in samples} == {
+            first: [procs[0].pid],
+            second: [procs[1].pid]
+        }
+        assert [s.name for s in samples] == ["Player", "Player"]
+
+    finally:
+        for proc in procs:
+            proc.kill()
+            proc.wait()
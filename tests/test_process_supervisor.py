@@ -0,0 +1,35 @@
+import subprocess
+import threading
+
+import pytest
+
+from grapejuice_common.util.process_supervisor import ProcessSupervisor, ThreadBackend
+
+
+@pytest.mark.parametrize("use_pidfd", [True, False])
+def test_exit_callbacks_fire_with_the_exit_code(use_pidfd):
+    supervisor = ProcessSupervisor(ThreadBackend(use_pidfd=use_pidfd))
+    exited = threading.Event()
+    return_codes = []
+
+    def on_exit(proc: subprocess.Popen):
+        return_codes.append(proc.returncode)
+        exited.set()
+
+    proc = subprocess.Popen(["sh", "-c", "exit 3"])
+    supervisor.supervise(proc, on_exit=on_exit)
+
+    assert exited.wait(5)
+    assert return_codes == [3]
+    assert supervisor.processes == []
+
+
+def test_many_children_are_reaped():
+    supervisor = ProcessSupervisor(ThreadBackend())
+    remaining = threading.Semaphore(0)
+
+    for _ in range(16):
+        supervisor.supervise(subprocess.Popen(["true"]), on_exit=lambda _proc: remaining.release())
+
+    for _ in range(16):
+        assert remaining.acquire(timeout=5)
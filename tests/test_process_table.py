@@ -0,0 +1,39 @@
+import os
+import subprocess
+
+from grapejuice_common.wine.process_table import ProcStat, image_name, prefix_processes
+
+
+def test_image_names_come_from_the_windows_command_line():
+    assert image_name(["C:\\windows\\system32\\services.exe"]) == "services.exe"
+    assert image_name(["Z:\\home\\user\\rbxfpsunlocker.exe", "--flag"]) == "rbxfpsunlocker.exe"
+    assert image_name(["/usr/bin/wine64", "C:\\Roblox\\RobloxPlayerLauncher.exe"]) == "RobloxPlayerLauncher.exe"
+    assert image_name(["/opt/wine/bin/wineserver", "-p300"]) == "wineserver"
+    assert image_name([]) == ""
+
+
+def test_stat_survives_parentheses_in_the_command_name():
+    stat = ProcStat.parse(42, b"42 (a) b (c)) S 1 42 42 0 -1 4194560 100 0 0 0 7 3 0 0 20 0 5 0 1234 1000 25")
+
+    assert (stat.state, stat.utime, stat.stime, stat.threads, stat.start_time, stat.rss_pages) == \
+        ("S", 7, 3, 5, 1234, 25)
+
+
+def test_processes_are_found_by_their_wineprefix(tmp_path):
+    prefix = tmp_path / "prefix"
+    other_prefix = tmp_path / "other"
+
+    procs = [
+        subprocess.Popen(["sleep", "30"], env={**os.environ, "WINEPREFIX": f"{prefix}/"}),
+        subprocess.Popen(["sleep", "30"], env={**os.environ, "WINEPREFIX": str(other_prefix)})
+    ]
+
+    try:
+        processes = prefix_processes(prefix)
+
+        assert [(p.unix_pid, p.image, p.threads) for p in processes] == [(procs[0].pid, "sleep", 1)]
+
+    finally:
+        for proc in procs:
+            proc.kill()
+            proc.wait()
@@ -0,0 +1,150 @@
+import shutil
+from pathlib import Path
+
+from grapejuice_common.wine.registry_editor import apply_regedit_offline, parse_regedit, with_wow64_edits
+from grapejuice_common.wine.registry_file import RegistryFile, RegistryValue, escape_string, unescape_string, \
+    string_value, decode_value, REG_BINARY, REG_DWORD, REG_EXPAND_SZ, REG_MULTI_SZ, REG_QWORD
+from grapejuice_common.wine.wineprefix_paths import WineprefixPaths
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures" / "registry"
+ASSETS = Path(__file__).resolve().parent.parent / "src" / "grapejuice_common" / "assets"
+
+
+def _load(path: Path) -> RegistryFile:
+    hive = RegistryFile(path)
+    hive.load()
+
+    return hive
+
+
+def test_strings_survive_escaping():
+    s = "C:\\users\\\"quoted\"\n\tüñï 🍇"
+
+    assert unescape_string(escape_string(s)) == s
+    assert escape_string("ü") == "\\xfc"
+
+
+def test_escapes_follow_the_wine_format():
+    assert unescape_string(r"a\0001") == "a\x001"
+    assert unescape_string(r"\033[0m\e") == "\x1b[0m\x1b"
+    assert unescape_string(r"\xfc\x00fca") == "üüa"
+
+    assert escape_string("a\x001") == r"a\0001"
+    assert escape_string("a\x00") == r"a\0"
+    assert escape_string("\x01\x1b\a") == r"\1\e\a"
+    assert escape_string("ü1") == r"\x00fc1"
+    assert escape_string("üg") == r"\xfcg"
+
+    for s in ["a\x001", "\x007\x008", "\x1f0", "ü0ü", "\x7f\x7fa", "🍇f", "\0\0\0", "\\x41"]:
+        assert unescape_string(escape_string(s)) == s
+
+
+def test_saved_hives_load_the_same(tmp_path):
+    hive = _load(FIXTURES / "user.reg")
+    hive.save(tmp_path / "user.reg")
+    saved = _load(tmp_path / "user.reg")
+
+    for registry_key in hive.keys:
+        saved_key = saved.find_key(registry_key.path)
+
+        assert saved_key.value == registry_key.value
+        assert saved_key.attributes == registry_key.attributes
+        assert saved_key.metadata == registry_key.metadata
+
+    binary = saved.find_key(r"Software\\Wine\\Binary")
+    assert binary.get_attribute("") == "\"default\""
+    assert binary.get_attribute("Blob").endswith("16,17,18,19")
+    assert saved.find_key(r"software\\wine\\dlloverrides") is not None
+    assert (tmp_path / "user.reg").read_text().startswith("WINE REGISTRY Version 2\n;; All keys relative to")
+
+
+def test_edits_are_applied_offline(tmp_path):
+    prefix_paths = WineprefixPaths(tmp_path)
+    shutil.copy(FIXTURES / "user.reg", prefix_paths.user_registry_hive)
+
+    patch = (ASSETS / "disable_mime_assoc.reg").read_text() + "\n\n" + "\n".join([
+        r"[HKEY_CURRENT_USER\Software\Wine\DllOverrides]",
+        "\"d3d9\"=-",
+        "\"dxgi\"=\"native,builtin\"",
+        "",
+        r"[-HKEY_CURRENT_USER\Software\Roblox]"
+    ])
+
+    assert apply_regedit_offline(prefix_paths, patch)
+
+    hive = _load(prefix_paths.user_registry_hive)
+    overrides = hive.find_key(r"Software\\Wine\\DllOverrides").attributes
+
+    assert hive.find_key(r"Software\\Wine\\FileOpenAssociations").get_attribute("Enable") == "\"N\""
+    assert overrides == {"d3d11": "\"native\"", "d3d10core": "\"native\"", "dxgi": "\"native,builtin\""}
+    assert hive.find_key(r"Software\\Roblox\\RobloxStudioBrowser\\roblox.com") is None
+
+
+def test_edits_wait_for_wine_to_create_the_hive(tmp_path):
+    patch = (ASSETS / "disable_mime_assoc.reg").read_text()
+
+    assert not apply_regedit_offline(WineprefixPaths(tmp_path), patch)
+    assert not (tmp_path / "user.reg").exists()
+
+
+def test_machine_software_keys_are_mirrored_for_32_bit_programs():
+    edits = with_wow64_edits(parse_regedit("\n".join([
+        "Windows Registry Editor Version 5.00",
+        r"[HKEY_LOCAL_MACHINE\Software\Roblox]",
+        "\"Path\"=\"C:\\\\Roblox\"",
+        r"[HKEY_CLASSES_ROOT\roblox-player]"
+    ])))
+
+    assert [(e.key_path, e.value) for e in edits if e.name is not None] == [
+        ("Software\\Roblox", string_value("C:\\Roblox")),
+        ("Software\\Wow6432Node\\Roblox", string_value("C:\\Roblox"))
+    ]
+    assert "Software\\Classes\\roblox-player" in [e.key_path for e in edits]
+
+
+class _CountingFile:
+    def __init__(self, path: Path):
+        self._lines = path.read_text().splitlines(keepends=True)
+        self.lines_read = 0
+
+    def __iter__(self):
+        for line in self._lines:
+            self.lines_read += 1
+            yield line
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        pass
+
+
+def test_find_key_stops_reading_after_the_key(monkeypatch):
+    hive = RegistryFile(FIXTURES / "user.reg")
+    counting_file = _CountingFile(FIXTURES / "user.reg")
+    monkeypatch.setattr(hive, "_open", lambda: counting_file)
+
+    roblox_com = hive.find_key(r"Software\\Roblox\\RobloxStudioBrowser\\roblox.com")
+
+    assert roblox_com.get_value(".robloSECURITY").data == "_|WARNING:-DO-NOT-SHARE-THIS.--\"secret\""
+    assert roblox_com.get_metadata("time") == "1d8a1c9f2b3c4d5"
+    assert counting_file.lines_read < 12
+
+
+def test_selective_load_keeps_only_the_requested_keys():
+    hive = RegistryFile(FIXTURES / "user.reg")
+    hive.load(key_prefixes=[r"Software\\Wine"])
+
+    assert [k.path for k in hive.keys] == [r"Software\\Wine\\DllOverrides", r"Software\\Wine\\Binary"]
+
+
+def test_values_are_decoded_by_type():
+    binary = RegistryFile(FIXTURES / "user.reg").find_key(r"Software\\Wine\\Binary")
+
+    assert binary.get_value("").data == "default"
+    assert binary.get_value("Blob") == RegistryValue(REG_BINARY, bytes(range(0x1a)))
+    assert binary.get_value("Count") == RegistryValue(REG_DWORD, 42)
+    assert binary.get_value("Expand") == RegistryValue(REG_EXPAND_SZ, "%SystemRoot%\\system32")
+    assert decode_value('str(7):"a\\0b\\0"') == RegistryValue(REG_MULTI_SZ, ["a", "b"])
+    assert decode_value("hex(b):2a,00,00,00,00,00,00,00") == RegistryValue(REG_QWORD, 42)
+    assert decode_value("hex(2):25,00,41,00,00,00") == RegistryValue(REG_EXPAND_SZ, "%A")
@@ -0,0 +1,47 @@
+import os
+import shutil
+from pathlib import Path
+
+import pytest
+
+from grapejuice_common.wine import registry_index as registry_index_module
+from grapejuice_common.wine.registry_index import RegistryIndex
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures" / "registry"
+
+
+@pytest.fixture
+def hive(tmp_path) -> Path:
+    hive_path = tmp_path / "user.reg"
+    shutil.copy(FIXTURES / "user.reg", hive_path)
+
+    return hive_path
+
+
+def test_keys_are_read_at_their_offset(hive, tmp_path, monkeypatch):
+    index = RegistryIndex(hive, tmp_path / "index")
+
+    overrides = index.find_key(r"Software\\Wine\\DllOverrides")
+    assert overrides.attributes == {"d3d11": "\"native\"", "d3d9": "\"native\"", "d3d10core": "\"native\""}
+    assert index.find_key(r"Software\\Nothing") is None
+
+    # A new index for the same hive uses the stored offsets and snapshots, without scanning the hive again
+    scans = []
+    scan_key_offsets = registry_index_module.scan_key_offsets
+    monkeypatch.setattr(registry_index_module, "scan_key_offsets", lambda p: scans.append(p) or scan_key_offsets(p))
+
+    stored_index = RegistryIndex(hive, tmp_path / "index")
+    assert stored_index.find_key(r"SOFTWARE\\Wine\\DllOverrides").attributes == overrides.attributes
+    assert scans == []
+
+
+def test_the_index_follows_changes_to_the_hive(hive, tmp_path):
+    index = RegistryIndex(hive, tmp_path / "index")
+    assert index.find_key(r"Software\\Wine\\DllOverrides") is not None
+
+    text = hive.read_text().replace(r"[Software\\Wine\\DllOverrides]", r"[Software\\Wine\\AppDefaults]")
+    hive.write_text(text)
+    os.utime(hive, ns=(0, 0))
+
+    assert index.find_key(r"Software\\Wine\\DllOverrides") is None
+    assert index.find_key(r"Software\\Wine\\AppDefaults").get_value("d3d11").data == "native"
@@ -0,0 +1,93 @@
+import gzip
+import os
+import time
+from dataclasses import asdict
+
+from grapejuice_common import paths
+from grapejuice_common.features import settings
+from grapejuice_common.models.wineprefix_configuration_model import WineprefixConfigurationModel
+from grapejuice_common.wine.roblox_log_rotation import rotate_roblox_logs, RotationPolicy, rotate_all_roblox_logs
+from grapejuice_common.wine.wineprefix_paths import WineprefixPaths
+
+DAY = 24 * 60 * 60
+
+
+def _write(path, content: bytes, age: float):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(content)
+
+    timestamp = time.time() - age
+    os.utime(path, (timestamp, timestamp))
+
+    return path
+
+
+def test_logs_and_crash_dumps_are_compressed_and_expired(tmp_path):
+    prefix_paths = WineprefixPaths(tmp_path)
+    logs = prefix_paths.possible_roblox_appdata[0] / "logs"
+    temp = prefix_paths.temp_directory / "Roblox"
+
+    current_log = _write(logs / "0.600_Player_last.log", b"running", age=60)
+    old_log = _write(logs / "0.590_Player_old.log", b"FLog::Output\n" * 10_000, age=2 * DAY)
+    crash_dump = _write(temp / "crashes" / "crash.dmp", bytes(100_000), age=3 * DAY)
+    expired_log = _write(logs / "archive" / "0.500_Player_ancient.log", b"old", age=30 * DAY)
+    unrelated = _write(temp / "settings.json", b"{}", age=30 * DAY)
+
+    report = rotate_roblox_logs(prefix_paths, RotationPolicy())
+
+    assert not report.skipped
+    assert (report.compressed_files, report.removed_files) == (2, 1)
+    assert report.reclaimed_bytes > 200_000
+
+    assert current_log.exists() and unrelated.exists()
+    assert not old_log.exists() and not crash_dump.exists() and not expired_log.exists()
+
+    compressed_log = old_log.with_name(old_log.name + ".gz")
+    assert gzip.decompress(compressed_log.read_bytes()) == b"FLog::Output\n" * 10_000
+    assert abs(compressed_log.stat().st_mtime - (time.time() - 2 * DAY)) < 60
+
+
+def test_oldest_files_go_first_when_over_budget(tmp_path):
+    prefix_paths = WineprefixPaths(tmp_path)
+    logs = prefix_paths.possible_roblox_appdata[0] / "logs"
+
+    oldest = _write(logs / "oldest.log.gz", bytes(1000), age=3 * DAY)
+    older = _write(logs / "older.log.gz", bytes(1000), age=2 * DAY)
+    newest = _write(logs / "newest.log.gz", bytes(1000), age=DAY)
+
+    report = rotate_roblox_logs(prefix_paths, RotationPolicy(budget_bytes=2000))
+
+    assert report.removed_files == 1
+    assert report.bytes_after == 2000
+    assert not oldest.exists() and older.exists() and newest.exists()
+
+
+def test_every_prefix_on_disk_is_rotated_with_the_configured_policy(tmp_path, monkeypatch):
+    prefixes = [
+        WineprefixConfigurationModel(
+            id=name,
+            priority=priority,
+            name_on_disk=name,
+            display_name=name.title(),
+            wine_home="",
+            dll_overrides=""
+        )
+        for priority, name in enumerate(["player", "studio"])
+    ]
+
+    monkeypatch.setattr(settings.current_settings, "_loaded_settings_object", {
+        settings.k_roblox_log_budget_mib: 512,
+        settings.k_roblox_log_max_age_days: 1,
+        settings.k_wineprefixes: list(map(asdict, prefixes))
+    })
+    monkeypatch.setattr(paths, "wineprefixes_directory", lambda: tmp_path)
+
+    # Only the player prefix exists on disk
+    logs = WineprefixPaths(tmp_path / "player").possible_roblox_appdata[0] / "logs"
+    expired_log = _write(logs / "0.590_Player_old.log.gz", b"old", age=2 * DAY)
+
+    reports = rotate_all_roblox_logs()
+
+    assert [report.base_directory for report in reports] == [tmp_path / "player"]
+    assert reports[0].removed_files == 1
+    assert not expired_log.exists()
@@ -0,0 +1,166 @@
+import os
+import shutil
+import subprocess
+import tarfile
+import time
+from dataclasses import asdict
+
+from grapejuice_common import paths
+from grapejuice_common.features import settings
+from grapejuice_common.models.wineprefix_configuration_model import WineprefixConfigurationModel
+from grapejuice_common.wine.roblox_versions_gc import collect_roblox_versions, disk_usage
+from grapejuice_common.wine.wine_functions import get_wineprefixes
+from grapejuice_common.wine.wineprefix_paths import WineprefixPaths
+
+HOUR = 60 * 60
+
+
+def _install_version(versions_directory, name, executables, age_hours: float):
+    version = versions_directory / name
+    version.mkdir(parents=True)
+    (version / "content.pak").write_bytes(os.urandom(64 * 1024))
+
+    timestamp = time.time() - age_hours * HOUR
+    for executable in executables:
+        (version / executable).write_bytes(b"MZ")
+        os.utime(version / executable, (timestamp, timestamp))
+
+    return version
+
+
+def _prefix(tmp_path):
+    prefix_paths = WineprefixPaths(tmp_path / "prefix")
+    versions = prefix_paths.roblox_versions_directories[0]
+
+    player = [
+        _install_version(versions, f"version-player{i}", ["RobloxPlayerBeta.exe", "RobloxPlayerLauncher.exe"], i)
+        for i in range(4)
+    ]
+    studio = [
+        _install_version(versions, f"version-studio{i}", ["RobloxStudioBeta.exe"], i)
+        for i in range(2)
+    ]
+
+    return prefix_paths, player, studio
+
+
+def test_newest_versions_of_every_product_are_kept(tmp_path):
+    prefix_paths, player, studio = _prefix(tmp_path)
+    installing = prefix_paths.roblox_versions_directories[0] / "version-installing"
+    installing.mkdir()
+
+    installer = prefix_paths.temp_directory / "RobloxPlayerLauncher.exe"
+    installer.parent.mkdir(parents=True)
+    installer.write_bytes(bytes(8192))
+    os.utime(installer, (time.time() - 2 * HOUR, time.time() - 2 * HOUR))
+
+    report = collect_roblox_versions(prefix_paths, keep=1)
+
+    assert sorted(report.kept) == ["version-player0", "version-studio0"]
+    assert sorted(report.removed) == ["version-player1", "version-player2", "version-player3", "version-studio1"]
+    assert report.installers == ["RobloxPlayerLauncher.exe"]
+    assert report.reclaimed_bytes >= 4 * 64 * 1024 + 8192
+
+    assert player[0].exists() and studio[0].exists() and installing.exists()
+    assert not any(p.exists() for p in [*player[1:], *studio[1:], installer])
+
+
+def test_dry_run_only_reports(tmp_path):
+    prefix_paths, player, studio = _prefix(tmp_path)
+
+    report = collect_roblox_versions(prefix_paths, keep=2, dry_run=True)
+
+    assert sorted(report.removed) == ["version-player2", "version-player3"]
+    assert report.reclaimed_bytes == disk_usage(player[2]) + disk_usage(player[3])
+    assert all(p.exists() for p in [*player, *studio])
+
+
+def test_versions_in_use_are_kept(tmp_path):
+    prefix_paths, player, studio = _prefix(tmp_path)
+
+    # A process of the prefix that runs from an old version
+    proc = subprocess.Popen(
+        ["sleep", "30"],
+        cwd=player[3],
+        env={**os.environ, "WINEPREFIX": str(prefix_paths.base_directory)}
+    )
+
+    try:
+        report = collect_roblox_versions(prefix_paths, keep=1)
+
+    finally:
+        proc.kill()
+        proc.wait()
+
+    assert report.in_use == ["version-player3"]
+    assert player[3].exists() and not player[2].exists()
+
+
+def test_nothing_is_removed_while_roblox_runs_when_asked(tmp_path):
+    prefix_paths, player, studio = _prefix(tmp_path)
+
+    # Named like Roblox, the way Wine shows the Windows executable as the command line
+    proc = subprocess.Popen(
+        ["RobloxPlayerBeta.exe", "30"],
+        executable=shutil.which("sleep"),
+        env={**os.environ, "WINEPREFIX": str(prefix_paths.base_directory)}
+    )
+
+    try:
+        report = collect_roblox_versions(prefix_paths, keep=1, skip_while_running=True)
+
+    finally:
+        proc.kill()
+        proc.wait()
+
+    assert report.skipped
+    assert not report.removed
+    assert all(p.exists() for p in [*player, *studio])
+
+
+def test_removed_versions_can_be_archived(tmp_path):
+    prefix_paths, player, studio = _prefix(tmp_path)
+    archive_directory = tmp_path / "archive"
+
+    report = collect_roblox_versions(prefix_paths, keep=3, archive=True, archive_directory=archive_directory)
+
+    assert report.archived == ["version-player3"]
+
+    with tarfile.open(archive_directory / "version-player3.tar.gz") as tf:
+        assert "version-player3/RobloxPlayerBeta.exe" in tf.getnames()
+
+
+def test_hard_linked_files_are_not_counted(tmp_path):
+    tree = tmp_path / "tree"
+    tree.mkdir()
+    (tree / "shared").write_bytes(bytes(64 * 1024))
+    os.link(tree / "shared", tmp_path / "outside")
+
+    assert disk_usage(tree) < 64 * 1024
+
+
+def test_configured_prefixes_on_disk_are_collected(tmp_path, monkeypatch):
+    configurations = [
+        WineprefixConfigurationModel(
+            id=name,
+            priority=priority,
+            name_on_disk=name,
+            display_name=name.title(),
+            wine_home="",
+            dll_overrides=""
+        )
+        for priority, name in enumerate(["prefix", "studio"])
+    ]
+
+    monkeypatch.setattr(settings.current_settings, "_loaded_settings_object", {
+        settings.k_wineprefixes: list(map(asdict, configurations))
+    })
+    monkeypatch.setattr(paths, "wineprefixes_directory", lambda: tmp_path)
+
+    # Only the first prefix exists on disk, like gc-versions without a hint
+    _prefix(tmp_path)
+    prefixes = filter(lambda p: p.paths.present_on_disk, get_wineprefixes())
+    reports = [collect_roblox_versions(prefix.paths, keep=1, dry_run=True) for prefix in prefixes]
+
+    assert [report.base_directory for report in reports] == [tmp_path / "prefix"]
+    assert len(reports[0].removed) == 4
@@ -0,0 +1,59 @@
+import json
+
+from grapejuice_common.hardware_info.gpu_vendor import GPUVendor
+from grapejuice_common.hardware_info.vulkan_icd import VulkanICDCatalog, vulkan_icd_manifest_paths, ARCH_64
+
+
+def _write_manifest(directory, name, library_path, **icd):
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / name
+    path.write_text(json.dumps({
+        "file_format_version": "1.0.0",
+        "ICD": {"library_path": library_path, "api_version": "1.3.224", **icd}
+    }))
+
+    return path
+
+
+def test_catalog_requires_both_architectures_per_family(tmp_path):
+    manifests = [
+        _write_manifest(tmp_path, "radeon_icd.x86_64.json", "/usr/lib/libvulkan_radeon.so"),
+        _write_manifest(tmp_path, "amd_icd32.json", "/usr/lib32/amdvlk32.so"),
+        _write_manifest(tmp_path, "intel_icd.x86_64.json", "/usr/lib/libvulkan_intel.so"),
+        _write_manifest(tmp_path, "intel_icd.i686.json", "/usr/lib32/libvulkan_intel.so"),
+        _write_manifest(tmp_path, "nvidia_icd.json", "libGLX_nvidia.so.0")
+    ]
+
+    catalog = VulkanICDCatalog(manifests)
+
+    assert not catalog.supports_vendor(GPUVendor.AMD)
+    assert catalog.supports_vendor(GPUVendor.INTEL)
+    assert catalog.supports_vendor(GPUVendor.NVIDIA)
+    assert catalog.for_vendor(GPUVendor.AMD)[0].architecture == ARCH_64
+
+
+def test_catalog_reads_library_arch_and_skips_invalid_manifests(tmp_path):
+    broken = tmp_path / "broken_icd.json"
+    broken.write_text("{")
+
+    manifests = [
+        _write_manifest(tmp_path, "radeon_icd.json", "/usr/lib/libvulkan_radeon.so", library_arch="64"),
+        broken
+    ]
+
+    catalog = VulkanICDCatalog(manifests)
+
+    assert len(catalog.icds) == 1
+    assert catalog.icds[0].architecture == ARCH_64
+    assert catalog.icds[0].api_version == "1.3.224"
+
+
+def test_icd_filenames_override_the_search(tmp_path, monkeypatch):
+    override = _write_manifest(tmp_path / "override", "nvidia_icd.json", "libGLX_nvidia.so.0")
+    _write_manifest(tmp_path / "data" / "vulkan" / "icd.d", "intel_icd.x86_64.json", "libvulkan_intel.so")
+
+    monkeypatch.setenv("XDG_DATA_DIRS", str(tmp_path / "data"))
+    monkeypatch.delenv("VK_DRIVER_FILES", raising=False)
+    monkeypatch.setenv("VK_ICD_FILENAMES", str(override))
+
+    assert vulkan_icd_manifest_paths() == [override]
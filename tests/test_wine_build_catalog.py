@@ -0,0 +1,94 @@
+import json
+import os
+
+from grapejuice_common.features import settings
+from grapejuice_common.wine.wine_build_catalog import WineBuildCatalog, discover_wine_homes
+
+
+def _fake_wine_build(wine_home, version_string, wineserver_content=b""):
+    bin_directory = wine_home / "bin"
+    bin_directory.mkdir(parents=True)
+
+    wine = bin_directory / "wine"
+    wine.write_text(f"#!/bin/sh\necho probed >> '{wine_home / 'probes'}'\necho '{version_string}'\n")
+    wine.chmod(0o755)
+
+    (bin_directory / "wineserver").write_bytes(b"\x7fELF" + wineserver_content)
+
+    return wine_home
+
+
+def _settings(tmp_path, default_wine_home: str, prefix_wine_homes) -> settings.UserSettings:
+    location = tmp_path / "user_settings.json"
+    location.write_text(json.dumps({
+        settings.k_default_wine_home: default_wine_home,
+        settings.k_wineprefixes: [
+            dict(
+                id=f"prefix-{i}",
+                priority=i,
+                name_on_disk=f"prefix-{i}",
+                display_name=f"Prefix {i}",
+                wine_home=wine_home,
+                dll_overrides=""
+            )
+            for i, wine_home in enumerate(prefix_wine_homes)
+        ]
+    }))
+
+    return settings.UserSettings(location)
+
+
+def _probe_count(wine_home) -> int:
+    return len((wine_home / "probes").read_text().splitlines())
+
+
+def test_builds_are_probed_once_until_the_binary_changes(tmp_path):
+    wine_home = _fake_wine_build(tmp_path / "wine-staging", "wine-8.0 (Staging)", b"WINEESYNC")
+    location = tmp_path / "wine_builds.json"
+
+    build = WineBuildCatalog(location).build(wine_home)
+
+    assert build.version_string == "wine-8.0 (Staging)"
+    assert build.is_staging and build.supports_esync and not build.supports_fsync
+    assert build.binaries == ("wine", "wineserver")
+    assert build.meets_version("wine-7.0") and not build.meets_version("wine-8.1")
+
+    assert WineBuildCatalog(location).build(wine_home) == build
+    assert _probe_count(wine_home) == 1
+
+    wine = wine_home / "bin" / "wine"
+    wine.write_text(wine.read_text() + "\n")
+    WineBuildCatalog(location).build(wine_home)
+
+    assert _probe_count(wine_home) == 2
+
+
+def test_wine_homes_are_discovered(tmp_path, monkeypatch):
+    opt_build = _fake_wine_build(tmp_path / "opt" / "wine-devel", "wine-8.5")
+    path_build = _fake_wine_build(tmp_path / "usr", "wine-7.0")
+    user_build = _fake_wine_build(tmp_path / "runners" / "lutris-ge", "wine-7.2 (Staging)")
+    configured_build = _fake_wine_build(tmp_path / "configured", "wine-7.1")
+
+    monkeypatch.setenv("PATH", os.path.pathsep.join([str(path_build / "bin"), str(tmp_path / "missing")]))
+
+    homes = discover_wine_homes(
+        configured_homes=[str(configured_build), str(path_build), ""],
+        build_directories=[str(tmp_path / "runners")],
+        opt_directory=tmp_path / "opt"
+    )
+
+    assert homes == [path_build, opt_build, configured_build, user_build]
+
+
+def test_configured_wine_homes_come_from_the_settings(tmp_path, monkeypatch):
+    default_build = _fake_wine_build(tmp_path / "default", "wine-7.1")
+    prefix_build = _fake_wine_build(tmp_path / "prefix", "wine-8.0 (Staging)")
+
+    monkeypatch.setenv("PATH", "")
+    monkeypatch.setattr(settings, "current_settings", _settings(tmp_path, str(default_build), [str(prefix_build), ""]))
+
+    assert discover_wine_homes(opt_directory=tmp_path / "opt") == [default_build, prefix_build]
+
+    # Builds in /opt of the machine running the tests may show up as well
+    builds = WineBuildCatalog(tmp_path / "wine_builds.json").builds()
+    assert {"wine-7.1", "wine-8.0 (Staging)"} <= {build.version_string for build in builds}
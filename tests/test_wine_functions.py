@@ -0,0 +1,29 @@
+from dataclasses import asdict
+
+from grapejuice_common.features import settings
+from grapejuice_common.models.wineprefix_configuration_model import WineprefixConfigurationModel
+from grapejuice_common.wine.wine_functions import get_wineprefixes
+
+
+def _configuration(name_on_disk: str, priority: int, hints) -> WineprefixConfigurationModel:
+    return WineprefixConfigurationModel(
+        id=name_on_disk,
+        priority=priority,
+        name_on_disk=name_on_disk,
+        display_name=name_on_disk.title(),
+        wine_home="",
+        dll_overrides="",
+        hints=hints
+    )
+
+
+def test_wineprefixes_come_from_the_settings(monkeypatch):
+    monkeypatch.setattr(settings.current_settings, "_loaded_settings_object", {
+        settings.k_wineprefixes: [
+            asdict(_configuration("studio", 1, ["studio"])),
+            asdict(_configuration("player", 0, ["player", "app"]))
+        ]
+    })
+
+    assert [prefix.configuration.id for prefix in get_wineprefixes()] == ["player", "studio"]
+    assert [prefix.configuration.id for prefix in get_wineprefixes("studio")] == ["studio"]
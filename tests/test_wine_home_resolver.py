@@ -0,0 +1,41 @@
+import pytest
+
+from grapejuice_common.errors import NoValidWineHomes
+from grapejuice_common.wine.wine_home_resolver import WineHomeResolver
+
+
+@pytest.fixture
+def resolver(monkeypatch, tmp_path):
+    # Keep the system wine home out of the candidates
+    monkeypatch.setenv("PATH", str(tmp_path / "empty"))
+
+    return WineHomeResolver()
+
+
+def test_resolution_is_cached_until_the_bin_directory_changes(resolver, tmp_path):
+    wine_home = tmp_path / "wine"
+    (wine_home / "bin").mkdir(parents=True)
+
+    first = resolver.resolution(str(wine_home), "")
+    assert resolver.resolution(str(wine_home), "") is first
+    assert resolver.wine_home(str(wine_home), "") == wine_home
+
+    (wine_home / "bin" / "wine").touch()
+    assert resolver.resolution(str(wine_home), "") is not first
+
+
+def test_failures_are_cached_with_their_reasons(resolver, tmp_path):
+    wine_home = tmp_path / "wine"
+    wine_home.mkdir()
+
+    with pytest.raises(NoValidWineHomes) as e:
+        resolver.wine_home(str(wine_home), "relative/wine")
+
+    assert "bin path" in e.value.description
+    assert "not an absolute path" in e.value.description
+
+    failure = resolver.resolution(str(wine_home), "relative/wine")
+    assert resolver.resolution(str(wine_home), "relative/wine") is failure
+
+    (wine_home / "bin").mkdir()
+    assert resolver.wine_home(str(wine_home), "relative/wine") == wine_home
@@ -0,0 +1,160 @@
+import os
+import signal
+import subprocess
+import sys
+import time
+from dataclasses import asdict
+
+from grapejuice_common import paths
+from grapejuice_common.features import settings
+from grapejuice_common.models.wineprefix_configuration_model import WineprefixConfigurationModel
+from grapejuice_common.wine.wineprefix_core_control import WineprefixCoreControl
+from grapejuice_common.wine.wineprefix_paths import WineprefixPaths
+from grapejuice_common.wine import wineprefix_core_control, wineserver_manager
+from grapejuice_common.wine.wineserver_manager import wineserver_directory, wineserver_pid, prestart_wineservers
+
+# Behaves like a wineserver that forks into the background and changes its directory to the server directory
+FAKE_WINESERVER = """#!/bin/sh
+echo "$@" >> "$WINEPREFIX/../wineserver_calls"
+server_directory=$(printf "/tmp/.wine-%d/server-%x-%x" "$(id -u)" $(stat -c "%d %i" "$WINEPREFIX"))
+mkdir -p "$server_directory"
+cd "$server_directory" && exec sleep 30 > /dev/null 2>&1 &
+"""
+
+
+# Holds the lock of a prefix the way another Grapejuice process would
+HOLD_LOCK = """
+import fcntl, sys, time
+with open(sys.argv[1], "a+") as fp:
+    fcntl.flock(fp, fcntl.LOCK_EX)
+    print("locked", flush=True)
+    time.sleep(1)
+"""
+
+
+def _configuration(tmp_path, name_on_disk: str, priority: int = 0) -> WineprefixConfigurationModel:
+    return WineprefixConfigurationModel(
+        id=name_on_disk,
+        priority=priority,
+        name_on_disk=name_on_disk,
+        display_name=name_on_disk.title(),
+        wine_home=str(tmp_path / "wine"),
+        dll_overrides=""
+    )
+
+
+def _stub_settings(tmp_path, monkeypatch, **extra_settings):
+    monkeypatch.setattr(settings.current_settings, "_loaded_settings_object", {
+        settings.k_default_wine_home: "",
+        settings.k_wineserver_idle_timeout: 120,
+        **extra_settings
+    })
+
+    wine_bin = tmp_path / "wine" / "bin"
+    wine_bin.mkdir(parents=True)
+
+    wineserver = wine_bin / "wineserver"
+    wineserver.write_text(FAKE_WINESERVER)
+    wineserver.chmod(0o755)
+
+
+def _core_control(tmp_path, monkeypatch) -> WineprefixCoreControl:
+    _stub_settings(tmp_path, monkeypatch)
+
+    return WineprefixCoreControl(WineprefixPaths(tmp_path / "prefix"), _configuration(tmp_path, "player"))
+
+
+def test_the_wineserver_is_found_by_its_working_directory(tmp_path):
+    server_directory = wineserver_directory(tmp_path)
+    server_directory.mkdir(parents=True, exist_ok=True)
+
+    proc = subprocess.Popen(["sleep", "30"], cwd=server_directory)
+
+    try:
+        assert wineserver_pid(tmp_path) == proc.pid
+
+    finally:
+        proc.kill()
+        proc.wait()
+
+    assert wineserver_pid(tmp_path) is None
+
+
+def test_a_running_wineserver_is_reused(tmp_path, monkeypatch):
+    core_control = _core_control(tmp_path, monkeypatch)
+    wineserver = core_control.wineserver
+
+    try:
+        assert wineserver.ensure_running()
+        assert wineserver.ensure_running()
+
+        assert (tmp_path / "wineserver_calls").read_text().splitlines() == ["-p120"]
+
+    finally:
+        if wineserver.pid is not None:
+            os.kill(wineserver.pid, signal.SIGKILL)
+
+
+def test_a_timeout_of_zero_leaves_the_wineserver_to_wine(tmp_path, monkeypatch):
+    core_control = _core_control(tmp_path, monkeypatch)
+    settings.current_settings.set(settings.k_wineserver_idle_timeout, 0)
+
+    assert not core_control.wineserver.ensure_running()
+    assert not (tmp_path / "wineserver_calls").exists()
+
+
+def test_wineservers_of_existing_prefixes_are_prestarted(tmp_path, monkeypatch):
+    _stub_settings(tmp_path, monkeypatch, **{
+        settings.k_prestart_wineservers: True,
+        settings.k_wineprefixes: [
+            asdict(_configuration(tmp_path, "studio", priority=1)),
+            asdict(_configuration(tmp_path, "player"))
+        ]
+    })
+    monkeypatch.setattr(paths, "wineprefixes_directory", lambda: tmp_path)
+
+    # Only the player prefix exists on disk
+    (tmp_path / "player").mkdir()
+
+    prestart_wineservers()
+    pid = wineserver_pid(tmp_path / "player")
+
+    try:
+        assert pid is not None
+        assert (tmp_path / "wineserver_calls").read_text().splitlines() == ["-p120"]
+
+    finally:
+        if pid is not None:
+            os.kill(pid, signal.SIGKILL)
+
+
+def test_the_prefix_lock_is_shared_with_other_processes(tmp_path, monkeypatch):
+    core_control = _core_control(tmp_path, monkeypatch)
+    lock_path = core_control.prefix_paths.base_directory / wineserver_manager.LOCK_FILE_NAME
+    lock_path.parent.mkdir(parents=True)
+
+    proc = subprocess.Popen([sys.executable, "-c", HOLD_LOCK, str(lock_path)], stdout=subprocess.PIPE, text=True)
+
+    try:
+        assert proc.stdout.readline().strip() == "locked"
+
+        started_at = time.monotonic()
+        with core_control.wineserver.lock():
+            waited = time.monotonic() - started_at
+
+        assert waited > 0.5
+
+    finally:
+        proc.kill()
+        proc.wait()
+        proc.stdout.close()
+
+
+def test_a_wineserver_started_during_an_offline_edit_falls_back_to_regedit(tmp_path, monkeypatch):
+    core_control = _core_control(tmp_path, monkeypatch)
+    running = iter([False, True])
+
+    monkeypatch.setattr(wineserver_manager.ManagedWineserver, "is_running", property(lambda _: next(running)))
+    monkeypatch.setattr(wineprefix_core_control, "apply_regedit_offline", lambda *_: True)
+
+    assert not core_control._apply_registry_offline(b"Windows Registry Editor Version 5.00\n")